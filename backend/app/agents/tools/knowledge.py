@@ -17,6 +17,10 @@ class KnowledgeToolInput(BaseModel):
     query: str = Field(
         description="Input suitable for vector search, full text search, and hybrid search. When searching continuously, the query must be designed so that it does not overlap with past contexts."
     )
+    reformulated_queries: list[str] = Field(
+        default=[],
+        description="Optional alternative phrasings of the query to improve recall. They are searched concurrently with the query.",
+    )
 
 
 def search_knowledge(
@@ -31,6 +35,7 @@ def search_knowledge(
         search_results = search_related_docs(
             bot,
             query=query,
+            reformulated_queries=tool_input.reformulated_queries,
         )
 
         # # For testing purpose
@@ -0,0 +1,24 @@
+import json
+import logging
+from typing import Any
+
+from app.repositories.bot_store_feed import refresh_feeds
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Bot-store feed refresh handler.
+    This function is triggered by EventBridge schedule.
+    Popular, pickup and pinned bot feeds are rebuilt, so that the bot-store page does not query per visit.
+    Feeds to refresh can be specified by `feeds` in the event.
+    """
+    logger.info(f"Received event: {event}")
+
+    names = event.get("feeds")
+    refresh_feeds(names)
+
+    result = {"refreshed": names or ["popular", "pickup", "pinned"]}
+    logger.info(f"Refresh completed: {result}")
+    return {"statusCode": 200, "body": json.dumps(result)}
@@ -58,6 +58,18 @@ DEFAULT_LLAMA_GENERATION_CONFIG: GenerationParams = {
 }
 
 
+# Max tokens of retrieved contexts inserted into the RAG prompt.
+# Models not listed here use `DEFAULT_RAG_CONTEXT_TOKEN_BUDGET`.
+DEFAULT_RAG_CONTEXT_TOKEN_BUDGET = 8000
+RAG_CONTEXT_TOKEN_BUDGET: dict[str, int] = {
+    # 32K context window
+    "mistral-7b-instruct": 4000,
+    "mixtral-8x7b-instruct": 4000,
+    "llama3-2-1b-instruct": 4000,
+    "llama3-2-3b-instruct": 4000,
+}
+
+
 # Used for price estimation.
 # NOTE: The following is based on 2024-03-07
 # See: https://aws.amazon.com/bedrock/pricing/
@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+from typing import Any
+
+from app.repositories.conversation import archive_conversation, find_idle_conversations
+from app.utils import get_current_time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Conversations idle longer than this are moved to S3
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+# Stop before the Lambda timeout. The rest is archived in the next run.
+REMAINING_TIME_THRESHOLD_MS = 30 * 1000
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Conversation archival handler.
+    This function is triggered by EventBridge schedule.
+    Conversations idle longer than `ARCHIVE_AFTER_DAYS` are archived to compressed S3 objects.
+    The number of days can be overridden by `archive_after_days` in the event.
+    """
+    logger.info(f"Received event: {event}")
+
+    archive_after_days = int(event.get("archive_after_days", ARCHIVE_AFTER_DAYS))
+    idle_before = get_current_time() - archive_after_days * 24 * 60 * 60 * 1000
+
+    archived = 0
+    skipped = 0
+    failed = 0
+    for user_id, conversation_id in find_idle_conversations(idle_before):
+        if (
+            context is not None
+            and context.get_remaining_time_in_millis() < REMAINING_TIME_THRESHOLD_MS
+        ):
+            logger.warning("Lambda is about to time out. Stop archiving.")
+            break
+
+        try:
+            if archive_conversation(user_id, conversation_id):
+                archived += 1
+            else:
+                skipped += 1
+        except Exception as e:
+            logger.exception(f"Failed to archive conversation {conversation_id}: {e}")
+            failed += 1
+
+    result = {"archived": archived, "skipped": skipped, "failed": failed}
+    logger.info(f"Archival completed: {result}")
+    return {"statusCode": 200, "body": json.dumps(result)}
@@ -1,16 +1,100 @@
+import re
+
 from app.bedrock import is_nova_model
+from app.config import DEFAULT_RAG_CONTEXT_TOKEN_BUDGET, RAG_CONTEXT_TOKEN_BUDGET
 from app.vector_search import SearchResult
 from app.routes.schemas.conversation import type_model_name
 
+# Results more similar than this to an already packed result are dropped as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Trade-off between relevance and diversity of maximal marginal relevance
+MMR_LAMBDA = 0.7
+SHINGLE_SIZE = 3
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {
+        tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens.
+    UTF-8 bytes are used rather than characters so that CJK text is not underestimated.
+    """
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def pack_search_results(
+    search_results: list[SearchResult], token_budget: int
+) -> list[SearchResult]:
+    """Select search results to insert into the prompt.
+    Near-duplicates are removed, the rest is ordered by maximal marginal relevance,
+    and results are packed until `token_budget` is reached.
+    Note that `rank` of each result is kept as is, because it is used as the citation source id.
+    """
+    # Search results are ordered by relevance
+    candidates = [
+        (1.0 / (i + 1), result, _shingles(result["content"]))
+        for i, result in enumerate(search_results)
+    ]
+
+    packed: list[tuple[SearchResult, set]] = []
+    remaining_tokens = token_budget
+    while candidates:
+        best_index = 0
+        best_score = float("-inf")
+        for i, (relevance, _, shingles) in enumerate(candidates):
+            similarity = max(
+                (_jaccard(shingles, packed_shingles) for _, packed_shingles in packed),
+                default=0.0,
+            )
+            score = MMR_LAMBDA * relevance - (1 - MMR_LAMBDA) * similarity
+            if score > best_score:
+                best_index, best_score = i, score
+
+        _, result, shingles = candidates.pop(best_index)
+        if any(
+            _jaccard(shingles, packed_shingles) >= NEAR_DUPLICATE_THRESHOLD
+            for _, packed_shingles in packed
+        ):
+            continue
+
+        tokens = estimate_tokens(result["content"])
+        # Always keep the most relevant result even if it exceeds the budget
+        if packed and tokens > remaining_tokens:
+            continue
+
+        packed.append((result, shingles))
+        remaining_tokens -= tokens
+
+    return [result for result, _ in packed]
+
 
 def build_rag_prompt(
     search_results: list[SearchResult],
     model: type_model_name,
     display_citation: bool = True,
 ) -> str:
-    context_prompt = ""
-    for result in search_results:
-        context_prompt += f"<search_result>\n<content>\n{result['content']}</content>\n<source>\n{result['rank']}\n</source>\n</search_result>"
+    packed_results = pack_search_results(
+        search_results,
+        token_budget=RAG_CONTEXT_TOKEN_BUDGET.get(
+            model, DEFAULT_RAG_CONTEXT_TOKEN_BUDGET
+        ),
+    )
+    context_prompt = "".join(
+        f"<search_result>\n<content>\n{result['content']}</content>\n<source>\n{result['rank']}\n</source>\n</search_result>"
+        for result in packed_results
+    )
 
     # Prompt for RAG
     inserted_prompt = """To answer the user's question, you are given a set of search results. Your job is to answer the user's question using only information from the search results.
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import time
+from decimal import Decimal as decimal
+
+import boto3
+from app.repositories.common import (
+    RecordNotFoundError,
+    compose_partition_key,
+    get_conversation_table_client,
+)
+from app.repositories.message_result import (
+    MESSAGE_RESULT_RETENTION_DAYS,
+    compose_message_result_sk,
+)
+from app.repositories.models.batch import BatchItemModel, BatchModel
+from app.utils import get_current_time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
+BATCH_RESULT_BUCKET = os.environ.get(
+    "BATCH_RESULT_BUCKET", os.environ.get("LARGE_MESSAGE_BUCKET", "")
+)
+# Objects under this prefix are expired by the lifecycle rule of the bucket
+BATCH_RESULT_PREFIX = "batch_results"
+# Attempts to count a completion conflicting with completions of other items of the batch
+COMPLETION_MAX_ATTEMPTS = 5
+COMPLETION_RETRY_BASE_DELAY_SECONDS = 0.05
+
+s3_client = boto3.client("s3", BEDROCK_REGION)
+
+
+def compose_batch_sk(user_id: str, batch_id: str) -> str:
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#BATCH#{batch_id}"
+
+
+def _compose_key(user_id: str, batch_id: str) -> dict:
+    return {
+        "PK": compose_partition_key(user_id, batch_id),
+        "SK": compose_batch_sk(user_id, batch_id),
+    }
+
+
+def _compose_result_path(user_id: str, batch_id: str) -> str:
+    return f"{BATCH_RESULT_PREFIX}/{user_id}/{batch_id}.jsonl"
+
+
+def _compose_items_path(user_id: str, batch_id: str) -> str:
+    return f"{BATCH_RESULT_PREFIX}/{user_id}/{batch_id}.items.jsonl"
+
+
+def _to_model(item: dict) -> BatchModel:
+    return BatchModel(
+        id=item["BatchId"],
+        total=int(item["Total"]),
+        create_time=float(item["CreateTime"]),
+        complete_time=(float(item["CompleteTime"]) if "CompleteTime" in item else None),
+        succeeded=int(item.get("SucceededCount", 0)),
+        failed=int(item.get("FailedCount", 0)),
+        result_path=item.get("ResultPath"),
+    )
+
+
+def store_batch(user_id: str, batch_id: str, items: list[BatchItemModel]):
+    """Store the batch. The items are written to S3, so that the batch item updated on each completion stays small."""
+    s3_client.put_object(
+        Bucket=BATCH_RESULT_BUCKET,
+        Key=_compose_items_path(user_id, batch_id),
+        Body="".join(f"{item.model_dump_json()}\n" for item in items).encode("utf-8"),
+        ContentType="application/jsonl",
+    )
+
+    now = get_current_time()
+    get_conversation_table_client(user_id).put_item(
+        Item={
+            **_compose_key(user_id, batch_id),
+            "BatchId": batch_id,
+            "Total": len(items),
+            "CreateTime": decimal(now),
+            # TTL attribute must be epoch seconds. Kept as long as the results of the items.
+            "ExpireTime": now // 1000 + MESSAGE_RESULT_RETENTION_DAYS * 24 * 60 * 60,
+        }
+    )
+
+
+def find_batch(user_id: str, batch_id: str) -> BatchModel:
+    response = get_conversation_table_client(user_id).get_item(
+        Key=_compose_key(user_id, batch_id), ConsistentRead=True
+    )
+    if "Item" not in response:
+        raise RecordNotFoundError(f"Batch {batch_id} not found")
+
+    return _to_model(response["Item"])
+
+
+def find_batch_items(user_id: str, batch_id: str) -> list[BatchItemModel]:
+    response = s3_client.get_object(
+        Bucket=BATCH_RESULT_BUCKET, Key=_compose_items_path(user_id, batch_id)
+    )
+    return [
+        BatchItemModel(**json.loads(line))
+        for line in response["Body"].read().decode("utf-8").splitlines()
+    ]
+
+
+def _count_completion(
+    user_id: str,
+    batch_id: str,
+    message_id: str,
+    status: str,
+    counted_status: str | None,
+) -> bool:
+    """Count the status of the item, which was counted as `counted_status` before.
+    The counted status is recorded on the result of the message in the same transaction,
+    so that the same completion is never counted twice, e.g. on redelivery.
+    Returns False if the item is not counted as `counted_status`.
+    """
+    table = get_conversation_table_client(user_id)
+    counter = "SucceededCount" if status == "SUCCEEDED" else "FailedCount"
+    if counted_status is None:
+        result_condition = "attribute_not_exists(BatchStatus)"
+        batch_update = f"ADD {counter} :one"
+    else:
+        result_condition = "BatchStatus = :counted_status"
+        previous_counter = (
+            "SucceededCount" if counted_status == "SUCCEEDED" else "FailedCount"
+        )
+        batch_update = f"ADD {counter} :one, {previous_counter} :minus_one"
+    result_values: dict = {":status": status}
+    if counted_status is not None:
+        result_values[":counted_status"] = counted_status
+
+    for attempt in range(COMPLETION_MAX_ATTEMPTS):
+        if attempt > 0:
+            time.sleep(COMPLETION_RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+        try:
+            table.meta.client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Update": {
+                            "TableName": table.table_name,
+                            "Key": {
+                                "PK": compose_partition_key(user_id, message_id),
+                                "SK": compose_message_result_sk(user_id, message_id),
+                            },
+                            "UpdateExpression": "SET BatchStatus = :status",
+                            "ConditionExpression": result_condition,
+                            "ExpressionAttributeValues": result_values,
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": table.table_name,
+                            "Key": _compose_key(user_id, batch_id),
+                            "UpdateExpression": batch_update,
+                            "ConditionExpression": "attribute_exists(PK)",
+                            "ExpressionAttributeValues": {
+                                ":one": 1,
+                                **({":minus_one": -1} if counted_status else {}),
+                            },
+                        }
+                    },
+                ]
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise e
+            reasons = [
+                reason.get("Code")
+                for reason in e.response.get("CancellationReasons", [])
+            ]
+            if reasons[:1] == ["ConditionalCheckFailed"]:
+                return False
+            if reasons[1:2] == ["ConditionalCheckFailed"]:
+                raise RecordNotFoundError(f"Batch {batch_id} not found")
+            logger.info(f"Conflicting completion of batch {batch_id}. Retrying.")
+
+    raise RuntimeError(f"Failed to count completion of {message_id} in {batch_id}")
+
+
+def add_batch_completion(
+    user_id: str, batch_id: str, message_id: str, succeeded: bool
+) -> BatchModel:
+    """Record completion of an item with counters. The updated batch is returned.
+    Recording the same completion again, e.g. on redelivery, is not counted twice.
+    An item which failed and then succeeded on retry is moved from failed to succeeded.
+    """
+    if succeeded:
+        if not _count_completion(user_id, batch_id, message_id, "SUCCEEDED", None):
+            _count_completion(user_id, batch_id, message_id, "SUCCEEDED", "FAILED")
+    else:
+        _count_completion(user_id, batch_id, message_id, "FAILED", None)
+
+    # Transactions do not return the updated item. Read only the small batch item.
+    return find_batch(user_id, batch_id)
+
+
+def store_batch_results(user_id: str, batch_id: str, lines: list[str]) -> str:
+    """Write the results as JSONL to S3 and record the path on the batch. The path is returned."""
+    result_path = _compose_result_path(user_id, batch_id)
+    s3_client.put_object(
+        Bucket=BATCH_RESULT_BUCKET,
+        Key=result_path,
+        Body="".join(f"{line}\n" for line in lines).encode("utf-8"),
+        ContentType="application/jsonl",
+    )
+
+    get_conversation_table_client(user_id).update_item(
+        Key=_compose_key(user_id, batch_id),
+        UpdateExpression="SET ResultPath = :result_path, CompleteTime = :complete_time",
+        ExpressionAttributeValues={
+            ":result_path": result_path,
+            ":complete_time": decimal(get_current_time()),
+        },
+    )
+    return result_path
@@ -3,7 +3,13 @@ import os
 import random
 import time
 
-from app.repositories.common import get_opensearch_client
+from app.repositories import local_search
+from app.repositories.common import (
+    compose_user_access_principals,
+    get_opensearch_client,
+    search_opensearch,
+    search_result_cache,
+)
 from app.repositories.models.custom_bot import BotMeta
 from app.user import User
 from opensearchpy import OpenSearch
@@ -15,6 +21,19 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+def _access_principals_filter(user: User) -> dict:
+    """Filter bots accessible by the user, i.e. public bots, owned bots and partial shared bots allowed for the user.
+    `AccessPrincipals` of bots are composed on write, so the filter is a plain `terms` query.
+    """
+    return {
+        "terms": {
+            "AccessPrincipals.keyword": compose_user_access_principals(
+                user.id, user.groups
+            )
+        }
+    }
+
+
 def find_bots_by_query(
     query: str,
     user: User,
@@ -33,7 +52,8 @@ def find_bots_by_query(
     - Requires 30% of search terms to match
 
     2. Access Control (filter clause):
-    The filter implements three access levels:
+    The filter matches `AccessPrincipals` of bots with the principals of the user.
+    It implements three access levels:
     a) Public Bots (`SharedScope = "all"`):
         - Available to all users
 
@@ -45,73 +65,26 @@ def find_bots_by_query(
     c) Private Bots (no `SharedScope` field):
         - Only accessible to the owner (`PK.keyword = user.id`)
         - Admins can see their own private bots (`PK.keyword = admin-user`)
+
+    Results are cached for a short time unless `client` is given.
+    The local index is used instead if `SEARCH_BACKEND=local`.
     """
-    client = client or get_opensearch_client()
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_bots_by_query(query, user, limit)
+
+    cache_key = ("bots", user.id, tuple(user.groups), query, limit)
+    if client is None:
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Found cached bots matching query: {query}")
+            return list(cached)
+        client = get_opensearch_client()
     logger.info(f"Searching bots with query: {query}")
 
-    # Include only BOT items
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    # Condition for bots that can be acquired
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Everyone can get
-        # Owner AND (no SharedScope i.e. private OR SharedScope = "partial")
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-    ]
-
+    filter_should: list[dict] = [_access_principals_filter(user)]
     if user.is_admin():
         # Administrator can get all partial shared bots
         filter_should.append({"term": {"SharedScope.keyword": "partial"}})
-    else:
-        # For non-admin users, check the permissions of partial shared bots
-        filter_should.append(
-            {
-                "bool": {
-                    "must": [
-                        {"term": {"SharedScope.keyword": "partial"}},
-                        {
-                            "bool": {
-                                "should": [
-                                    {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                    {
-                                        "script": {
-                                            "script": {
-                                                "source": (
-                                                    "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                    "if (params.user_groups.contains(group)) { return true; } } "
-                                                    "return false;"
-                                                ),
-                                                "params": {"user_groups": user.groups},
-                                                "lang": "painless",
-                                            }
-                                        }
-                                    },
-                                ],
-                                "minimum_should_match": 1,
-                            }
-                        },
-                    ]
-                }
-            }
-        )
 
     search_body = {
         "query": {
@@ -130,7 +103,8 @@ def find_bots_by_query(
                 ],
                 "filter": {
                     "bool": {
-                        "must": filter_must,
+                        # Include only BOT items
+                        "must": [{"prefix": {"SK.keyword": "BOT"}}],
                         "should": filter_should,
                         "minimum_should_match": 1,
                     }
@@ -142,7 +116,9 @@ def find_bots_by_query(
     logger.debug(f"Entire search body: {search_body}")
 
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
+        response = search_opensearch(
+            client, INDEX_NAME, search_body, "find_bots_by_query"
+        )
         logger.debug(f"Search response: {response}")
 
         bots = [
@@ -150,7 +126,8 @@ def find_bots_by_query(
             for hit in response["hits"]["hits"]
         ]
         logger.info(f"Found {len(bots)} bots matching query: {query}")
-        return bots
+        search_result_cache.set(cache_key, bots)
+        return list(bots)
 
     except Exception as e:
         logger.error(f"Error searching bots: {e}")
@@ -163,76 +140,19 @@ def find_bots_sorted_by_usage_count(
     client: OpenSearch | None = None,
 ) -> list[BotMeta]:
     """Search bots sorted by usage count while considering access control."""
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_bots_sorted_by_usage_count(user, limit)
+
     client = client or get_opensearch_client()
     logger.info(f"Searching bots sorted by usage count")
 
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Public bots
-        # Owner's bots (private or partial)
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-        # Partial shared bots with access permission
-        {
-            "bool": {
-                "must": [
-                    {"term": {"SharedScope.keyword": "partial"}},
-                    {
-                        "bool": {
-                            "should": [
-                                {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                {
-                                    "script": {
-                                        "script": {
-                                            "source": (
-                                                "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                "if (params.user_groups.contains(group)) { return true; } } "
-                                                "return false;"
-                                            ),
-                                            "params": {"user_groups": user.groups},
-                                            "lang": "painless",
-                                        }
-                                    }
-                                },
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
+    filters = [
+        {"prefix": {"SK.keyword": "BOT"}},
+        _access_principals_filter(user),
     ]
 
     search_body = {
-        "query": {
-            "bool": {
-                "filter": {
-                    "bool": {
-                        "must": filter_must,
-                        "should": filter_should,
-                        "minimum_should_match": 1,
-                    }
-                }
-            }
-        },
+        "query": {"bool": {"filter": filters}},
         "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
         "size": limit,
     }
@@ -240,7 +160,9 @@ def find_bots_sorted_by_usage_count(
     logger.debug(f"Search body: {search_body}")
 
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
+        response = search_opensearch(
+            client, INDEX_NAME, search_body, "find_bots_sorted_by_usage_count"
+        )
         logger.debug(f"Search response: {response}")
 
         bots = [
@@ -261,79 +183,22 @@ def find_random_bots(
     client: OpenSearch | None = None,
 ) -> list[BotMeta]:
     """Find random bots while considering access control."""
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_random_bots(user, limit)
+
     client = client or get_opensearch_client()
     logger.info(f"Searching random bots")
 
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Public bots
-        # Owner's bots (private or partial)
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-        # Partial shared bots with access permission
-        {
-            "bool": {
-                "must": [
-                    {"term": {"SharedScope.keyword": "partial"}},
-                    {
-                        "bool": {
-                            "should": [
-                                {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                {
-                                    "script": {
-                                        "script": {
-                                            "source": (
-                                                "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                "if (params.user_groups.contains(group)) { return true; } } "
-                                                "return false;"
-                                            ),
-                                            "params": {"user_groups": user.groups},
-                                            "lang": "painless",
-                                        }
-                                    }
-                                },
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
+    filters = [
+        {"prefix": {"SK.keyword": "BOT"}},
+        _access_principals_filter(user),
     ]
 
     seed = int(time.time()) + random.randint(0, 10000)
     search_body = {
         "query": {
             "function_score": {
-                "query": {
-                    "bool": {
-                        "filter": {
-                            "bool": {
-                                "must": filter_must,
-                                "should": filter_should,
-                                "minimum_should_match": 1,
-                            }
-                        }
-                    }
-                },
+                "query": {"bool": {"filter": filters}},
                 "random_score": {"seed": seed},
             }
         },
@@ -343,7 +208,9 @@ def find_random_bots(
     logger.debug(f"Search body: {search_body}")
 
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
+        response = search_opensearch(
+            client, INDEX_NAME, search_body, "find_random_bots"
+        )
         logger.debug(f"Search response: {response}")
 
         bots = [
@@ -356,3 +223,113 @@ def find_random_bots(
     except Exception as e:
         logger.error(f"Error searching bots: {e}")
         raise
+
+
+def _search_bot_sources(
+    search_body: dict, query_name: str, client: OpenSearch | None = None
+) -> list[dict]:
+    client = client or get_opensearch_client()
+    logger.debug(f"Search body: {search_body}")
+
+    try:
+        response = search_opensearch(client, INDEX_NAME, search_body, query_name)
+        return [hit["_source"] for hit in response["hits"]["hits"]]
+
+    except Exception as e:
+        logger.error(f"Error searching bots: {e}")
+        raise
+
+
+def find_public_bot_sources_sorted_by_usage_count(
+    limit: int = 100,
+    client: OpenSearch | None = None,
+) -> list[dict]:
+    """Search public bots sorted by usage count. Used to build the popular bots feed.
+    Returns `_source` of the hits, which is independent of the user.
+    """
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_public_bot_sources_sorted_by_usage_count(limit)
+
+    logger.info("Searching public bots sorted by usage count")
+    return _search_bot_sources(
+        {
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"prefix": {"SK.keyword": "BOT"}},
+                        {"term": {"SharedScope.keyword": "all"}},
+                    ]
+                }
+            },
+            "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
+            "size": limit,
+        },
+        "find_public_bot_sources_sorted_by_usage_count",
+        client,
+    )
+
+
+def find_random_public_bot_sources(
+    limit: int = 100,
+    client: OpenSearch | None = None,
+) -> list[dict]:
+    """Find random public bots. Used to build the pickup bots feed.
+    Returns `_source` of the hits, which is independent of the user.
+    """
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_random_public_bot_sources(limit)
+
+    logger.info("Searching random public bots")
+    seed = int(time.time()) + random.randint(0, 10000)
+    return _search_bot_sources(
+        {
+            "query": {
+                "function_score": {
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {"prefix": {"SK.keyword": "BOT"}},
+                                {"term": {"SharedScope.keyword": "all"}},
+                            ]
+                        }
+                    },
+                    "random_score": {"seed": seed},
+                }
+            },
+            "size": limit,
+        },
+        "find_random_public_bot_sources",
+        client,
+    )
+
+
+def find_non_public_bot_sources(
+    user: User,
+    limit: int = 20,
+    client: OpenSearch | None = None,
+) -> list[dict]:
+    """Search bots accessible by the user except public bots, sorted by usage count.
+    i.e. owned private or partial shared bots, and partial shared bots allowed for the user or the user's groups.
+    The result is usually small and merged with the bot-store feeds per request.
+    """
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_non_public_bot_sources(user, limit)
+
+    logger.info("Searching non-public bots accessible by the user")
+    return _search_bot_sources(
+        {
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"prefix": {"SK.keyword": "BOT"}},
+                        _access_principals_filter(user),
+                    ],
+                    "must_not": [{"term": {"SharedScope.keyword": "all"}}],
+                }
+            },
+            "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
+            "size": limit,
+        },
+        "find_non_public_bot_sources",
+        client,
+    )
@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+from decimal import Decimal as decimal
+from typing import Any, Callable, Literal
+
+import boto3
+from app.repositories.bot_store import (
+    find_public_bot_sources_sorted_by_usage_count,
+    find_random_public_bot_sources,
+)
+from app.repositories.common import compose_sk, get_bot_table_client
+from app.repositories.custom_bot import find_pinned_public_bot_items
+from app.utils import TTLCache, get_current_time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
+# Set only when the scheduled job refreshing the feeds is deployed.
+# If no bucket is configured, bot-store queries are issued per request.
+BOT_STORE_FEED_BUCKET = os.environ.get("BOT_STORE_FEED_BUCKET", "")
+BOT_STORE_FEED_PREFIX = "bot_store_feeds"
+# Number of bots kept in popular and pickup feeds
+BOT_STORE_FEED_SIZE = int(os.environ.get("BOT_STORE_FEED_SIZE", "100"))
+# Feeds are read from S3 at most once per this interval by a Lambda environment
+BOT_STORE_FEED_CACHE_TTL_SECONDS = int(
+    os.environ.get("BOT_STORE_FEED_CACHE_TTL_SECONDS", "60")
+)
+# Attempts to update a feed modified concurrently, e.g. by the scheduled refresh
+FEED_UPDATE_MAX_ATTEMPTS = 3
+
+type_feed_name = Literal["popular", "pickup", "pinned"]
+
+# Attributes of bot documents kept in feeds
+FEED_ATTRIBUTES = [
+    "PK",
+    "SK",
+    "ItemType",
+    "BotId",
+    "Title",
+    "Description",
+    "CreateTime",
+    "LastUsedTime",
+    "IsStarred",
+    "SyncStatus",
+    "BedrockKnowledgeBase",
+    "SharedScope",
+    "SharedStatus",
+    "UsageStats",
+]
+
+s3_client = boto3.client("s3", BEDROCK_REGION)
+feed_cache: TTLCache[str, list[dict]] = TTLCache(
+    maxsize=8, ttl_seconds=BOT_STORE_FEED_CACHE_TTL_SECONDS
+)
+# Feeds not built yet, so that S3 is not read on every request until the first refresh
+missing_feed_cache: TTLCache[str, bool] = TTLCache(
+    maxsize=8, ttl_seconds=BOT_STORE_FEED_CACHE_TTL_SECONDS
+)
+
+
+def is_bot_store_feed_enabled() -> bool:
+    return bool(BOT_STORE_FEED_BUCKET)
+
+
+def _compose_feed_path(name: type_feed_name) -> str:
+    return f"{BOT_STORE_FEED_PREFIX}/{name}.json"
+
+
+def _to_feed_entry(item: dict) -> dict:
+    """Keep only attributes required by `BotMeta`. Decimal values of DynamoDB items are converted to numbers."""
+
+    def convert(value):
+        if isinstance(value, decimal):
+            return int(value) if value % 1 == 0 else float(value)
+        if isinstance(value, dict):
+            return {k: convert(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [convert(v) for v in value]
+        return value
+
+    return {key: convert(item[key]) for key in FEED_ATTRIBUTES if key in item}
+
+
+def store_feed(name: type_feed_name, items: list[dict], if_match: str | None = None):
+    """Store the feed. If `if_match` is given, the feed is stored only if its ETag is unchanged."""
+    entries = [_to_feed_entry(item) for item in items]
+    params: dict[str, Any] = {
+        "Bucket": BOT_STORE_FEED_BUCKET,
+        "Key": _compose_feed_path(name),
+        "Body": json.dumps({"RefreshedTime": get_current_time(), "Bots": entries}),
+        "ContentType": "application/json",
+    }
+    if if_match is not None:
+        params["IfMatch"] = if_match
+    s3_client.put_object(**params)
+    feed_cache.set(name, entries)
+    missing_feed_cache.invalidate(lambda key: key == name)
+    logger.info(f"Stored bot-store feed {name} with {len(entries)} bots.")
+
+
+def _load_feed(name: type_feed_name) -> tuple[list[dict], str] | None:
+    """Load bots of the feed and the ETag of the object."""
+    try:
+        response = s3_client.get_object(
+            Bucket=BOT_STORE_FEED_BUCKET, Key=_compose_feed_path(name)
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            logger.warning(f"Bot-store feed {name} has not been built yet.")
+            return None
+        raise e
+
+    return json.loads(response["Body"].read())["Bots"], response["ETag"]
+
+
+def _update_feed(
+    name: type_feed_name, update: Callable[[list[dict]], list[dict] | None]
+) -> bool:
+    """Apply `update` to the latest feed, not to revert a refresh by the cached one.
+    `update` returns None if the feed is unchanged. The feed is stored only if it was not modified since read,
+    and is read again otherwise. Returns False if the feed has not been built yet.
+    """
+    for _ in range(FEED_UPDATE_MAX_ATTEMPTS):
+        loaded = _load_feed(name)
+        if loaded is None:
+            return False
+
+        entries, etag = loaded
+        updated = update(entries)
+        if updated is None:
+            return True
+        try:
+            store_feed(name, updated, if_match=etag)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+            ):
+                raise e
+            logger.info(f"Bot-store feed {name} was modified concurrently. Retrying.")
+
+    raise RuntimeError(
+        f"Failed to update bot-store feed {name} after {FEED_UPDATE_MAX_ATTEMPTS} attempts."
+    )
+
+
+def find_feed(name: type_feed_name) -> list[dict] | None:
+    """Find bots of the feed. Returns None if the feed is not available."""
+    if not is_bot_store_feed_enabled():
+        return None
+
+    cached = feed_cache.get(name)
+    if cached is not None:
+        return cached
+    if missing_feed_cache.get(name):
+        return None
+
+    loaded = _load_feed(name)
+    if loaded is None:
+        missing_feed_cache.set(name, True)
+        return None
+
+    entries = loaded[0]
+    feed_cache.set(name, entries)
+    return entries
+
+
+def refresh_feeds(names: list[type_feed_name] | None = None):
+    """Rebuild the feeds from the bot table and the bot-store index."""
+    if not is_bot_store_feed_enabled():
+        logger.warning("Bucket for bot-store feeds is not configured.")
+        return
+
+    names = names or ["popular", "pickup", "pinned"]
+    if "popular" in names:
+        store_feed(
+            "popular",
+            find_public_bot_sources_sorted_by_usage_count(limit=BOT_STORE_FEED_SIZE),
+        )
+    if "pickup" in names:
+        # Another random sample is taken on each refresh
+        store_feed("pickup", find_random_public_bot_sources(limit=BOT_STORE_FEED_SIZE))
+    if "pinned" in names:
+        store_feed("pinned", find_pinned_public_bot_items())
+
+
+def remove_bot_from_feeds(bot_id: str):
+    """Remove the bot from the feeds immediately, e.g. when a public bot is deleted or unshared.
+    Otherwise the bot remains in the feeds until the next refresh.
+    """
+    if not is_bot_store_feed_enabled():
+        return
+
+    def remove(entries: list[dict]) -> list[dict] | None:
+        if all(entry["BotId"] != bot_id for entry in entries):
+            return None
+        return [entry for entry in entries if entry["BotId"] != bot_id]
+
+    names: list[type_feed_name] = ["popular", "pickup", "pinned"]
+    for name in names:
+        _update_feed(name, remove)
+
+
+def update_pinned_feed(owner_user_id: str, bot_id: str):
+    """Reflect pin status of the bot to the pinned feed immediately.
+    The bot item is read with a consistent read, since the index used to rebuild the feed is eventually consistent.
+    """
+    if not is_bot_store_feed_enabled():
+        return
+
+    table = get_bot_table_client()
+    response = table.get_item(
+        Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
+        ConsistentRead=True,
+    )
+    item = response.get("Item")
+
+    def update(entries: list[dict]) -> list[dict]:
+        entries = [entry for entry in entries if entry["BotId"] != bot_id]
+        if (
+            item
+            and item.get("SharedScope") == "all"
+            and item["SharedStatus"].startswith("pinned")
+        ):
+            entries.append(item)
+        # Same order as `SharedScopeIndex`, i.e. `pinned@{order}`
+        return sorted(entries, key=lambda entry: entry["SharedStatus"])
+
+    if not _update_feed("pinned", update):
+        refresh_feeds(["pinned"])
@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+from decimal import Decimal as decimal
+from typing import Literal, TypedDict
+
+from app.repositories import local_search
+from app.repositories.common import compose_sk, get_bot_table_client
+from app.utils import get_current_time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Each bot or alias item is written at most once per interval by a Lambda environment.
+# Usage in between is aggregated in memory and written by the next flush,
+# which runs in the background after the interval even without further usage.
+BOT_USAGE_FLUSH_INTERVAL_SECONDS = int(
+    os.environ.get("BOT_USAGE_FLUSH_INTERVAL_SECONDS", "30")
+)
+
+
+class PendingBotUsage(TypedDict):
+    usage_count: int
+    last_used_time: int | None
+
+
+# Key: (PK, SK) of bot or alias item
+_pending: dict[tuple[str, str], PendingBotUsage] = {}
+# Time when each item was last written
+_last_written_time: dict[tuple[str, str], int] = {}
+_lock = threading.Lock()
+# Timer to flush buffered usage in the background
+_timer: threading.Timer | None = None
+
+
+def _merge(key: tuple[str, str], usage_count: int, last_used_time: int | None):
+    pending = _pending.setdefault(key, {"usage_count": 0, "last_used_time": None})
+    pending["usage_count"] += usage_count
+    if last_used_time is not None:
+        pending["last_used_time"] = max(pending["last_used_time"] or 0, last_used_time)
+
+
+def _schedule_flush():
+    """Schedule a background flush if usage is buffered. Must be called with `_lock` held.
+    NOTE: Timers do not run while the Lambda environment is frozen between invocations.
+    An overdue flush runs as soon as the environment receives any invocation.
+    """
+    global _timer
+    if _timer is not None or not _pending:
+        return
+
+    _timer = threading.Timer(BOT_USAGE_FLUSH_INTERVAL_SECONDS, _flush_in_background)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _flush_in_background():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush_bot_usage()
+    except Exception as e:
+        # Failed usage is kept in the buffer and the next flush is scheduled
+        logger.error(f"Failed to flush bot usage in the background: {e}")
+
+
+def record_bot_usage(owner_user_id: str, bot_id: str, increment: int):
+    """Buffer increment of usage count of the bot. Written by `flush_bot_usage`."""
+    with _lock:
+        _merge((owner_user_id, compose_sk(bot_id, "bot")), increment, None)
+        _schedule_flush()
+
+
+def record_last_used_time(
+    user_id: str, bot_id: str, item_type: Literal["bot", "alias"]
+):
+    """Buffer last used time of the bot or alias. Written by `flush_bot_usage`."""
+    with _lock:
+        _merge((user_id, compose_sk(bot_id, item_type)), 0, get_current_time())
+        _schedule_flush()
+
+
+def _write(key: tuple[str, str], pending: PendingBotUsage):
+    set_expressions = []
+    expression_attribute_values: dict = {}
+    if pending["usage_count"] != 0:
+        set_expressions.append(
+            "UsageStats.usage_count = if_not_exists(UsageStats.usage_count, :zero) + :val"
+        )
+        expression_attribute_values[":zero"] = 0
+        expression_attribute_values[":val"] = pending["usage_count"]
+    if pending["last_used_time"] is not None:
+        set_expressions.append("LastUsedTime = :last_used_time")
+        if key[1].startswith("BOT#"):
+            # Sort key of `OwnedBotIndex`, which is set only on bot items
+            set_expressions.append("LastUsedOrCreateTime = :last_used_time")
+        expression_attribute_values[":last_used_time"] = decimal(
+            pending["last_used_time"]
+        )
+    if not set_expressions:
+        return
+
+    table = get_bot_table_client()
+    # The updated item is read back only to reindex it for local search
+    local_search_enabled = local_search.is_local_search_enabled()
+    try:
+        response = table.update_item(
+            Key={"PK": key[0], "SK": key[1]},
+            UpdateExpression="SET " + ", ".join(set_expressions),
+            ExpressionAttributeValues=expression_attribute_values,
+            ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
+            ReturnValues="ALL_NEW" if local_search_enabled else "NONE",
+        )
+        if local_search_enabled:
+            # Usage count is used to sort bots. Alias items are ignored.
+            local_search.index_bot_item(response["Attributes"])
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            # The bot or alias was deleted. Discard its usage.
+            logger.info(f"Item {key} not found. Skip updating bot usage.")
+        else:
+            raise e
+
+
+def flush_bot_usage(force: bool = False):
+    """Write buffered bot usage with one update per bot or alias item.
+    Only items not written within `BOT_USAGE_FLUSH_INTERVAL_SECONDS` are written unless `force` is set,
+    so the first usage of a bot is written immediately and bursts on popular bots are aggregated.
+    The rest is written by a background flush after the interval.
+    Failed items are put back to the buffer, and the error is raised to let the caller retry.
+    """
+    now = get_current_time()
+    interval_ms = BOT_USAGE_FLUSH_INTERVAL_SECONDS * 1000
+    with _lock:
+        due = {
+            key: pending
+            for key, pending in _pending.items()
+            if force or now - _last_written_time.get(key, 0) >= interval_ms
+        }
+        for key in due:
+            del _pending[key]
+            _last_written_time[key] = now
+        # Forget items which are due anyway, to bound the memory
+        for key in [
+            key for key, time in _last_written_time.items() if now - time >= interval_ms
+        ]:
+            del _last_written_time[key]
+
+    error: Exception | None = None
+    for key, pending in due.items():
+        try:
+            _write(key, pending)
+        except Exception as e:
+            logger.error(f"Failed to update bot usage of {key}: {e}")
+            with _lock:
+                _merge(key, pending["usage_count"], pending["last_used_time"])
+                _last_written_time.pop(key, None)
+            error = e
+
+    with _lock:
+        # Usage which is not due yet is written by the background flush
+        _schedule_flush()
+
+    if error is not None:
+        raise error
@@ -1,9 +1,13 @@
 import json
 import os
+import threading
+import time
+import zlib
 from typing import Literal
 
 import boto3
 from opensearchpy import OpenSearch, RequestsHttpConnection
+from app.utils import TTLCache, emit_metric
 from requests_aws4auth import AWS4Auth
 
 DDB_ENDPOINT_URL = os.environ.get("DDB_ENDPOINT_URL")
@@ -16,15 +20,35 @@ TABLE_ACCESS_ROLE_ARN = os.environ.get("TABLE_ACCESS_ROLE_ARN", "")
 OPENSEARCH_DOMAIN_ENDPOINT = os.environ.get(
     "OPENSEARCH_DOMAIN_ENDPOINT",
 )
+# Max connections kept alive per OpenSearch client
+OPENSEARCH_POOL_MAXSIZE = int(os.environ.get("OPENSEARCH_POOL_MAXSIZE", "10"))
+# Identical searches within this interval, e.g. fired while the user types, are served from memory
+SEARCH_RESULT_CACHE_TTL_SECONDS = int(
+    os.environ.get("SEARCH_RESULT_CACHE_TTL_SECONDS", "10")
+)
 
 # DynamoDB batch operation limits
 # Ref: https://docs.aws.amazon.com/en_en/amazondynamodb/latest/developerguide/read-write-operations.html
 TRANSACTION_BATCH_WRITE_SIZE = 25
 TRANSACTION_BATCH_READ_SIZE = 100
 
+# Published API users share one synthetic user id, so their conversations are
+# spread over multiple partition keys to avoid throttling on a hot partition.
+PUBLISHED_API_PARTITION_SHARD_COUNT = int(
+    os.environ.get("PUBLISHED_API_PARTITION_SHARD_COUNT", "10")
+)
+
 type_table = Literal["conversation", "bot"]
 _table_name_map = {"conversation": CONVERSATION_TABLE_NAME, "bot": BOT_TABLE_NAME}
 
+# Key: collection type
+_opensearch_clients: dict[str, OpenSearch] = {}
+_opensearch_clients_lock = threading.Lock()
+# Key: (search name, user id, user groups, query, limit)
+search_result_cache: TTLCache[tuple, list] = TTLCache(
+    maxsize=256, ttl_seconds=SEARCH_RESULT_CACHE_TTL_SECONDS
+)
+
 
 class RecordNotFoundError(Exception):
     pass
@@ -47,6 +71,41 @@ def decompose_conv_id(conv_id: str):
     return conv_id.split("#")[-1]
 
 
+def is_sharded_partition(user_id: str) -> bool:
+    """Whether the items of the user are spread over sharded partition keys."""
+    return user_id.startswith("PUBLISHED_API#")
+
+
+def compose_partition_key(user_id: str, conversation_id: str) -> str:
+    """Compose partition key for the conversation and its related documents."""
+    if not is_sharded_partition(user_id):
+        return user_id
+
+    # Keep user_id as prefix to match with `LeadingKeys` condition
+    shard = zlib.crc32(conversation_id.encode()) % PUBLISHED_API_PARTITION_SHARD_COUNT
+    return f"{user_id}#{shard}"
+
+
+def compose_partition_keys(user_id: str) -> list[str]:
+    """Compose all partition keys of the user to fan out reads.
+    For sharded users, unsharded key is included to read items written before sharding.
+    """
+    if not is_sharded_partition(user_id):
+        return [user_id]
+
+    return [user_id] + [
+        f"{user_id}#{shard}" for shard in range(PUBLISHED_API_PARTITION_SHARD_COUNT)
+    ]
+
+
+def decompose_partition_key(partition_key: str) -> str:
+    """Decompose partition key to get user_id."""
+    # Sharded key: PUBLISHED_API#<bot_id>#<shard>
+    if is_sharded_partition(partition_key) and partition_key.count("#") == 2:
+        return partition_key.rsplit("#", 1)[0]
+    return partition_key
+
+
 def compose_related_document_source_id(
     user_id: str,
     conversation_id: str,
@@ -74,6 +133,30 @@ def compose_sk(bot_id: str, item_type: Literal["bot", "alias"]):
         return f"ALIAS#{bot_id}"
 
 
+def compose_access_principals(
+    owner_user_id: str,
+    shared_scope: str,
+    allowed_user_ids: list[str],
+    allowed_group_ids: list[str],
+) -> list[str]:
+    """Compose principals which can access the bot.
+    Indexed to the bot store to filter accessible bots by `terms` query instead of scripts.
+    Users and groups are prefixed not to collide with each other.
+    """
+    principals = [f"user#{owner_user_id}"]
+    if shared_scope == "all":
+        principals.append("public")
+    elif shared_scope == "partial":
+        principals.extend(f"user#{user_id}" for user_id in allowed_user_ids)
+        principals.extend(f"group#{group_id}" for group_id in allowed_group_ids)
+    return list(dict.fromkeys(principals))
+
+
+def compose_user_access_principals(user_id: str, groups: list[str]) -> list[str]:
+    """Compose principals of the user, matched with `compose_access_principals` of bots."""
+    return [f"user#{user_id}", *(f"group#{group}" for group in groups), "public"]
+
+
 def decompose_sk(sk: str):
     """Decompose sort key to get bot_id."""
     return sk.split("#")[-1]
@@ -175,11 +258,27 @@ def get_bot_table_client():
 
 def get_opensearch_client(collection_type: str = "bot") -> OpenSearch:
     """Get OpenSearch client with AWS authentication.
+    One client is created per collection and reused by the Lambda execution environment,
+    so TLS connections are pooled across requests.
+    Requests are signed with refreshable credentials, which are renewed when they expire.
 
     Args:
         collection_type: Type of collection to connect to ("bot" or "conversation")
         Note: This method now uses a single shared endpoint for both bot and conversation collections
     """
+    client = _opensearch_clients.get(collection_type)
+    if client is not None:
+        return client
+
+    with _opensearch_clients_lock:
+        client = _opensearch_clients.get(collection_type)
+        if client is None:
+            client = _create_opensearch_client()
+            _opensearch_clients[collection_type] = client
+        return client
+
+
+def _create_opensearch_client() -> OpenSearch:
     endpoint = OPENSEARCH_DOMAIN_ENDPOINT
     if not endpoint:
         raise ValueError("OPENSEARCH_DOMAIN_ENDPOINT is not set")
@@ -188,11 +287,9 @@ def get_opensearch_client(collection_type: str = "bot") -> OpenSearch:
     credentials = boto3.Session().get_credentials()
     assert credentials is not None, "Credentials are not available"
     aws_auth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        REGION,
-        "aoss",
-        session_token=credentials.token,
+        region=REGION,
+        service="aoss",
+        refreshable_credentials=credentials,
     )
 
     # Omit https
@@ -204,7 +301,24 @@ def get_opensearch_client(collection_type: str = "bot") -> OpenSearch:
         use_ssl=True,
         verify_certs=True,
         connection_class=RequestsHttpConnection,
+        pool_maxsize=OPENSEARCH_POOL_MAXSIZE,
         timeout=30,
     )
 
     return client
+
+
+def search_opensearch(
+    client: OpenSearch, index: str, body: dict, query_name: str
+) -> dict:
+    """Search the index and emit the latency as `SearchLatency` metric with `Query` dimension."""
+    start = time.perf_counter()
+    try:
+        return client.search(index=index, body=body)
+    finally:
+        emit_metric(
+            "SearchLatency",
+            (time.perf_counter() - start) * 1000,
+            "Milliseconds",
+            Query=query_name,
+        )
@@ -1,18 +1,25 @@
+import gzip
 import json
 import logging
 import os
 from decimal import Decimal as decimal
+from typing import TYPE_CHECKING, Iterator, cast
 
 import boto3
 from typing import Dict
+from app.repositories import local_search
 from app.repositories.common import (
     TRANSACTION_BATCH_WRITE_SIZE,
     RecordNotFoundError,
     compose_conv_id,
+    compose_partition_key,
+    compose_partition_keys,
     compose_related_document_source_id,
     decompose_conv_id,
+    decompose_partition_key,
     decompose_related_document_source_id,
     get_conversation_table_client,
+    get_conversation_table_public_client,
 )
 from app.repositories.models.conversation import (
     ConversationMeta,
@@ -20,22 +27,78 @@ from app.repositories.models.conversation import (
     FeedbackModel,
     MessageModel,
     RelatedDocumentModel,
+    TextContentModel,
     ToolResultModel,
 )
-from boto3.dynamodb.conditions import Key
+from app.utils import get_current_time
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 from pydantic import TypeAdapter
 
+if TYPE_CHECKING:
+    from mypy_boto3_s3.literals import StorageClassType
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 THRESHOLD_LARGE_MESSAGE = 300 * 1024  # 300KB
-LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET")
+# Length of the first user message stored for search-as-you-type suggestions
+FIRST_USER_MESSAGE_MAX_LENGTH = 256
+LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET", "")
+
+# Cold conversations are archived to the large message bucket by default
+CONVERSATION_ARCHIVE_BUCKET = os.environ.get(
+    "CONVERSATION_ARCHIVE_BUCKET", LARGE_MESSAGE_BUCKET
+)
+CONVERSATION_ARCHIVE_STORAGE_CLASS = cast(
+    "StorageClassType",
+    os.environ.get("CONVERSATION_ARCHIVE_STORAGE_CLASS", "STANDARD_IA"),
+)
 
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "ap-southeast-2")
 s3_client = boto3.client("s3", BEDROCK_REGION)
 
 
+def _compose_archive_path(user_id: str, conversation_id: str) -> str:
+    return f"{user_id}/{conversation_id}/archive/message_map.json.gz"
+
+
+def _load_message_map(item: dict) -> dict:
+    """Load the full message map of a conversation item.
+    The message map is stored inline, in the large message bucket or in the archive.
+    """
+    if item.get("IsArchived", False):
+        response = s3_client.get_object(
+            Bucket=CONVERSATION_ARCHIVE_BUCKET, Key=item["ArchivePath"]
+        )
+        return json.loads(gzip.decompress(response["Body"].read()).decode("utf-8"))
+
+    if item.get("IsLargeMessage", False):
+        response = s3_client.get_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
+        )
+        return json.loads(response["Body"].read().decode("utf-8"))
+
+    return json.loads(item["MessageMap"])
+
+
+def _compose_first_user_message(message_map: dict[str, MessageModel]) -> str:
+    """Compose text of the first user message, which is indexed for conversation suggestions."""
+    user_messages = [
+        message for message in message_map.values() if message.role == "user"
+    ]
+    if not user_messages:
+        return ""
+
+    first_message = min(user_messages, key=lambda message: message.create_time)
+    text = " ".join(
+        content.body
+        for content in first_message.content
+        if isinstance(content, TextContentModel)
+    )
+    return text[:FIRST_USER_MESSAGE_MAX_LENGTH]
+
+
 def store_conversation(
     user_id: str, conversation: ConversationModel, threshold=THRESHOLD_LARGE_MESSAGE
 ):
@@ -43,7 +106,7 @@ def store_conversation(
     table = get_conversation_table_client(user_id)
 
     item_params = {
-        "PK": user_id,
+        "PK": compose_partition_key(user_id, conversation.id),
         "SK": compose_conv_id(user_id, conversation.id),
         "Title": conversation.title,
         "CreateTime": decimal(conversation.create_time),
@@ -52,11 +115,17 @@ def store_conversation(
         "TotalPrice": decimal(str(conversation.total_price)),
         "LastMessageId": conversation.last_message_id,
         "ShouldContinue": conversation.should_continue,
+        # Used to find idle conversations to archive
+        "LastUpdateTime": decimal(get_current_time()),
     }
 
     if conversation.bot_id:
         item_params["BotId"] = conversation.bot_id
 
+    first_user_message = _compose_first_user_message(conversation.message_map)
+    if first_user_message:
+        item_params["FirstUserMessage"] = first_user_message
+
     message_map = {
         k: v.model_dump(by_alias=True) for k, v in conversation.message_map.items()
     }
@@ -83,9 +152,27 @@ def store_conversation(
         item_params["IsLargeMessage"] = False
         item_params["MessageMap"] = json.dumps(message_map)
 
-    response = table.put_item(
-        Item=item_params,
-    )
+    try:
+        response = table.put_item(
+            Item=item_params,
+            # NOTE: Archived conversations are rare, so check it only on conflict
+            ConditionExpression="attribute_not_exists(IsArchived)",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+
+        # The conversation is archived. Overwrite the stub to move it back to the hot tier.
+        logger.info(f"Restoring archived conversation: {conversation.id}")
+        response = table.put_item(
+            Item=item_params,
+        )
+        s3_client.delete_object(
+            Bucket=CONVERSATION_ARCHIVE_BUCKET,
+            Key=_compose_archive_path(user_id, conversation.id),
+        )
+
+    local_search.index_conversation(user_id, conversation, first_user_message)
     return response
 
 
@@ -93,8 +180,26 @@ def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
     logger.info(f"Finding conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
 
+    partition_keys = compose_partition_keys(user_id)
+    conversations = []
+    for partition_key in partition_keys:
+        conversations.extend(
+            _find_conversation_by_partition_key(table, user_id, partition_key)
+        )
+
+    if len(partition_keys) > 1:
+        # Merge the results of sharded partitions
+        conversations.sort(key=lambda c: c.create_time, reverse=True)
+
+    logger.info(f"Found conversations: {conversations}")
+    return conversations
+
+
+def _find_conversation_by_partition_key(
+    table, user_id: str, partition_key: str
+) -> list[ConversationMeta]:
     query_params = {
-        "KeyConditionExpression": Key("PK").eq(user_id)
+        "KeyConditionExpression": Key("PK").eq(partition_key)
         # NOTE: Need SK to fetch only conversations
         & Key("SK").begins_with(f"{user_id}#CONV#"),
         "ScanIndexForward": False,
@@ -144,7 +249,6 @@ def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
             logger.warning(f"Query count exceeded {MAX_QUERY_COUNT}")
             break
 
-    logger.info(f"Found conversations: {conversations}")
     return conversations
 
 
@@ -158,16 +262,16 @@ def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationM
     if len(response["Items"]) == 0:
         raise RecordNotFoundError(f"No conversation found with id: {conversation_id}")
 
-    # NOTE: conversation is unique
-    item = response["Items"][0]
-    if item.get("IsLargeMessage", False):
-        large_message_path = item["LargeMessagePath"]
-        response = s3_client.get_object(
-            Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path
-        )
-        message_map = json.loads(response["Body"].read().decode("utf-8"))
-    else:
-        message_map = json.loads(item["MessageMap"])
+    # NOTE: conversation is unique, except while it is being moved to its partition shard
+    partition_key = compose_partition_key(user_id, conversation_id)
+    item = next(
+        (item for item in response["Items"] if item["PK"] == partition_key),
+        response["Items"][0],
+    )
+    if item["PK"] != partition_key:
+        item = _move_to_partition_shard(table, item, user_id, conversation_id)
+    # NOTE: Archived conversations are rehydrated from S3 transparently
+    message_map = _load_message_map(item)
 
     conv = ConversationModel(
         id=decompose_conv_id(item["SK"]),
@@ -183,6 +287,43 @@ def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationM
     return conv
 
 
+def _move_to_partition_shard(
+    table, item: dict, user_id: str, conversation_id: str
+) -> dict:
+    """Move a conversation written before partition sharding to its shard,
+    so that subsequent writes do not duplicate the item. The conversation item in the shard is returned.
+    Items are put only if absent, because the item read from the eventually consistent `SKIndex` may be stale
+    while another request has already moved the conversation and added messages to it.
+    """
+    partition_key = compose_partition_key(user_id, conversation_id)
+    logger.info(f"Moving conversation {conversation_id} to partition {partition_key}")
+
+    related_document_items = _query_related_document_items(
+        table, item["PK"], f"{user_id}#RELATED_DOCUMENT#{conversation_id}#"
+    )
+    # NOTE: Write all items before deleting the old ones
+    moved_item = {**item, "PK": partition_key}
+    for old_item in [item, *related_document_items]:
+        try:
+            table.put_item(
+                Item={**old_item, "PK": partition_key},
+                ConditionExpression="attribute_not_exists(PK)",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+            # Already moved by another request. Keep the item in the shard.
+            if old_item is item:
+                moved_item = table.get_item(
+                    Key={"PK": partition_key, "SK": item["SK"]}, ConsistentRead=True
+                )["Item"]
+    with table.batch_writer() as writer:
+        for old_item in [item, *related_document_items]:
+            writer.delete_item(Key={"PK": old_item["PK"], "SK": old_item["SK"]})
+
+    return moved_item
+
+
 def delete_conversation_by_id(user_id: str, conversation_id: str):
     logger.info(f"Deleting conversation: {conversation_id}")
     table = get_conversation_table_client(user_id)
@@ -190,8 +331,11 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
     try:
         # Check if the conversation has a large message map
         response = table.get_item(
-            Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
-            ProjectionExpression="IsLargeMessage, LargeMessagePath",
+            Key={
+                "PK": compose_partition_key(user_id, conversation_id),
+                "SK": compose_conv_id(user_id, conversation_id),
+            },
+            ProjectionExpression="IsLargeMessage, LargeMessagePath, IsArchived, ArchivePath",
         )
 
         item = response.get("Item")
@@ -200,16 +344,25 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
             s3_client.delete_object(
                 Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
             )
+        if item and item.get("IsArchived", False):
+            # Delete the archived message map from S3
+            s3_client.delete_object(
+                Bucket=CONVERSATION_ARCHIVE_BUCKET, Key=item["ArchivePath"]
+            )
 
         # Delete the conversation from DynamoDB
         response = table.delete_item(
-            Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
+            Key={
+                "PK": compose_partition_key(user_id, conversation_id),
+                "SK": compose_conv_id(user_id, conversation_id),
+            },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
         delete_related_documents(
             user_id=user_id,
             conversation_id=conversation_id,
         )
+        local_search.remove_conversation(user_id, conversation_id)
 
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
@@ -226,17 +379,10 @@ def delete_conversation_by_user_id(user_id: str):
     logger.info(f"Deleting ALL conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
 
-    query_params = {
-        "KeyConditionExpression": Key("PK").eq(user_id)
-        # NOTE: Need SK to fetch only conversations
-        & Key("SK").begins_with(f"{user_id}#CONV#"),
-        "ProjectionExpression": "SK, IsLargeMessage, LargeMessagePath",
-    }
-
     def delete_batch(batch):
         with table.batch_writer() as writer:
             for item in batch:
-                writer.delete_item(Key={"PK": user_id, "SK": item["SK"]})
+                writer.delete_item(Key={"PK": item["PK"], "SK": item["SK"]})
 
     def delete_large_messages(items):
         for item in items:
@@ -244,31 +390,43 @@ def delete_conversation_by_user_id(user_id: str):
                 s3_client.delete_object(
                     Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
                 )
+            if item.get("IsArchived", False):
+                s3_client.delete_object(
+                    Bucket=CONVERSATION_ARCHIVE_BUCKET, Key=item["ArchivePath"]
+                )
 
     try:
-        response = table.query(
-            **query_params,
-        )
+        for partition_key in compose_partition_keys(user_id):
+            query_params = {
+                "KeyConditionExpression": Key("PK").eq(partition_key)
+                # NOTE: Need SK to fetch only conversations
+                & Key("SK").begins_with(f"{user_id}#CONV#"),
+                "ProjectionExpression": "PK, SK, IsLargeMessage, LargeMessagePath, IsArchived, ArchivePath",
+            }
+            response = table.query(
+                **query_params,
+            )
 
-        while True:
-            items = response.get("Items", [])
-            delete_large_messages(items)
+            while True:
+                items = response.get("Items", [])
+                delete_large_messages(items)
 
-            for i in range(0, len(items), TRANSACTION_BATCH_WRITE_SIZE):
-                batch = items[i : i + TRANSACTION_BATCH_WRITE_SIZE]
-                delete_batch(batch)
+                for i in range(0, len(items), TRANSACTION_BATCH_WRITE_SIZE):
+                    batch = items[i : i + TRANSACTION_BATCH_WRITE_SIZE]
+                    delete_batch(batch)
 
-            # Check if next page exists
-            if "LastEvaluatedKey" not in response:
-                break
+                # Check if next page exists
+                if "LastEvaluatedKey" not in response:
+                    break
 
-            # Load next page
-            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-            response = table.query(
-                **query_params,
-            )
+                # Load next page
+                query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+                response = table.query(
+                    **query_params,
+                )
 
         delete_related_documents(user_id=user_id)
+        local_search.remove_conversations_by_user_id(user_id)
 
     except ClientError as e:
         logger.error(f"An error occurred: {e.response['Error']['Message']}")
@@ -282,11 +440,14 @@ def change_conversation_title(user_id: str, conversation_id: str, new_title: str
     try:
         response = table.update_item(
             Key={
-                "PK": user_id,
+                "PK": compose_partition_key(user_id, conversation_id),
                 "SK": compose_conv_id(user_id, conversation_id),
             },
-            UpdateExpression="set Title=:t",
-            ExpressionAttributeValues={":t": new_title},
+            UpdateExpression="set Title=:t, LastUpdateTime=:u",
+            ExpressionAttributeValues={
+                ":t": new_title,
+                ":u": decimal(get_current_time()),
+            },
             ReturnValues="UPDATED_NEW",
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
@@ -299,6 +460,7 @@ def change_conversation_title(user_id: str, conversation_id: str, new_title: str
             raise e
 
     logger.info(f"Updated conversation title response: {response}")
+    local_search.update_conversation_title(user_id, conversation_id, new_title)
 
     return response
 
@@ -312,24 +474,140 @@ def update_feedback(
     message_map = conv.message_map
     message_map[message_id].feedback = feedback
 
-    response = table.update_item(
-        Key={
-            "PK": user_id,
-            "SK": compose_conv_id(user_id, conversation_id),
-        },
-        UpdateExpression="set MessageMap = :m",
-        ExpressionAttributeValues={
-            ":m": json.dumps(
-                {k: v.model_dump(by_alias=True) for k, v in message_map.items()}
-            )
-        },
-        ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-        ReturnValues="UPDATED_NEW",
-    )
+    try:
+        response = table.update_item(
+            Key={
+                "PK": compose_partition_key(user_id, conversation_id),
+                "SK": compose_conv_id(user_id, conversation_id),
+            },
+            UpdateExpression="set MessageMap = :m, LastUpdateTime = :u",
+            ExpressionAttributeValues={
+                ":m": json.dumps(
+                    {k: v.model_dump(by_alias=True) for k, v in message_map.items()}
+                ),
+                ":u": decimal(get_current_time()),
+            },
+            ConditionExpression="attribute_exists(PK) AND attribute_exists(SK) AND attribute_not_exists(IsArchived)",
+            ReturnValues="UPDATED_NEW",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+
+        # NOTE: The conversation was found above, so it must be archived.
+        # Store the whole conversation to restore it to the hot tier.
+        logger.info(f"Restoring archived conversation: {conversation_id}")
+        response = store_conversation(user_id, conv)
+
     logger.info(f"Updated feedback response: {response}")
     return response
 
 
+def find_idle_conversations(idle_before: int) -> Iterator[tuple[str, str]]:
+    """Find conversations which have not been updated since `idle_before` (epoch milliseconds).
+    Yields tuples of (user_id, conversation_id). Already archived conversations are skipped.
+    Warning: This scans the whole table. Use for only background jobs.
+    """
+    table = get_conversation_table_public_client()
+
+    scan_params = {
+        "FilterExpression": Attr("SK").contains("#CONV#")
+        & Attr("IsArchived").not_exists()
+        & (
+            Attr("LastUpdateTime").lt(idle_before)
+            # For backward compatibility, items without `LastUpdateTime` use `CreateTime`
+            | (Attr("LastUpdateTime").not_exists() & Attr("CreateTime").lt(idle_before))
+        ),
+        "ProjectionExpression": "PK, SK",
+    }
+
+    while True:
+        response = table.scan(**scan_params)
+        for item in response.get("Items", []):
+            yield decompose_partition_key(item["PK"]), decompose_conv_id(item["SK"])
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def archive_conversation(user_id: str, conversation_id: str) -> bool:
+    """Move the message map of a conversation to compressed S3 object.
+    A stub item which keeps the conversation metadata and the `system` message is left in DynamoDB,
+    so that the conversation is still listed by `find_conversation_by_user_id`.
+    `find_conversation_by_id` rehydrates the message map on demand.
+    Returns `False` if the conversation is not found, already archived or updated while archiving.
+    """
+    logger.info(f"Archiving conversation: {conversation_id}")
+    table = get_conversation_table_public_client()
+    key = {
+        "PK": compose_partition_key(user_id, conversation_id),
+        "SK": compose_conv_id(user_id, conversation_id),
+    }
+
+    item = table.get_item(Key=key).get("Item")
+    if item is None or item.get("IsArchived", False):
+        return False
+
+    message_map = _load_message_map(item)
+    archive_path = _compose_archive_path(user_id, conversation_id)
+    s3_client.put_object(
+        Bucket=CONVERSATION_ARCHIVE_BUCKET,
+        Key=archive_path,
+        Body=gzip.compress(json.dumps(message_map).encode("utf-8")),
+        ContentType="application/json",
+        StorageClass=CONVERSATION_ARCHIVE_STORAGE_CLASS,
+    )
+
+    stub = {
+        k: v
+        for k, v in item.items()
+        if k not in ("MessageMap", "IsLargeMessage", "LargeMessagePath")
+    }
+    stub["IsLargeMessage"] = False
+    # Keep only `system` attribute, which is used to list conversations with the model name
+    stub["MessageMap"] = json.dumps(
+        {k: v for k, v in message_map.items() if k == "system"}
+    )
+    stub["IsArchived"] = True
+    stub["ArchivePath"] = archive_path
+    stub["ArchivedTime"] = decimal(get_current_time())
+
+    # Make sure the conversation was not updated while archiving
+    if "LastUpdateTime" in item:
+        condition_expression = "LastUpdateTime = :last_update_time"
+        expression_attribute_values = {":last_update_time": item["LastUpdateTime"]}
+    else:
+        condition_expression = (
+            "attribute_not_exists(LastUpdateTime) AND LastMessageId = :last_message_id"
+        )
+        expression_attribute_values = {":last_message_id": item["LastMessageId"]}
+
+    try:
+        table.put_item(
+            Item=stub,
+            ConditionExpression=condition_expression,
+            ExpressionAttributeValues=expression_attribute_values,
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.info(f"Conversation {conversation_id} was updated. Skip archiving.")
+            s3_client.delete_object(
+                Bucket=CONVERSATION_ARCHIVE_BUCKET, Key=archive_path
+            )
+            return False
+        else:
+            raise e
+
+    if item.get("IsLargeMessage", False):
+        s3_client.delete_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
+        )
+
+    logger.info(f"Archived conversation: {conversation_id}")
+    return True
+
+
 def store_related_documents(
     user_id: str,
     conversation_id: str,
@@ -339,7 +617,7 @@ def store_related_documents(
     with table.batch_writer() as writer:
         for related_document in related_documents:
             item_params = {
-                "PK": user_id,
+                "PK": compose_partition_key(user_id, conversation_id),
                 "SK": compose_related_document_source_id(
                     user_id=user_id,
                     conversation_id=conversation_id,
@@ -354,23 +632,25 @@ def store_related_documents(
             writer.put_item(Item=item_params)
 
 
-def find_related_documents_by_conversation_id(
-    user_id: str,
-    conversation_id: str,
-) -> list[RelatedDocumentModel]:
-    table = get_conversation_table_client(user_id)
-    related_documents: list[RelatedDocumentModel] = []
+def _query_related_document_items(
+    table, partition_key: str, sort_key_prefix: str, projection_expression=None
+) -> list[dict]:
+    items: list[dict] = []
 
     last_evaluated_key = None
     while True:
         response = table.query(
             KeyConditionExpression=(
-                Key("PK").eq(user_id)
-                & Key("SK").begins_with(
-                    f"{user_id}#RELATED_DOCUMENT#{conversation_id}#"
-                )
+                Key("PK").eq(partition_key) & Key("SK").begins_with(sort_key_prefix)
             ),
             ScanIndexForward=False,
+            **(
+                {
+                    "ProjectionExpression": projection_expression,
+                }
+                if projection_expression is not None
+                else {}
+            ),
             **(
                 {
                     "ExclusiveStartKey": last_evaluated_key,
@@ -379,22 +659,36 @@ def find_related_documents_by_conversation_id(
                 else {}
             ),
         )
-        related_documents.extend(
-            RelatedDocumentModel(
-                content=TypeAdapter(ToolResultModel).validate_python(item["Content"]),
-                source_id=decompose_related_document_source_id(composed_id=item["SK"]),
-                source_name=item["SourceName"],
-                source_link=item["SourceLink"],
-                page_number=item.get("PageNumber"),
-            )
-            for item in response.get("Items") or []
-        )
+        items.extend(response.get("Items") or [])
 
         last_evaluated_key = response.get("LastEvaluatedKey")
         if last_evaluated_key is None:
             break
 
-    return related_documents
+    return items
+
+
+def find_related_documents_by_conversation_id(
+    user_id: str,
+    conversation_id: str,
+) -> list[RelatedDocumentModel]:
+    table = get_conversation_table_client(user_id)
+    items = _query_related_document_items(
+        table,
+        compose_partition_key(user_id, conversation_id),
+        f"{user_id}#RELATED_DOCUMENT#{conversation_id}#",
+    )
+
+    return [
+        RelatedDocumentModel(
+            content=TypeAdapter(ToolResultModel).validate_python(item["Content"]),
+            source_id=decompose_related_document_source_id(composed_id=item["SK"]),
+            source_name=item["SourceName"],
+            source_link=item["SourceLink"],
+            page_number=item.get("PageNumber"),
+        )
+        for item in items
+    ]
 
 
 def find_related_document_by_id(
@@ -432,40 +726,32 @@ def find_related_document_by_id(
 
 def delete_related_documents(user_id: str, conversation_id: str | None = None):
     table = get_conversation_table_client(user_id)
-    sort_keys: list[str] = []
+    partition_keys = (
+        [compose_partition_key(user_id, conversation_id)]
+        if conversation_id
+        else compose_partition_keys(user_id)
+    )
 
-    last_evaluated_key = None
-    while True:
-        response = table.query(
-            KeyConditionExpression=(
-                Key("PK").eq(user_id)
-                & Key("SK").begins_with(
+    keys: list[dict] = []
+    for partition_key in partition_keys:
+        keys.extend(
+            _query_related_document_items(
+                table,
+                partition_key,
+                (
                     f"{user_id}#RELATED_DOCUMENT#{conversation_id}#"
                     if conversation_id
                     else f"{user_id}#RELATED_DOCUMENT#"
-                )
-            ),
-            ProjectionExpression="SK",
-            ScanIndexForward=False,
-            **(
-                {
-                    "ExclusiveStartKey": last_evaluated_key,
-                }
-                if last_evaluated_key is not None
-                else {}
-            ),
+                ),
+                projection_expression="PK, SK",
+            )
         )
-        sort_keys.extend(item["SK"] for item in response.get("Items") or [])
-
-        last_evaluated_key = response.get("LastEvaluatedKey")
-        if last_evaluated_key is None:
-            break
 
     with table.batch_writer() as writer:
-        for sort_key in sort_keys:
+        for key in keys:
             writer.delete_item(
                 Key={
-                    "PK": user_id,
-                    "SK": sort_key,
+                    "PK": key["PK"],
+                    "SK": key["SK"],
                 },
             )
@@ -2,8 +2,16 @@ import logging
 import os
 from typing import Optional
 
-from app.repositories.common import get_opensearch_client
-from app.repositories.models.conversation_search import ConversationSearchModel
+from app.repositories.common import (
+    get_opensearch_client,
+    search_opensearch,
+    search_result_cache,
+)
+from app.repositories import local_search
+from app.repositories.models.conversation_search import (
+    ConversationSearchModel,
+    ConversationSuggestionModel,
+)
 from app.user import User
 from opensearchpy import OpenSearch
 
@@ -14,6 +22,15 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def _compose_user_filter(user: User) -> list[dict]:
+    """Filter conversations belonging to the user."""
+    # Combining both filtering conditions for more restrictive search
+    return [
+        {"term": {"PK.keyword": user.id}},
+        {"prefix": {"SK.keyword": f"{user.id}#CONV#"}},
+    ]
+
+
 def find_conversations_by_query(
     query: str,
     user: User,
@@ -22,17 +39,24 @@ def find_conversations_by_query(
 ) -> list[ConversationSearchModel]:
     """Search conversations by query string.
     This method searches through both the conversation title and message content.
+    Results are cached for a short time unless `client` is given.
+    The local index is used instead if `SEARCH_BACKEND=local`.
     """
-    client = client or get_opensearch_client(collection_type="conversation")
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_conversations_by_query(query, user, limit)
+
+    cache_key = ("conversations", user.id, tuple(user.groups), query, limit)
+    if client is None:
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Found cached conversations matching query: {query}")
+            return list(cached)
+        client = get_opensearch_client(collection_type="conversation")
 
     logger.info(f"Searching conversations with query: {query} in index: {INDEX_NAME}")
 
     # Only search conversations belonging to the user
-    # Combining both filtering conditions for more restrictive search
-    filter_must = [
-        {"term": {"PK.keyword": user.id}},
-        {"prefix": {"SK.keyword": f"{user.id}#CONV#"}},
-    ]
+    filter_must = _compose_user_filter(user)
 
     search_body = {
         "query": {
@@ -117,7 +141,9 @@ def find_conversations_by_query(
     logger.debug(f"Search body: {search_body}")
 
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
+        response = search_opensearch(
+            client, INDEX_NAME, search_body, "find_conversations_by_query"
+        )
         logger.debug(f"Search response: {response}")
 
         conversations = []
@@ -131,7 +157,78 @@ def find_conversations_by_query(
                 logger.error(f"Error processing hit: {e}, hit: {hit}")
                 continue
         logger.info(f"Found {len(conversations)} conversations matching query: {query}")
-        return conversations
+        search_result_cache.set(cache_key, conversations)
+        return list(conversations)
     except Exception as e:
         logger.error(f"Error searching conversations: {e}")
         raise
+
+
+def find_conversation_suggestions(
+    query: str,
+    user: User,
+    limit: int = 5,
+    client: OpenSearch | None = None,
+) -> list[ConversationSuggestionModel]:
+    """Suggest conversations whose title or first user message has words starting with the query.
+    Used as search-as-you-type, so only edge n-gram fields are matched without highlights and sorting by messages,
+    and only ids and titles are fetched. Use `find_conversations_by_query` for full search results.
+    Results are cached for a short time unless `client` is given.
+    The local index is used instead if `SEARCH_BACKEND=local`.
+    """
+    if client is None and local_search.is_local_search_enabled():
+        return local_search.find_conversation_suggestions(query, user, limit)
+
+    cache_key = ("conversation_suggestions", user.id, tuple(user.groups), query, limit)
+    if client is None:
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        client = get_opensearch_client(collection_type="conversation")
+
+    search_body = {
+        "_source": ["SK", "Title"],
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "match": {
+                            "Title.suggest": {
+                                "query": query,
+                                "operator": "and",
+                                "boost": 2.0,
+                            }
+                        }
+                    },
+                    {
+                        "match": {
+                            "FirstUserMessage.suggest": {
+                                "query": query,
+                                "operator": "and",
+                            }
+                        }
+                    },
+                ],
+                "minimum_should_match": 1,
+                "filter": {"bool": {"must": _compose_user_filter(user)}},
+            }
+        },
+        "sort": [{"_score": {"order": "desc"}}, {"CreateTime": {"order": "desc"}}],
+        "size": limit,
+    }
+
+    logger.debug(f"Suggest body: {search_body}")
+
+    try:
+        response = search_opensearch(
+            client, INDEX_NAME, search_body, "find_conversation_suggestions"
+        )
+        suggestions = [
+            ConversationSuggestionModel.from_opensearch_response(hit)
+            for hit in response["hits"]["hits"]
+        ]
+        search_result_cache.set(cache_key, suggestions)
+        return list(suggestions)
+    except Exception as e:
+        logger.error(f"Error suggesting conversations: {e}")
+        raise
@@ -2,15 +2,19 @@ import base64
 import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal as decimal
 from typing import Union
 
 import boto3
 from app.config import DEFAULT_GENERATION_CONFIG
+from app.repositories import local_search
 from app.repositories.common import (
     TRANSACTION_BATCH_READ_SIZE,
     RecordNotFoundError,
+    compose_access_principals,
     compose_item_type,
     compose_sk,
     get_bot_table_client,
@@ -32,13 +36,30 @@ from app.repositories.models.custom_bot import (
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
 from app.repositories.models.custom_bot_kb import BedrockKnowledgeBaseModel
 from app.routes.schemas.bot import type_shared_scope, type_sync_status
-from app.utils import get_current_time
+from app.utils import TTLCache, get_current_time
 from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
 
+# Cache of original bot items referred by aliases. Key: (owner user id, bot id)
+# Starred and recently used bots of the home page refer the same shared bots on each render.
+ORIGINAL_BOT_CACHE_TTL_SECONDS = int(
+    os.environ.get("ORIGINAL_BOT_CACHE_TTL_SECONDS", "30")
+)
+original_bot_cache: TTLCache[tuple[str, str], dict] = TTLCache(
+    maxsize=1000, ttl_seconds=ORIGINAL_BOT_CACHE_TTL_SECONDS
+)
+MAX_CONCURRENT_BATCH_READS = 4
+BATCH_READ_MAX_ATTEMPTS = 5
+BATCH_READ_BASE_DELAY_SECONDS = 0.05
+# `PublishedBotIndex` is not created on the first deployment of an upgrade.
+# See docs/migration/BOT_TABLE_INDEXES.md
+PUBLISHED_BOT_INDEX_ENABLED = (
+    os.environ.get("PUBLISHED_BOT_INDEX_ENABLED", "true").lower() == "true"
+)
+
 
 class BotNotFoundException(Exception):
     """Exception raised when a bot is not found."""
@@ -68,6 +89,12 @@ def store_bot(custom_bot: BotModel):
         "SharedStatus": custom_bot.shared_status,
         "AllowedCognitoGroups": custom_bot.allowed_cognito_groups,
         "AllowedCognitoUsers": custom_bot.allowed_cognito_users,
+        "AccessPrincipals": compose_access_principals(
+            custom_bot.owner_user_id,
+            custom_bot.shared_scope,
+            custom_bot.allowed_cognito_users,
+            custom_bot.allowed_cognito_groups,
+        ),
         "GenerationParams": custom_bot.generation_params.model_dump(),
         "AgentData": custom_bot.agent.model_dump(),
         "Knowledge": custom_bot.knowledge.model_dump(),
@@ -87,18 +114,29 @@ def store_bot(custom_bot: BotModel):
 
     if custom_bot.last_used_time:
         item["LastUsedTime"] = decimal(custom_bot.last_used_time)
+    # Sort key of `OwnedBotIndex`. Set only on bot items to keep aliases out of the index.
+    item["LastUsedOrCreateTime"] = decimal(
+        custom_bot.last_used_time or custom_bot.create_time
+    )
     if custom_bot.shared_scope != "private":
         # To use sparse index, set `SharedScope` attribute only when it's not private
         item["SharedScope"] = custom_bot.shared_scope
     if custom_bot.is_starred:
         # To use sparse index, set `IsStarred` attribute only when it's starred
         item["IsStarred"] = "TRUE"
+    if custom_bot.published_api_stack_name:
+        # To use sparse index, set `IsPublished` attribute only when it's published
+        item["IsPublished"] = "TRUE"
+        item["PublishedTime"] = decimal(
+            custom_bot.published_api_datetime or custom_bot.create_time
+        )
     if custom_bot.bedrock_knowledge_base:
         item["BedrockKnowledgeBase"] = custom_bot.bedrock_knowledge_base.model_dump()
     if custom_bot.bedrock_guardrails:
         item["GuardrailsParams"] = custom_bot.bedrock_guardrails.model_dump()
 
     response = table.put_item(Item=item)
+    local_search.index_bot_item(item)
     logger.info(f"Stored bot: {custom_bot.id} successfully")
     return response
 
@@ -125,6 +163,7 @@ def update_bot(
     """
     table = get_bot_table_client()
     logger.info(f"Updating bot: {bot_id}")
+    invalidate_original_bot_cache(owner_user_id, bot_id)
 
     update_expression = (
         "SET Title = :title, "
@@ -181,6 +220,7 @@ def update_bot(
         else:
             raise e
 
+    local_search.index_bot_item(response["Attributes"])
     return response
 
 
@@ -216,67 +256,6 @@ def store_alias(user_id: str, alias: BotAliasModel):
     return response
 
 
-def update_bot_last_used_time(user_id: str, bot_id: str):
-    """Update last used time for bot."""
-    table = get_bot_table_client()
-    logger.info(f"Updating last used time for bot: {bot_id}")
-    try:
-        response = table.update_item(
-            Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET LastUsedTime = :val",
-            ExpressionAttributeValues={":val": decimal(get_current_time())},
-            ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-        )
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            raise RecordNotFoundError(f"Bot with id {bot_id} not found")
-        else:
-            raise e
-    return response
-
-
-def update_alias_last_used_time(user_id: str, original_bot_id: str):
-    """Update last used time for alias."""
-    table = get_bot_table_client()
-    logger.info(f"Updating last used time for alias: {original_bot_id}")
-    try:
-        response = table.update_item(
-            Key={"PK": user_id, "SK": compose_sk(original_bot_id, "alias")},
-            UpdateExpression="SET LastUsedTime = :val",
-            ExpressionAttributeValues={":val": decimal(get_current_time())},
-            ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-        )
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            raise RecordNotFoundError(f"Alias with id {original_bot_id} not found")
-        else:
-            raise e
-    return response
-
-
-def update_bot_stats(owner_user_id: str, bot_id: str, increment: int):
-    """Update usage stats for bot.
-    Currently only supports incrementing usage count.
-    """
-    table = get_bot_table_client()
-    logger.info(f"Updating usage stats for bot: {bot_id}")
-
-    try:
-        response = table.update_item(
-            Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET UsageStats.usage_count = if_not_exists(UsageStats.usage_count, :zero) + :val",
-            ExpressionAttributeValues={":zero": 0, ":val": increment},
-            ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-            ReturnValues="ALL_NEW",
-        )
-        return response
-    except ClientError as e:
-        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
-            raise RecordNotFoundError(f"Bot with id {bot_id} not found")
-        else:
-            raise e
-
-
 def update_bot_star_status(user_id: str, bot_id: str, starred: bool):
     """Update starred status for bot."""
     table = get_bot_table_client()
@@ -300,6 +279,7 @@ def update_bot_star_status(user_id: str, bot_id: str, starred: bool):
             ReturnValues="ALL_NEW",
         )
 
+    local_search.index_bot_item(response["Attributes"])
     logger.info(f"Updated starred status for bot: {bot_id} successfully")
     return response
 
@@ -336,6 +316,7 @@ def update_knowledge_base_id(
 ):
     table = get_bot_table_client()
     logger.info(f"Updating knowledge base id for bot: {bot_id}")
+    invalidate_original_bot_cache(user_id, bot_id)
 
     try:
         response = table.update_item(
@@ -348,6 +329,7 @@ def update_knowledge_base_id(
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
         )
+        local_search.index_bot_item(response["Attributes"])
         logger.info(f"Updated knowledge base id for bot: {bot_id} successfully")
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
@@ -396,12 +378,16 @@ def update_bot_shared_status(
     """Update shared status for bot."""
     table = get_bot_table_client()
     logger.info(f"Updating shared status for bot: {bot_id}")
+    invalidate_original_bot_cache(owner_user_id, bot_id)
 
-    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids"
+    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids, AccessPrincipals = :access_principals"
     expression_attribute_values = {
         ":shared_status": shared_status,
         ":allowed_user_ids": allowed_user_ids,
         ":allowed_group_ids": allowed_group_ids,
+        ":access_principals": compose_access_principals(
+            owner_user_id, shared_scope, allowed_user_ids, allowed_group_ids
+        ),
     }
 
     if shared_scope != "private":
@@ -418,6 +404,7 @@ def update_bot_shared_status(
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
         )
+        local_search.index_bot_item(response["Attributes"])
         logger.info(f"Updated shared status for bot: {bot_id} successfully")
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
@@ -448,74 +435,184 @@ def update_alias_is_origin_accessible(
     return response
 
 
-def find_owned_bots_by_user_id(user_id: str, limit: int | None = None) -> list[BotMeta]:
-    """Find all owned bots by user id.
-    The order is descending by `last_used_time`.
+# Attributes required by `BotMeta`. Heavy attributes such as `Instruction` and `Knowledge` are not fetched.
+BOT_META_ATTRIBUTES = [
+    "PK",
+    "SK",
+    "ItemType",
+    "BotId",
+    "Title",
+    "Description",
+    "CreateTime",
+    "LastUsedTime",
+    "IsStarred",
+    "SyncStatus",
+    "BedrockKnowledgeBase",
+    "SharedScope",
+    "SharedStatus",
+]
+
+
+def find_owned_bots_page(
+    user_id: str, limit: int | None = None, next_token: str | None = None
+) -> tuple[list[BotMeta], str | None]:
+    """Find a page of owned bots by user id.
+    The order is descending by `last_used_time`, falling back to `create_time` for unused bots.
+    Returns the bots and the token to fetch the next page, which is None on the last page.
     """
     table = get_bot_table_client()
     logger.info(f"Finding bots for user: {user_id}")
 
+    # `OwnedBotIndex` is a sparse index which contains only bot items having `LastUsedOrCreateTime`,
+    # so the latest bots are read directly without scanning aliases or sorting in application.
     query_params = {
-        "IndexName": "ItemTypeIndex",
+        "IndexName": "OwnedBotIndex",
         "KeyConditionExpression": Key("ItemType").eq(compose_item_type(user_id, "bot")),
-        # "ScanIndexForward": False,
+        "ScanIndexForward": False,
+        "ProjectionExpression": ", ".join(
+            f"#{attribute}" for attribute in BOT_META_ATTRIBUTES
+        ),
+        "ExpressionAttributeNames": {
+            f"#{attribute}": attribute for attribute in BOT_META_ATTRIBUTES
+        },
     }
+    if limit:
+        query_params["Limit"] = limit
+    if next_token:
+        exclusive_start_key = json.loads(base64.b64decode(next_token).decode("utf-8"))
+        if exclusive_start_key.get("ItemType") != compose_item_type(user_id, "bot"):
+            raise ValueError("Invalid next token.")
+        query_params["ExclusiveStartKey"] = exclusive_start_key
+
+    response = table.query(**query_params)
 
+    bots = [
+        BotMeta.from_dynamo_item(item, owned=True, is_origin_accessible=True)
+        for item in response["Items"]
+    ]
+
+    next_token = None
+    if "LastEvaluatedKey" in response:
+        next_token = base64.b64encode(
+            json.dumps(response["LastEvaluatedKey"], default=int).encode("utf-8")
+        ).decode("utf-8")
+
+    return bots, next_token
+
+
+def find_owned_bots_by_user_id(user_id: str, limit: int | None = None) -> list[BotMeta]:
+    """Find all owned bots by user id.
+    The order is descending by `last_used_time`.
+    """
     bots: list[BotMeta] = []
+    next_token: str | None = None
     query_count = 0
     MAX_QUERY_COUNT = 5
 
     while query_count < MAX_QUERY_COUNT:
         query_count += 1
-        response = table.query(**query_params)
-
-        bots = [
-            BotMeta.from_dynamo_item(item, owned=True, is_origin_accessible=True)
-            for item in response["Items"]
-        ]
+        page, next_token = find_owned_bots_page(
+            user_id,
+            limit=limit - len(bots) if limit else None,
+            next_token=next_token,
+        )
+        bots.extend(page)
 
         if limit and len(bots) >= limit:
             break
-        if "LastEvaluatedKey" not in response:
+        if next_token is None:
             break
-        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
-    if query_count == MAX_QUERY_COUNT:
+    if query_count == MAX_QUERY_COUNT and next_token is not None:
         logger.warning("There are more bots than the query limit.")
 
-    if limit:
-        bots = bots[:limit]
-
-    # Sort by last used time.
-    # NOTE:
-    # Sorting approaches in DynamoDB:
-    #
-    # 1. DynamoDB Sort Key: Using sort key in indexes allows ordered retrieval directly from the database.
-    #    - Efficient for large datasets
-    #    - Requires the sort key attribute to always exist in items
-    #    - Items without the sort key attribute won't appear in the index
-    #
-    # 2. Application-side sorting: Retrieve all items and sort in application code.
-    #    - More flexible handling of missing attributes
-    #    - Reasonable performance for smaller datasets (hundreds of items)
-    #    - Requires fetching all items before sorting
-    #
-    # `LastUsedTime` considerations:
-    # - Used as sort key in `LastUsedTimeIndex` LSI for recently used bot queries
-    # - New bots initially have no `LastUsedTime`, which is problematic when used as GSI sort key
-    # - Having newly created bots appear at the top of "recently used" lists is counterintuitive
-    #
-    # We chose to remove `LastUsedTime` as sort key from ItemTypeIndex because:
-    # - Newly created bots should be retrievable but not necessarily treated as "recently used"
-    # - Application-side sorting gives more flexibility in handling default values
-    # - Performance impact is minimal with expected dataset size (hundreds of bots per user)
-    # - Simplifies bot creation by not requiring `LastUsedTime` to be set initially
-    bots.sort(key=lambda x: x.last_used_time, reverse=True)
-
     logger.info(f"Found all owned {len(bots)} bots.")
     return bots
 
 
+def invalidate_original_bot_cache(owner_user_id: str, bot_id: str):
+    """Remove the bot from the cache of original bots referred by aliases."""
+    original_bot_cache.invalidate(lambda key: key == (owner_user_id, bot_id))
+
+
+def _batch_get_bot_items(keys: list[dict]) -> list[dict]:
+    """Batch get bot items with `BotMeta` attributes.
+    Unprocessed keys are retried with exponential backoff.
+    """
+    client = get_dynamodb_client(
+        table_type="bot"
+    )  # Use DynamoDB client for batch_get_item
+    table_name = get_bot_table_client().table_name
+
+    items: list[dict] = []
+    request_items = {
+        table_name: {
+            "Keys": keys,
+            "ProjectionExpression": ", ".join(
+                f"#{attribute}" for attribute in BOT_META_ATTRIBUTES
+            ),
+            "ExpressionAttributeNames": {
+                f"#{attribute}": attribute for attribute in BOT_META_ATTRIBUTES
+            },
+        }
+    }
+    for attempt in range(BATCH_READ_MAX_ATTEMPTS):
+        if attempt > 0:
+            time.sleep(BATCH_READ_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+
+        response = client.batch_get_item(RequestItems=request_items)
+        items.extend(response.get("Responses", {}).get(table_name, []))
+
+        request_items = response.get("UnprocessedKeys", {})
+        if not request_items:
+            return items
+
+    raise RuntimeError(
+        f"Failed to get {len(request_items[table_name]['Keys'])} bots after {BATCH_READ_MAX_ATTEMPTS} attempts."
+    )
+
+
+def find_original_bot_items(
+    keys: list[tuple[str, str]],
+) -> dict[tuple[str, str], dict]:
+    """Find original bot items referred by aliases.
+    Args:
+        keys: List of (owner user id, bot id).
+    Returns:
+        Map of (owner user id, bot id) to bot item. Bots not found are not contained.
+    Cached items are reused and the rest are batch read concurrently.
+    """
+    found: dict[tuple[str, str], dict] = {}
+    missing: list[tuple[str, str]] = []
+    for key in dict.fromkeys(keys):
+        item = original_bot_cache.get(key)
+        if item is not None:
+            found[key] = item
+        else:
+            missing.append(key)
+
+    chunks = [
+        [
+            {"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")}
+            for owner_user_id, bot_id in missing[i : i + TRANSACTION_BATCH_READ_SIZE]
+        ]
+        for i in range(0, len(missing), TRANSACTION_BATCH_READ_SIZE)
+    ]
+    if not chunks:
+        return found
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(chunks), MAX_CONCURRENT_BATCH_READS)
+    ) as executor:
+        for items in executor.map(_batch_get_bot_items, chunks):
+            for item in items:
+                key = (item["PK"], item["BotId"])
+                original_bot_cache.set(key, item)
+                found[key] = item
+
+    return found
+
+
 def __find_bots_with_condition(
     query_params: dict,
     max_query_count: int = 5,
@@ -528,9 +625,6 @@ def __find_bots_with_condition(
     4. Process aliases. Batch get their original bots using DynamoDB client.
     5. If original bot is not found, create a BotMeta object with `is_origin_accessible=False`.
     """
-    client = get_dynamodb_client(
-        table_type="bot"
-    )  # Use DynamoDB client for batch_get_item
     table = get_bot_table_client()
     bots = []
     query_count = 0
@@ -556,58 +650,37 @@ def __find_bots_with_condition(
 
         # Process aliases and batch get original bots
         if alias_items:
-            original_bot_ids = [item["OriginalBotId"] for item in alias_items]
-
-            for i in range(0, len(original_bot_ids), TRANSACTION_BATCH_READ_SIZE):
-                batch_ids = original_bot_ids[i : i + TRANSACTION_BATCH_READ_SIZE]
-                batch_aliases = alias_items[i : i + TRANSACTION_BATCH_READ_SIZE]
-                request_items = {
-                    table.table_name: {
-                        "Keys": [
-                            {
-                                "PK": alias["OwnerUserId"],
-                                "SK": compose_sk(bot_id, "bot"),
-                            }
-                            for alias, bot_id in zip(batch_aliases, batch_ids)
-                        ]
-                    }
-                }
-                original_bots_response = client.batch_get_item(
-                    RequestItems=request_items
-                )
-
-                # Create a map of original bot details
-                original_bot_map = {
-                    item.get("BotId"): item
-                    for item in original_bots_response.get("Responses", {}).get(
-                        table.table_name, []
-                    )
-                }
+            original_bot_map = find_original_bot_items(
+                [
+                    (alias["OwnerUserId"], alias["OriginalBotId"])
+                    for alias in alias_items
+                ]
+            )
 
-                # Create BotMeta objects for aliases
-                for alias in alias_items[i : i + TRANSACTION_BATCH_READ_SIZE]:
-                    original_bot = original_bot_map.get(alias["OriginalBotId"])
-                    if original_bot:
-                        bots.append(
-                            BotMeta.from_dynamo_item(
-                                original_bot,
-                                owned=False,
-                                is_origin_accessible=alias.get(
-                                    "IsOriginAccessible", False
-                                ),
-                                is_starred=alias.get("IsStarred", False),
-                            )
+            # Create BotMeta objects for aliases
+            for alias in alias_items:
+                original_bot = original_bot_map.get(
+                    (alias["OwnerUserId"], alias["OriginalBotId"])
+                )
+                if original_bot:
+                    bots.append(
+                        BotMeta.from_dynamo_item(
+                            original_bot,
+                            owned=False,
+                            is_origin_accessible=alias.get("IsOriginAccessible", False),
+                            is_starred=alias.get("IsStarred", False),
                         )
-                    else:
-                        # If original bot is not found, create a BotMeta object with `is_origin_accessible=False`
-                        bots.append(
-                            BotMeta.from_dynamo_alias_item(
-                                alias,
-                                owned=False,
-                                is_origin_accessible=False,
-                                is_starred=alias.get("IsStarred", False),
-                            )
+                    )
+                else:
+                    # If original bot is not found, create a BotMeta object with `is_origin_accessible=False`
+                    bots.append(
+                        BotMeta.from_dynamo_alias_item(
+                            alias,
+                            owned=False,
+                            is_origin_accessible=False,
+                            is_starred=alias.get("IsStarred", False),
                         )
+                    )
 
         if "LastEvaluatedKey" not in response:
             break
@@ -714,6 +787,9 @@ def find_bot_by_id(bot_id: str) -> BotModel:
         sync_status=item["SyncStatus"],
         sync_status_reason=item["SyncStatusReason"],
         sync_last_exec_id=item["LastExecId"],
+        sync_completed_time=(
+            int(item["SyncCompletedTime"]) if "SyncCompletedTime" in item else None
+        ),
         published_api_stack_name=item.get("ApiPublishmentStackName", None),
         published_api_datetime=item.get("ApiPublishedDatetime", None),
         published_api_codebuild_id=item.get("ApiPublishCodeBuildId", None),
@@ -755,8 +831,8 @@ def find_bot_by_id(bot_id: str) -> BotModel:
     return bot
 
 
-def find_pinned_public_bots() -> list[BotMeta]:
-    """Find all pinned bots."""
+def find_pinned_public_bot_items() -> list[dict]:
+    """Find items of all pinned bots."""
     table = get_bot_table_client()
     logger.info("Finding pinned bots")
 
@@ -765,11 +841,15 @@ def find_pinned_public_bots() -> list[BotMeta]:
         KeyConditionExpression=Key("SharedScope").eq("all")
         & Key("SharedStatus").begins_with("pinned"),
     )
+    return response["Items"]
+
 
+def find_pinned_public_bots() -> list[BotMeta]:
+    """Find all pinned bots."""
     bots = [
         # Note: pinned bot should not be editable directly, so `owned=False`
         BotMeta.from_dynamo_item(item, owned=False, is_origin_accessible=True)
-        for item in response["Items"]
+        for item in find_pinned_public_bot_items()
     ]
 
     logger.info(f"Found all pinned {len(bots)} bots.")
@@ -801,13 +881,15 @@ def update_bot_publication(
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id",
+            # `IsPublished` and `PublishedTime` are the keys of `PublishedBotIndex` sparse index
+            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id, IsPublished = :is_published, PublishedTime = :time",
             # NOTE: Stack naming rule: ApiPublishmentStack{published_api_id}.
             # See bedrock-chat-stack.ts > `ApiPublishmentStack`
             ExpressionAttributeValues={
                 ":val": f"ApiPublishmentStack{published_api_id}",
                 ":time": current_time,
                 ":build_id": build_id,
+                ":is_published": "TRUE",
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
@@ -826,7 +908,7 @@ def delete_bot_publication(owner_user_id: str, bot_id: str):
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId",
+            UpdateExpression="REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId, IsPublished, PublishedTime",
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
     except ClientError as e:
@@ -841,6 +923,7 @@ def delete_bot_publication(owner_user_id: str, bot_id: str):
 def delete_bot_by_id(owner_user_id: str, bot_id: str):
     table = get_bot_table_client()
     logger.info(f"Deleting bot with id: {bot_id}")
+    invalidate_original_bot_cache(owner_user_id, bot_id)
 
     try:
         response = table.delete_item(
@@ -853,6 +936,7 @@ def delete_bot_by_id(owner_user_id: str, bot_id: str):
         else:
             raise e
 
+    local_search.remove_bot(bot_id)
     return response
 
 
@@ -881,7 +965,7 @@ def remove_bot_last_used_time(user_id: str, bot_id: str):
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="REMOVE LastUsedTime",
+            UpdateExpression="SET LastUsedOrCreateTime = CreateTime REMOVE LastUsedTime",
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
     except ClientError as e:
@@ -945,14 +1029,29 @@ def find_alias_by_bot_id(user_id: str, original_bot_id: str) -> BotAliasModel:
 def find_all_published_bots(
     limit: int = 1000, next_token: str | None = None
 ) -> tuple[list[BotMetaWithStackInfo], str | None]:
+    """Find published bots. The order is descending by published time.
+    Returns the bots and the token to fetch the next page, which is None on the last page.
+    """
     table = get_bot_table_client()
-    query_params = {
-        "IndexName": "SharedScopeIndex",
-        "KeyConditionExpression": Key("SharedScope").eq("all"),
-        "FilterExpression": Attr("ApiPublishmentStackName").exists()
-        & Attr("ApiPublishmentStackName").ne(None),
-        "Limit": limit,
-    }
+    if PUBLISHED_BOT_INDEX_ENABLED:
+        # `PublishedBotIndex` is a sparse index which contains only published bots,
+        # so every item read is returned without filtering.
+        query_params = {
+            "IndexName": "PublishedBotIndex",
+            "KeyConditionExpression": Key("IsPublished").eq("TRUE"),
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+    else:
+        # Until the index is created, public bots are read and unpublished ones are filtered out.
+        # The order is not defined in this case.
+        query_params = {
+            "IndexName": "SharedScopeIndex",
+            "KeyConditionExpression": Key("SharedScope").eq("all"),
+            "FilterExpression": Attr("ApiPublishmentStackName").exists()
+            & Attr("ApiPublishmentStackName").ne(None),
+            "Limit": limit,
+        }
     if next_token:
         query_params["ExclusiveStartKey"] = json.loads(
             base64.b64decode(next_token).decode("utf-8")
@@ -980,7 +1079,7 @@ def find_all_published_bots(
     next_token = None
     if "LastEvaluatedKey" in response:
         next_token = base64.b64encode(
-            json.dumps(response["LastEvaluatedKey"]).encode("utf-8")
+            json.dumps(response["LastEvaluatedKey"], default=int).encode("utf-8")
         ).decode("utf-8")
 
     return bots, next_token
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+from decimal import Decimal as decimal
+
+from app.repositories.common import (
+    compose_partition_key,
+    get_conversation_table_client,
+)
+from app.utils import get_current_time
+from botocore.exceptions import ClientError
+
+# Requests with the same idempotency key within this period are treated as retries
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+
+def _compose_key(user_id: str, idempotency_key: str) -> dict:
+    # Hash to bound the key size regardless of the client supplied value
+    digest = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+    return {
+        "PK": compose_partition_key(user_id, digest),
+        # Add user_id prefix for row level security to match with `LeadingKeys` condition
+        "SK": f"{user_id}#IDEMPOTENCY#{digest}",
+    }
+
+
+def store_idempotency_record(
+    user_id: str, idempotency_key: str, value: dict
+) -> dict | None:
+    """Store `value` for the key with a conditional write.
+    If a request with the same key was already stored and not expired, its value is returned and nothing is stored.
+    """
+    table = get_conversation_table_client(user_id)
+    key = _compose_key(user_id, idempotency_key)
+    now = get_current_time()
+    try:
+        table.put_item(
+            Item={
+                **key,
+                "Value": json.dumps(value),
+                "CreateTime": decimal(now),
+                # TTL attribute must be epoch seconds
+                "ExpireTime": now // 1000 + IDEMPOTENCY_TTL_SECONDS,
+            },
+            # DynamoDB TTL may delete expired items days later
+            ConditionExpression="attribute_not_exists(PK) OR ExpireTime < :now",
+            ExpressionAttributeValues={":now": now // 1000},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+
+        item = table.get_item(Key=key, ConsistentRead=True).get("Item")
+        if item is None:
+            # Deleted after the conditional check
+            return store_idempotency_record(user_id, idempotency_key, value)
+        return json.loads(item["Value"])
+
+    return None
+
+
+def delete_idempotency_record(user_id: str, idempotency_key: str):
+    """Delete the record so that the request can be retried, e.g. when the request failed."""
+    get_conversation_table_client(user_id).delete_item(
+        Key=_compose_key(user_id, idempotency_key)
+    )
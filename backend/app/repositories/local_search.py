@@ -0,0 +1,530 @@
+"""In-process full-text index used instead of OpenSearch when `SEARCH_BACKEND=local`.
+
+Intended for local development against DynamoDB Local and for small single-process deployments,
+where provisioning an OpenSearch Serverless collection is costly and slow to start.
+Documents are kept in SQLite FTS5 tables ranked by BM25, and are written by the repository write paths
+instead of the OpenSearch ingestion pipeline. The index file is not shared between processes,
+so do not use this backend with multiple Lambda execution environments.
+
+Differences from OpenSearch:
+- Fuzzy matching of bot search is approximated by prefix matching of terms.
+- One highlighted fragment is returned for the message bodies.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from decimal import Decimal as decimal
+from typing import Literal
+
+from app.repositories.common import (
+    compose_conv_id,
+    compose_user_access_principals,
+    decompose_conv_id,
+)
+from app.repositories.models.conversation import ConversationModel, TextContentModel
+from app.repositories.models.conversation_search import (
+    ConversationSearchModel,
+    ConversationSuggestionModel,
+    SearchHighlightModel,
+)
+from app.repositories.models.custom_bot import BotMeta
+from app.user import User
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# "opensearch" or "local"
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "opensearch")
+LOCAL_SEARCH_INDEX_PATH = os.environ.get(
+    "LOCAL_SEARCH_INDEX_PATH",
+    os.path.join(tempfile.gettempdir(), "bedrock_local_search.sqlite3"),
+)
+HIGHLIGHT_PRE_TAG = "<em>"
+HIGHLIGHT_POST_TAG = "</em>"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversation (
+    id INTEGER PRIMARY KEY,
+    sk TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    bot_id TEXT,
+    last_updated_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversation_user_id ON conversation (user_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS conversation_fts USING fts5(
+    title, body, first_user_message, tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS bot (
+    id INTEGER PRIMARY KEY,
+    bot_id TEXT NOT NULL UNIQUE,
+    shared_scope TEXT NOT NULL,
+    usage_count INTEGER NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS bot_fts USING fts5(
+    title, description, instruction, tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS bot_principal (
+    principal TEXT NOT NULL,
+    bot_rowid INTEGER NOT NULL,
+    PRIMARY KEY (principal, bot_rowid)
+);
+CREATE INDEX IF NOT EXISTS bot_principal_bot_rowid ON bot_principal (bot_rowid);
+"""
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+_connection: sqlite3.Connection | None = None
+# SQLite connection is shared by threads, so every access is serialized
+_lock = threading.RLock()
+
+
+def is_local_search_enabled() -> bool:
+    return SEARCH_BACKEND == "local"
+
+
+def _get_connection() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        logger.info(f"Opening local search index: {LOCAL_SEARCH_INDEX_PATH}")
+        connection = sqlite3.connect(LOCAL_SEARCH_INDEX_PATH, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(_SCHEMA)
+        _connection = connection
+    return _connection
+
+
+def reset_local_search_index(path: str | None = None):
+    """Close the index and open `path` on next access. Used by tests and benchmarks."""
+    global _connection, LOCAL_SEARCH_INDEX_PATH
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+        if path is not None:
+            LOCAL_SEARCH_INDEX_PATH = path
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TERM_PATTERN.findall(text.lower())
+
+
+def _compose_match_expression(
+    terms: list[str],
+    operator: Literal["OR", "AND"],
+    prefix: Literal["none", "last", "all"] = "none",
+) -> str:
+    """Compose FTS5 query from terms. Terms are quoted so that the user input is never parsed as a query syntax."""
+
+    def quote(index: int, term: str) -> str:
+        is_prefix = prefix == "all" or (prefix == "last" and index == len(terms) - 1)
+        return f'"{term}"' + ("*" if is_prefix else "")
+
+    return f" {operator} ".join(quote(i, term) for i, term in enumerate(terms))
+
+
+def _to_json_compatible(value):
+    """Convert Decimal values of DynamoDB items to numbers."""
+    if isinstance(value, decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, dict):
+        return {k: _to_json_compatible(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_to_json_compatible(v) for v in value]
+    return value
+
+
+def _upsert(
+    connection: sqlite3.Connection,
+    table: str,
+    key_column: str,
+    key: str,
+    columns: dict,
+    fts_columns: dict,
+) -> int:
+    """Insert or replace the row and its FTS document, which share the row id."""
+    row = connection.execute(
+        f"SELECT id FROM {table} WHERE {key_column} = ?", (key,)
+    ).fetchone()
+    if row is None:
+        names = [key_column, *columns]
+        cursor = connection.execute(
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            (key, *columns.values()),
+        )
+        rowid = cursor.lastrowid
+        assert rowid is not None
+    else:
+        rowid = row["id"]
+        connection.execute(
+            f"UPDATE {table} SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+            (*columns.values(), rowid),
+        )
+        connection.execute(f"DELETE FROM {table}_fts WHERE rowid = ?", (rowid,))
+
+    connection.execute(
+        f"INSERT INTO {table}_fts (rowid, {', '.join(fts_columns)}) VALUES (?, {', '.join('?' * len(fts_columns))})",
+        (rowid, *fts_columns.values()),
+    )
+    return rowid
+
+
+def index_conversation(
+    user_id: str, conversation: ConversationModel, first_user_message: str
+):
+    """Index title and text of all messages of the conversation. No-op unless the local backend is enabled."""
+    if not is_local_search_enabled():
+        return
+
+    body = "\n".join(
+        content.body
+        for message in conversation.message_map.values()
+        for content in message.content
+        if isinstance(content, TextContentModel)
+    )
+    # Same as `last_updated_time` of OpenSearch results
+    last_updated_time = max(
+        (message.create_time for message in conversation.message_map.values()),
+        default=0.0,
+    )
+
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            _upsert(
+                connection,
+                "conversation",
+                "sk",
+                compose_conv_id(user_id, conversation.id),
+                {
+                    "user_id": user_id,
+                    "title": conversation.title,
+                    "bot_id": conversation.bot_id,
+                    "last_updated_time": last_updated_time,
+                },
+                {
+                    "title": conversation.title,
+                    "body": body,
+                    "first_user_message": first_user_message,
+                },
+            )
+
+
+def update_conversation_title(user_id: str, conversation_id: str, title: str):
+    if not is_local_search_enabled():
+        return
+
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            row = connection.execute(
+                "SELECT id FROM conversation WHERE sk = ?",
+                (compose_conv_id(user_id, conversation_id),),
+            ).fetchone()
+            if row is None:
+                return
+            connection.execute(
+                "UPDATE conversation SET title = ? WHERE id = ?", (title, row["id"])
+            )
+            # FTS5 tables do not support partial updates of columns
+            fts = connection.execute(
+                "SELECT body, first_user_message FROM conversation_fts WHERE rowid = ?",
+                (row["id"],),
+            ).fetchone()
+            connection.execute(
+                "DELETE FROM conversation_fts WHERE rowid = ?", (row["id"],)
+            )
+            connection.execute(
+                "INSERT INTO conversation_fts (rowid, title, body, first_user_message) VALUES (?, ?, ?, ?)",
+                (row["id"], title, fts["body"], fts["first_user_message"]),
+            )
+
+
+def remove_conversation(user_id: str, conversation_id: str):
+    if not is_local_search_enabled():
+        return
+
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            row = connection.execute(
+                "SELECT id FROM conversation WHERE sk = ?",
+                (compose_conv_id(user_id, conversation_id),),
+            ).fetchone()
+            if row is None:
+                return
+            connection.execute("DELETE FROM conversation WHERE id = ?", (row["id"],))
+            connection.execute(
+                "DELETE FROM conversation_fts WHERE rowid = ?", (row["id"],)
+            )
+
+
+def remove_conversations_by_user_id(user_id: str):
+    if not is_local_search_enabled():
+        return
+
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            connection.execute(
+                "DELETE FROM conversation_fts WHERE rowid IN (SELECT id FROM conversation WHERE user_id = ?)",
+                (user_id,),
+            )
+            connection.execute("DELETE FROM conversation WHERE user_id = ?", (user_id,))
+
+
+def index_bot_item(item: dict):
+    """Index the bot item of the bot table. No-op unless the local backend is enabled."""
+    if not is_local_search_enabled() or not item["SK"].startswith("BOT#"):
+        return
+
+    source = _to_json_compatible(item)
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            rowid = _upsert(
+                connection,
+                "bot",
+                "bot_id",
+                source["BotId"],
+                {
+                    "shared_scope": source.get("SharedScope", "private"),
+                    "usage_count": source.get("UsageStats", {}).get("usage_count", 0),
+                    "source": json.dumps(source),
+                },
+                {
+                    "title": source.get("Title", ""),
+                    "description": source.get("Description", ""),
+                    "instruction": source.get("Instruction", ""),
+                },
+            )
+            connection.execute(
+                "DELETE FROM bot_principal WHERE bot_rowid = ?", (rowid,)
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO bot_principal (principal, bot_rowid) VALUES (?, ?)",
+                [
+                    (principal, rowid)
+                    for principal in source.get("AccessPrincipals", [])
+                ],
+            )
+
+
+def remove_bot(bot_id: str):
+    if not is_local_search_enabled():
+        return
+
+    with _lock:
+        connection = _get_connection()
+        with connection:
+            row = connection.execute(
+                "SELECT id FROM bot WHERE bot_id = ?", (bot_id,)
+            ).fetchone()
+            if row is None:
+                return
+            connection.execute("DELETE FROM bot WHERE id = ?", (row["id"],))
+            connection.execute("DELETE FROM bot_fts WHERE rowid = ?", (row["id"],))
+            connection.execute(
+                "DELETE FROM bot_principal WHERE bot_rowid = ?", (row["id"],)
+            )
+
+
+def find_conversations_by_query(
+    query: str, user: User, limit: int = 20
+) -> list[ConversationSearchModel]:
+    """Same as the OpenSearch version. Title matches are weighted over message bodies,
+    and conversations containing the whole query as a phrase are ranked higher.
+    """
+    terms = _tokenize(query)
+    if not terms:
+        return []
+
+    expression = _compose_match_expression(terms, "OR")
+    if len(terms) > 1:
+        expression = f'"{" ".join(terms)}" OR {expression}'
+
+    with _lock:
+        rows = (
+            _get_connection()
+            .execute(
+                f"""
+                SELECT
+                    c.sk, c.title, c.bot_id, c.last_updated_time,
+                    highlight(conversation_fts, 0, ?, ?) AS title_highlight,
+                    snippet(conversation_fts, 1, ?, ?, '...', 24) AS body_snippet
+                FROM conversation_fts
+                JOIN conversation c ON c.id = conversation_fts.rowid
+                WHERE conversation_fts MATCH ? AND c.user_id = ?
+                ORDER BY bm25(conversation_fts, 3.0, 2.0, 0.0), c.last_updated_time DESC
+                LIMIT ?
+                """,
+                (
+                    HIGHLIGHT_PRE_TAG,
+                    HIGHLIGHT_POST_TAG,
+                    HIGHLIGHT_PRE_TAG,
+                    HIGHLIGHT_POST_TAG,
+                    "{title body} : (" + expression + ")",
+                    user.id,
+                    limit,
+                ),
+            )
+            .fetchall()
+        )
+
+    conversations = []
+    for row in rows:
+        highlights = [
+            SearchHighlightModel(field_name=field_name, fragments=[fragment])
+            for field_name, fragment in (
+                ("Title", row["title_highlight"]),
+                ("MessageBody", row["body_snippet"]),
+            )
+            if HIGHLIGHT_PRE_TAG in fragment
+        ]
+        conversations.append(
+            ConversationSearchModel(
+                id=decompose_conv_id(row["sk"]),
+                title=row["title"],
+                bot_id=row["bot_id"],
+                last_updated_time=row["last_updated_time"],
+                highlights=highlights or None,
+            )
+        )
+    return conversations
+
+
+def find_conversation_suggestions(
+    query: str, user: User, limit: int = 5
+) -> list[ConversationSuggestionModel]:
+    """Same as the OpenSearch version. All terms must match, and the last term is matched by prefix."""
+    terms = _tokenize(query)
+    if not terms:
+        return []
+
+    with _lock:
+        rows = (
+            _get_connection()
+            .execute(
+                """
+                SELECT c.sk, c.title
+                FROM conversation_fts
+                JOIN conversation c ON c.id = conversation_fts.rowid
+                WHERE conversation_fts MATCH ? AND c.user_id = ?
+                ORDER BY bm25(conversation_fts, 2.0, 0.0, 1.0), c.last_updated_time DESC
+                LIMIT ?
+                """,
+                (
+                    "{title first_user_message} : ("
+                    + _compose_match_expression(terms, "AND", prefix="last")
+                    + ")",
+                    user.id,
+                    limit,
+                ),
+            )
+            .fetchall()
+        )
+
+    return [
+        ConversationSuggestionModel(id=decompose_conv_id(row["sk"]), title=row["title"])
+        for row in rows
+    ]
+
+
+def _compose_access_condition(user: User, include_partial: bool) -> tuple[str, list]:
+    """Same semantics as the `AccessPrincipals` filter of OpenSearch."""
+    principals = compose_user_access_principals(user.id, user.groups)
+    condition = (
+        "EXISTS (SELECT 1 FROM bot_principal p WHERE p.bot_rowid = b.id"
+        f" AND p.principal IN ({', '.join('?' * len(principals))}))"
+    )
+    if include_partial:
+        condition = f"({condition} OR b.shared_scope = 'partial')"
+    return condition, list(principals)
+
+
+def _find_bot_sources(
+    where: list[str],
+    params: list,
+    order_by: str,
+    limit: int,
+    query: str | None = None,
+) -> list[dict]:
+    from_clause = "bot b"
+    if query is not None:
+        from_clause = "bot_fts JOIN bot b ON b.id = bot_fts.rowid"
+        where = ["bot_fts MATCH ?", *where]
+        params = [query, *params]
+
+    with _lock:
+        rows = (
+            _get_connection()
+            .execute(
+                f"SELECT b.source FROM {from_clause}"
+                f" WHERE {' AND '.join(where) or '1'}"
+                f" ORDER BY {order_by} LIMIT ?",
+                (*params, limit),
+            )
+            .fetchall()
+        )
+    return [json.loads(row["source"]) for row in rows]
+
+
+def find_bots_by_query(query: str, user: User, limit: int = 20) -> list[BotMeta]:
+    """Same as the OpenSearch version. Terms are matched by prefix instead of fuzzy matching."""
+    terms = _tokenize(query)
+    if not terms:
+        return []
+
+    condition, params = _compose_access_condition(user, include_partial=user.is_admin())
+    sources = _find_bot_sources(
+        [condition],
+        params,
+        "bm25(bot_fts)",
+        limit,
+        query=_compose_match_expression(terms, "OR", prefix="all"),
+    )
+    return [
+        BotMeta.from_opensearch_response({"_source": source}, user.id)
+        for source in sources
+    ]
+
+
+def find_bots_sorted_by_usage_count(user: User, limit: int = 20) -> list[BotMeta]:
+    condition, params = _compose_access_condition(user, include_partial=False)
+    sources = _find_bot_sources([condition], params, "b.usage_count DESC", limit)
+    return [
+        BotMeta.from_opensearch_response({"_source": source}, user.id)
+        for source in sources
+    ]
+
+
+def find_random_bots(user: User, limit: int = 20) -> list[BotMeta]:
+    condition, params = _compose_access_condition(user, include_partial=False)
+    sources = _find_bot_sources([condition], params, "random()", limit)
+    return [
+        BotMeta.from_opensearch_response({"_source": source}, user.id)
+        for source in sources
+    ]
+
+
+def find_public_bot_sources_sorted_by_usage_count(limit: int = 100) -> list[dict]:
+    return _find_bot_sources(
+        ["b.shared_scope = 'all'"], [], "b.usage_count DESC", limit
+    )
+
+
+def find_random_public_bot_sources(limit: int = 100) -> list[dict]:
+    return _find_bot_sources(["b.shared_scope = 'all'"], [], "random()", limit)
+
+
+def find_non_public_bot_sources(user: User, limit: int = 20) -> list[dict]:
+    condition, params = _compose_access_condition(user, include_partial=False)
+    return _find_bot_sources(
+        [condition, "b.shared_scope != 'all'"], params, "b.usage_count DESC", limit
+    )
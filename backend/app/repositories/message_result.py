@@ -0,0 +1,254 @@
+import logging
+import os
+import time
+from decimal import Decimal as decimal
+from typing import Any
+
+from app.repositories.common import (
+    RecordNotFoundError,
+    compose_partition_key,
+    get_conversation_table_client,
+)
+from app.repositories.models.message_result import (
+    MessageResultModel,
+    type_message_result_status,
+)
+from app.utils import get_current_time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Results are deleted by DynamoDB TTL after this period
+MESSAGE_RESULT_RETENTION_DAYS = int(
+    os.environ.get("MESSAGE_RESULT_RETENTION_DAYS", "7")
+)
+# Output larger than this is not stored to stay under the item size limit of DynamoDB.
+# Clients can read it from the conversation instead.
+MAX_OUTPUT_SIZE = 300 * 1024
+# Generation locked longer than this is treated as crashed, and the message can be processed again.
+# Same as the maximum timeout of Lambda.
+MESSAGE_LOCK_SECONDS = 15 * 60
+# Maximum number of keys per `BatchGetItem` request
+BATCH_READ_SIZE = 100
+BATCH_READ_MAX_ATTEMPTS = 5
+BATCH_READ_BASE_DELAY_SECONDS = 0.1
+
+
+def compose_message_result_sk(user_id: str, message_id: str) -> str:
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#RESULT#{message_id}"
+
+
+def _compose_key(user_id: str, message_id: str) -> dict:
+    return {
+        "PK": compose_partition_key(user_id, message_id),
+        "SK": compose_message_result_sk(user_id, message_id),
+    }
+
+
+def _compose_expire_time(now: int) -> int:
+    # TTL attribute must be epoch seconds
+    return now // 1000 + MESSAGE_RESULT_RETENTION_DAYS * 24 * 60 * 60
+
+
+def _to_model(item: dict) -> MessageResultModel:
+    return MessageResultModel(
+        message_id=item["MessageId"],
+        conversation_id=item["ConversationId"],
+        status=item["Status"],
+        create_time=float(item["CreateTime"]),
+        complete_time=(float(item["CompleteTime"]) if "CompleteTime" in item else None),
+        output=item.get("Output"),
+        error=item.get("Error"),
+        callback_url=item.get("CallbackUrl"),
+    )
+
+
+def _compose_pending_item(
+    user_id: str, conversation_id: str, message_id: str, now: int
+) -> dict:
+    return {
+        **_compose_key(user_id, message_id),
+        "MessageId": message_id,
+        "ConversationId": conversation_id,
+        "Status": "PENDING",
+        "CreateTime": decimal(now),
+        "ExpireTime": _compose_expire_time(now),
+    }
+
+
+def store_pending_message_result(
+    user_id: str,
+    conversation_id: str,
+    message_id: str,
+    callback_url: str | None = None,
+):
+    """Store the result of a message accepted for asynchronous generation."""
+    item = _compose_pending_item(
+        user_id, conversation_id, message_id, get_current_time()
+    )
+    if callback_url:
+        item["CallbackUrl"] = callback_url
+
+    get_conversation_table_client(user_id).put_item(Item=item)
+
+
+def store_pending_message_results(user_id: str, messages: list[tuple[str, str]]):
+    """Store the results of messages accepted at once with batch writes.
+    Args:
+        messages: List of (conversation id, message id).
+    """
+    now = get_current_time()
+    with get_conversation_table_client(user_id).batch_writer() as writer:
+        for conversation_id, message_id in messages:
+            writer.put_item(
+                Item=_compose_pending_item(user_id, conversation_id, message_id, now)
+            )
+
+
+def complete_message_result(
+    user_id: str,
+    conversation_id: str,
+    message_id: str,
+    status: type_message_result_status,
+    output: str | None = None,
+    error: str | None = None,
+) -> MessageResultModel:
+    """Store the result of the generation. The updated result is returned."""
+    if output is not None and len(output.encode("utf-8")) > MAX_OUTPUT_SIZE:
+        logger.warning(f"Output of {message_id} is too large to store.")
+        output = None
+
+    now = get_current_time()
+    update_expression = (
+        "SET MessageId = :message_id, ConversationId = :conversation_id, "
+        "#status = :status, CompleteTime = :complete_time, ExpireTime = :expire_time, "
+        "CreateTime = if_not_exists(CreateTime, :complete_time)"
+    )
+    values = {
+        ":message_id": message_id,
+        ":conversation_id": conversation_id,
+        ":status": status,
+        ":complete_time": decimal(now),
+        ":expire_time": _compose_expire_time(now),
+    }
+    # Placeholders avoid reserved words, e.g. `Status` and `Output`
+    names = {"#status": "Status"}
+    removed = []
+    for attribute, value in (("Output", output), ("Error", error)):
+        placeholder = attribute.lower()
+        names[f"#{placeholder}"] = attribute
+        if value is None:
+            removed.append(f"#{placeholder}")
+        else:
+            update_expression += f", #{placeholder} = :{placeholder}"
+            values[f":{placeholder}"] = value
+    # Release the lock acquired by `lock_message_result`
+    update_expression += " REMOVE " + ", ".join([*removed, "LockedUntil"])
+
+    response = get_conversation_table_client(user_id).update_item(
+        Key=_compose_key(user_id, message_id),
+        UpdateExpression=update_expression,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues="ALL_NEW",
+    )
+    return _to_model(response["Attributes"])
+
+
+def lock_message_result(user_id: str, conversation_id: str, message_id: str) -> bool:
+    """Lock the message for generation with a conditional write.
+    Returns False if the message is already answered or being generated, e.g. on redelivery of the same message.
+    """
+    now = get_current_time()
+    try:
+        get_conversation_table_client(user_id).update_item(
+            Key=_compose_key(user_id, message_id),
+            UpdateExpression=(
+                "SET LockedUntil = :locked_until, MessageId = :message_id, "
+                "ConversationId = :conversation_id, #status = if_not_exists(#status, :pending), "
+                "CreateTime = if_not_exists(CreateTime, :now), ExpireTime = :expire_time"
+            ),
+            ConditionExpression=(
+                "attribute_not_exists(#status) OR "
+                "(#status <> :succeeded AND (attribute_not_exists(LockedUntil) OR LockedUntil < :now))"
+            ),
+            ExpressionAttributeNames={"#status": "Status"},
+            ExpressionAttributeValues={
+                ":locked_until": decimal(now + MESSAGE_LOCK_SECONDS * 1000),
+                ":message_id": message_id,
+                ":conversation_id": conversation_id,
+                ":pending": "PENDING",
+                ":succeeded": "SUCCEEDED",
+                ":now": decimal(now),
+                ":expire_time": _compose_expire_time(now),
+            },
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise e
+
+    return True
+
+
+def unlock_message_result(user_id: str, message_id: str):
+    """Release the lock so that the message can be processed again on redelivery."""
+    get_conversation_table_client(user_id).update_item(
+        Key=_compose_key(user_id, message_id),
+        UpdateExpression="REMOVE LockedUntil",
+        ConditionExpression="attribute_exists(PK)",
+    )
+
+
+def find_message_result(user_id: str, message_id: str) -> MessageResultModel:
+    response = get_conversation_table_client(user_id).get_item(
+        Key=_compose_key(user_id, message_id)
+    )
+    if "Item" not in response:
+        raise RecordNotFoundError(f"Result of message {message_id} not found")
+
+    return _to_model(response["Item"])
+
+
+def find_message_results(
+    user_id: str, message_ids: list[str]
+) -> dict[str, MessageResultModel]:
+    """Find results of the messages with batch reads.
+    Returns:
+        Map of message id to the result. Results not found are not contained.
+    Unprocessed keys are retried with exponential backoff.
+    """
+    table = get_conversation_table_client(user_id)
+    client = table.meta.client
+
+    results: dict[str, MessageResultModel] = {}
+    for i in range(0, len(message_ids), BATCH_READ_SIZE):
+        request_items: dict[str, Any] = {
+            table.table_name: {
+                "Keys": [
+                    _compose_key(user_id, message_id)
+                    for message_id in message_ids[i : i + BATCH_READ_SIZE]
+                ],
+                "ConsistentRead": True,
+            }
+        }
+        for attempt in range(BATCH_READ_MAX_ATTEMPTS):
+            if attempt > 0:
+                time.sleep(BATCH_READ_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response.get("Responses", {}).get(table.table_name, []):
+                result = _to_model(item)
+                results[result.message_id] = result
+
+            request_items = response.get("UnprocessedKeys", {})
+            if not request_items:
+                break
+        else:
+            raise RuntimeError(
+                f"Failed to get {len(request_items[table.table_name]['Keys'])} results after {BATCH_READ_MAX_ATTEMPTS} attempts."
+            )
+
+    return results
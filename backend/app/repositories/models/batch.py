@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+
+
+class BatchItemModel(BaseModel):
+    custom_id: str | None
+    conversation_id: str
+    message_id: str
+
+
+class BatchModel(BaseModel):
+    id: str
+    # Number of items. The items are stored separately.
+    total: int
+    create_time: float
+    complete_time: float | None
+    # Number of completed items. Items succeeded on retry after a failure are counted as succeeded.
+    succeeded: int
+    failed: int
+    # S3 key of the JSONL results. Stored when all items completed.
+    result_path: str | None
+
+    def is_completed(self) -> bool:
+        return self.succeeded + self.failed >= self.total
@@ -84,3 +84,18 @@ class ConversationSearchModel(BaseModel):
                 conversation.highlights = highlights
 
         return conversation
+
+
+class ConversationSuggestionModel(BaseModel):
+    """Model representing a conversation suggested while the user types"""
+
+    id: str
+    title: str
+
+    @classmethod
+    def from_opensearch_response(cls, hit: dict) -> Self:
+        source = hit["_source"]
+        return cls(
+            id=decompose_conv_id(source.get("SK", "")),
+            title=source.get("Title", "Untitled conversation"),
+        )
@@ -416,6 +416,8 @@ class BotModel(BaseModel):
     sync_status: type_sync_status
     sync_status_reason: str
     sync_last_exec_id: str
+    # Milliseconds epoch time when the last knowledge base sync succeeded
+    sync_completed_time: int | None = None
     published_api_stack_name: str | None
     published_api_datetime: int | None
     published_api_codebuild_id: str | None
@@ -494,9 +496,9 @@ class BotModel(BaseModel):
         return len(self.agent.tools) > 0 or self.has_knowledge()
 
     def has_bedrock_knowledge_base(self) -> bool:
-        return self.bedrock_knowledge_base is not None and (
-            self.bedrock_knowledge_base.knowledge_base_id is not None
-            or self.bedrock_knowledge_base.exist_knowledge_base_id is not None
+        return (
+            self.bedrock_knowledge_base is not None
+            and len(self.bedrock_knowledge_base.get_knowledge_base_ids()) > 0
         )
 
     def is_pinned(self) -> bool:
@@ -74,9 +74,28 @@ class BedrockKnowledgeBaseModel(BaseModel):
     search_params: SearchParamsModel
     knowledge_base_id: str | None = None
     exist_knowledge_base_id: str | None = None
+    # Knowledge bases shared across the organization, searched together with the bot's own one
+    shared_knowledge_base_ids: list[str] = []
     data_source_ids: list[str] | None = None
     parsing_model: type_kb_parsing_model = "disabled"
     web_crawling_scope: type_kb_web_crawling_scope = "DEFAULT"
     web_crawling_filters: WebCrawlingFiltersModel = WebCrawlingFiltersModel(
         exclude_patterns=[], include_patterns=[]
     )
+
+    def get_knowledge_base_ids(self) -> list[str]:
+        """Get ids of all knowledge bases to search."""
+        # Use exist_knowledge_base_id if available, otherwise use knowledge_base_id
+        own_knowledge_base_id = (
+            self.exist_knowledge_base_id
+            if self.exist_knowledge_base_id is not None
+            else self.knowledge_base_id
+        )
+        knowledge_base_ids = (
+            [own_knowledge_base_id] if own_knowledge_base_id is not None else []
+        )
+        return knowledge_base_ids + [
+            knowledge_base_id
+            for knowledge_base_id in self.shared_knowledge_base_ids
+            if knowledge_base_id not in knowledge_base_ids
+        ]
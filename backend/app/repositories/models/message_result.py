@@ -0,0 +1,17 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+type_message_result_status = Literal["PENDING", "SUCCEEDED", "FAILED"]
+
+
+class MessageResultModel(BaseModel):
+    message_id: str
+    conversation_id: str
+    status: type_message_result_status
+    create_time: float
+    complete_time: float | None
+    # JSON of `MessageOutput` of the response message
+    output: str | None
+    error: str | None
+    callback_url: str | None
@@ -1,17 +1,39 @@
 import asyncio
+import hashlib
 import logging
 import os
 import re
 import time
-from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from functools import partial
-from typing import Any
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Literal,
+    Sequence,
+    TypeVar,
+)
 
 import boto3
 from app.repositories.common import get_bot_table_client
 from app.repositories.models.custom_bot import BotMetaWithStackInfo
 from app.repositories.models.usage_analysis import UsagePerBot, UsagePerUser
+from app.repositories.usage_rollup import (
+    find_top_prices,
+    is_covered_by_rollups,
+    is_usage_rollup_enabled,
+    parse_hour,
+)
+from app.repositories.user import TooManyRequestsError
+from app.utils import TTLCache
 from boto3.dynamodb.conditions import Attr, Key
+from reretry import retry
+
+if TYPE_CHECKING:
+    from mypy_boto3_cognito_idp.type_defs import AttributeTypeTypeDef
 
 REGION = os.environ.get("REGION", "ap-southeast-2")
 USAGE_ANALYSIS_DATABASE = os.environ.get(
@@ -26,40 +48,145 @@ USAGE_ANALYSIS_OUTPUT_LOCATION = os.environ.get(
 )
 USER_POOL_ID = os.environ.get("USER_POOL_ID", "ap-southeast-2_XXXXXXXXX")
 QUERY_LIMIT = 1000
+# Matches SK of conversation items, which is `<user_id>#CONV#<conversation_id>`.
+# PK is not used because PK of published API conversations has a shard suffix.
+CONVERSATION_SK_PATTERN = "%#CONV#%"
+# Identical queries within this period share the result
+ATHENA_QUERY_CACHE_TTL_SECONDS = int(
+    os.environ.get("ATHENA_QUERY_CACHE_TTL_SECONDS", "300")
+)
+# Queries running longer than this are cancelled
+ATHENA_QUERY_TIMEOUT_SECONDS = float(
+    os.environ.get("ATHENA_QUERY_TIMEOUT_SECONDS", "60")
+)
+# Maximum number of concurrent requests to Cognito
+COGNITO_MAX_CONCURRENCY = int(os.environ.get("COGNITO_MAX_CONCURRENCY", "8"))
+COGNITO_USER_CACHE_TTL_SECONDS = int(
+    os.environ.get("COGNITO_USER_CACHE_TTL_SECONDS", "3600")
+)
+# List users instead of requesting each user, if at least this number of users are not cached
+COGNITO_LIST_USERS_THRESHOLD = 60
+COGNITO_LIST_USERS_MAX_PAGES = 20
+ATHENA_POLL_INITIAL_INTERVAL_SECONDS = 0.2
+ATHENA_POLL_MAX_INTERVAL_SECONDS = 2.0
+
+T = TypeVar("T")
 
 
 logger = logging.getLogger(__name__)
 athena = boto3.client("athena")
+cognito = boto3.client("cognito-idp")
+cognito_executor = ThreadPoolExecutor(
+    max_workers=COGNITO_MAX_CONCURRENCY, thread_name_prefix="cognito"
+)
+# Value: user id and email
+cognito_user_cache: TTLCache[str, dict] = TTLCache(
+    maxsize=10000, ttl_seconds=COGNITO_USER_CACHE_TTL_SECONDS
+)
+# Value: id of the succeeded query execution
+athena_query_cache: TTLCache[str, str] = TTLCache(
+    maxsize=128, ttl_seconds=ATHENA_QUERY_CACHE_TTL_SECONDS
+)
+
+
+def _compose_cognito_user(
+    user_id: str, attributes: Sequence["AttributeTypeTypeDef"]
+) -> dict:
+    email = next(
+        (attr["Value"] for attr in attributes if attr["Name"] == "email"), None
+    )
+
+    return {
+        "id": user_id,
+        "email": email,
+    }
 
 
+@retry(TooManyRequestsError, tries=3, delay=1)
 def _find_cognito_user_by_id(user_id: str) -> dict | None:
     """Find user by id from cognito."""
-    cognito = boto3.client("cognito-idp")
+    user = cognito_user_cache.get(user_id)
+    if user is not None:
+        return user
+
     try:
         response = cognito.admin_get_user(UserPoolId=USER_POOL_ID, Username=user_id)
     except cognito.exceptions.UserNotFoundException:
         return None
-    user_attributes = response["UserAttributes"]
+    except cognito.exceptions.TooManyRequestsException as e:
+        logger.warning(f"Rate limit exceeded. Retrying... Error: {e}")
+        raise TooManyRequestsError()
 
-    email = next(
-        (attr["Value"] for attr in user_attributes if attr["Name"] == "email"), None
-    )
+    user = _compose_cognito_user(user_id, response["UserAttributes"])
+    cognito_user_cache.set(user_id, user)
+    return user
 
-    return {
-        "id": user_id,
-        "email": email,
-    }
+
+@retry(TooManyRequestsError, tries=3, delay=1)
+def _list_cognito_users(user_ids: set[str]) -> dict[str, dict]:
+    """Find users by listing all users of the pool, which takes one request per 60 users.
+    Listing stops when all users are found or `COGNITO_LIST_USERS_MAX_PAGES` pages are read.
+    Listed users are cached even if not requested, because they are likely to appear in other reports.
+    """
+    found: dict[str, dict] = {}
+    paginator = cognito.get_paginator("list_users")
+    try:
+        for page in paginator.paginate(
+            UserPoolId=USER_POOL_ID,
+            AttributesToGet=["email"],
+            PaginationConfig={
+                "MaxItems": COGNITO_LIST_USERS_MAX_PAGES * 60,
+                "PageSize": 60,
+            },
+        ):
+            for item in page["Users"]:
+                user = _compose_cognito_user(
+                    item["Username"], item.get("Attributes", [])
+                )
+                cognito_user_cache.set(user["id"], user)
+                if user["id"] in user_ids:
+                    found[user["id"]] = user
+
+            if len(found) == len(user_ids):
+                break
+    except cognito.exceptions.TooManyRequestsException as e:
+        logger.warning(f"Rate limit exceeded. Retrying... Error: {e}")
+        raise TooManyRequestsError()
+
+    return found
 
 
 async def _find_cognito_users_by_ids(user_ids: list[str]) -> list[dict]:
-    """Find users by ids from cognito."""
+    """Find users by ids from cognito.
+    Cached users are not requested. If many users are missing, they are found by listing users,
+    and the rest are requested one by one with bounded concurrency to stay under Cognito quotas.
+    """
+    users: dict[str, dict] = {}
+    missing: list[str] = []
+    for user_id in dict.fromkeys(user_ids):
+        user = cognito_user_cache.get(user_id)
+        if user is not None:
+            users[user_id] = user
+        else:
+            missing.append(user_id)
+
     loop = asyncio.get_running_loop()
+    if len(missing) >= COGNITO_LIST_USERS_THRESHOLD:
+        listed = await loop.run_in_executor(
+            cognito_executor, _list_cognito_users, set(missing)
+        )
+        users.update(listed)
+        missing = [user_id for user_id in missing if user_id not in listed]
+
     tasks = [
-        loop.run_in_executor(None, partial(_find_cognito_user_by_id, user_id))
-        for user_id in user_ids
+        loop.run_in_executor(
+            cognito_executor, partial(_find_cognito_user_by_id, user_id)
+        )
+        for user_id in missing
     ]
     results = await asyncio.gather(*tasks)
-    return [result for result in results if result is not None]
+    users.update({result["id"]: result for result in results if result is not None})
+    return [users[user_id] for user_id in user_ids if user_id in users]
 
 
 async def _query_bot_by_id(bot_id: str) -> list[dict]:
@@ -104,61 +231,153 @@ async def _find_bots_by_ids(bot_ids: list[str]) -> dict[str, BotMetaWithStackInf
     return bots_dict
 
 
+def _compose_athena_query_cache_key(query: str, database: str, workgroup: str) -> str:
+    """Compose a cache key from the normalized query and the current time bucket.
+    Identical queries issued within the same bucket share the result.
+    """
+    normalized = " ".join(query.split())
+    digest = hashlib.sha256(
+        f"{database}\n{workgroup}\n{normalized}".encode("utf-8")
+    ).hexdigest()
+    bucket = int(time.time() // ATHENA_QUERY_CACHE_TTL_SECONDS)
+    return f"{digest}#{bucket}"
+
+
+async def _run_in_executor(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking boto3 call without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+async def _wait_for_athena_query(execution_id: str):
+    """Poll the query status with exponential backoff until completed or the deadline."""
+    deadline = time.monotonic() + ATHENA_QUERY_TIMEOUT_SECONDS
+    interval = ATHENA_POLL_INITIAL_INTERVAL_SECONDS
+    while True:
+        query_execution = await _run_in_executor(
+            athena.get_query_execution, QueryExecutionId=execution_id
+        )
+        status = query_execution["QueryExecution"]["Status"]
+        logger.debug(f"status: {status['State']}")
+        if status["State"] == "SUCCEEDED":
+            return
+        elif status["State"] in ("FAILED", "CANCELLED"):
+            reason = status.get("StateChangeReason", status["State"])
+            logger.error(f"query failed.")
+            raise Exception(reason)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            await _run_in_executor(
+                athena.stop_query_execution, QueryExecutionId=execution_id
+            )
+            raise TimeoutError(
+                f"Athena query {execution_id} did not complete in {ATHENA_QUERY_TIMEOUT_SECONDS} seconds."
+            )
+        await asyncio.sleep(min(interval, remaining))
+        interval = min(interval * 2, ATHENA_POLL_MAX_INTERVAL_SECONDS)
+
+
 async def run_athena_query(
     query: str,
     database: str,
     workgroup: str,
     output_location: str,
-    query_limit: int = QUERY_LIMIT,
-):
-    """Run athena query."""
-    query_execution = athena.start_query_execution(
+) -> str:
+    """Run athena query and return the id of the succeeded query execution.
+    Identical queries are not executed again while cached, and Athena reuses the results of
+    identical queries run by other execution environments for the same period.
+    Use `iter_athena_query_rows` to read the results.
+    """
+    cache_key = _compose_athena_query_cache_key(query, database, workgroup)
+    execution_id = athena_query_cache.get(cache_key)
+    if execution_id is not None:
+        logger.debug(f"query_execution_id (cached): {execution_id}")
+        return execution_id
+
+    query_execution = await _run_in_executor(
+        athena.start_query_execution,
         QueryString=query,
         QueryExecutionContext={"Database": database},
         WorkGroup=workgroup,
         ResultConfiguration={
             "OutputLocation": output_location,
         },
+        ResultReuseConfiguration={
+            "ResultReuseByAgeConfiguration": {
+                "Enabled": True,
+                "MaxAgeInMinutes": max(1, ATHENA_QUERY_CACHE_TTL_SECONDS // 60),
+            }
+        },
     )
     execution_id = query_execution["QueryExecutionId"]
     logger.debug(f"query_execution_id: {execution_id}")
 
-    # Wait until query completed
+    await _wait_for_athena_query(execution_id)
+    athena_query_cache.set(cache_key, execution_id)
+    return execution_id
+
+
+async def iter_athena_query_rows(
+    execution_id: str, max_rows: int = QUERY_LIMIT
+) -> AsyncIterator[list[str | None]]:
+    """Yield values of each result row, excluding the header row.
+    Result pages are fetched lazily, so the whole result set is never held in memory.
+    """
+    pages = iter(
+        athena.get_paginator("get_query_results").paginate(
+            QueryExecutionId=execution_id,
+            # +1 for the header row
+            PaginationConfig={"MaxItems": max_rows + 1, "PageSize": 1000},
+        )
+    )
+    is_header = True
     while True:
-        query_execution = athena.get_query_execution(QueryExecutionId=execution_id)
-        status = query_execution["QueryExecution"]["Status"]["State"]
-        logger.debug(f"status: {status}")
-        if status == "SUCCEEDED":
+        page = await _run_in_executor(next, pages, None)
+        if page is None:
             break
-        elif status == "FAILED":
-            reason = query_execution["QueryExecution"]["Status"]["StateChangeReason"]
-            logger.error(f"query failed.")
-            raise Exception(reason)
-        else:
-            await asyncio.sleep(1)
 
-    # Get query results
-    results = athena.get_query_results(
-        QueryExecutionId=execution_id, MaxResults=query_limit
-    )
-    return results
+        for row in page["ResultSet"]["Rows"]:
+            if is_header:
+                is_header = False
+                continue
+            yield [column.get("VarCharValue") for column in row["Data"]]
 
 
-async def find_bots_sorted_by_price(
-    limit: int = 20,
-    from_: str | None = None,
-    to_: str | None = None,
-) -> list[UsagePerBot]:
-    """Find bots sorted by price. This is intended to be used by admin.
-    - start: start date of the period to be analyzed. The format is `YYYYMMDDHH`.
-    - end: end date of the period to be analyzed. The format is `YYYYMMDDHH`.
-    """
-    assert 1 <= limit <= 1000, "Limit must be between 1 and 1000."
+def _compose_hour_range(
+    from_: str | None, to_: str | None
+) -> tuple[datetime, datetime]:
+    if from_ is not None and to_ is not None:
+        return parse_hour(from_), parse_hour(to_)
+
+    today = datetime.combine(date.today(), datetime.min.time(), timezone.utc)
+    return today, today.replace(hour=23)
+
+
+async def _is_covered_by_rollups(from_: str | None, to_: str | None) -> bool:
+    """Whether the period can be ranked from the rollups instead of Athena."""
+    if not is_usage_rollup_enabled():
+        return False
+
+    from_hour, _ = _compose_hour_range(from_, to_)
+    return await _run_in_executor(is_covered_by_rollups, from_hour)
+
+
+async def _find_top_prices_from_rollups(
+    kind: Literal["BOT", "USER"],
+    limit: int,
+    from_: str | None,
+    to_: str | None,
+) -> list[tuple[str, float]]:
+    """Find ids sorted by price from the hourly rollups, which are much faster than Athena queries."""
+    from_hour, to_hour = _compose_hour_range(from_, to_)
+    return await _run_in_executor(find_top_prices, kind, limit, from_hour, to_hour)
 
-    assert (from_ and to_) or (
-        not from_ and not to_
-    ), "Both from_ and to_ must be specified or omitted."
 
+async def _find_bot_prices_from_athena(
+    limit: int, from_: str | None, to_: str | None
+) -> list[tuple[str, float]]:
+    """Find bot ids sorted by price by querying the stream export with Athena."""
     if from_ is not None and to_ is not None:
         from_str = re.sub(r"(\d{4})(\d{2})(\d{2})(\d{2})", r"\1/\2/\3/\4", from_)  # type: ignore
         to_str = re.sub(r"(\d{4})(\d{2})(\d{2})(\d{2})", r"\1/\2/\3/\4", to_)  # type: ignore
@@ -178,7 +397,7 @@ WITH LatestRecords AS (
         {USAGE_ANALYSIS_DATABASE}.{USAGE_ANALYSIS_TABLE}
     WHERE
         datehour BETWEEN '{from_str}' AND '{to_str}'
-        AND Keys.SK.S LIKE CONCAT(Keys.PK.S, '#CONV#%')
+        AND Keys.SK.S LIKE '{CONVERSATION_SK_PATTERN}'
     GROUP BY
         newimage.BotId.S,
         newimage.SK.S
@@ -193,7 +412,7 @@ PreAggregatedData AS (
         {USAGE_ANALYSIS_DATABASE}.{USAGE_ANALYSIS_TABLE} d
     WHERE
         datehour BETWEEN '{from_str}' AND '{to_str}'
-        AND d.Keys.SK.S LIKE CONCAT(d.Keys.PK.S, '#CONV#%')
+        AND d.Keys.SK.S LIKE '{CONVERSATION_SK_PATTERN}'
 ),
 AggregatedData AS (
     SELECT
@@ -217,29 +436,45 @@ LIMIT {limit};
 """
 
     logger.debug(query)
-    response = await run_athena_query(
+    execution_id = await run_athena_query(
         query,
         USAGE_ANALYSIS_DATABASE,
         USAGE_ANALYSIS_WORKGROUP,
         USAGE_ANALYSIS_OUTPUT_LOCATION,
     )
-    rows = response["ResultSet"]["Rows"][1:]
-
-    bot_ids = [
-        row["Data"][0].get("VarCharValue", "")
-        for row in rows
-        if row["Data"][0].get("VarCharValue", None) is not None
+    return [
+        (id, float(total_price or 0))
+        async for id, total_price in iter_athena_query_rows(execution_id)
+        if id is not None
     ]
 
+
+async def find_bots_sorted_by_price(
+    limit: int = 20,
+    from_: str | None = None,
+    to_: str | None = None,
+) -> list[UsagePerBot]:
+    """Find bots sorted by price. This is intended to be used by admin.
+    - start: start date of the period to be analyzed. The format is `YYYYMMDDHH`.
+    - end: end date of the period to be analyzed. The format is `YYYYMMDDHH`.
+    """
+    assert 1 <= limit <= 1000, "Limit must be between 1 and 1000."
+
+    assert (from_ and to_) or (
+        not from_ and not to_
+    ), "Both from_ and to_ must be specified or omitted."
+
+    if await _is_covered_by_rollups(from_, to_):
+        prices = await _find_top_prices_from_rollups("BOT", limit, from_, to_)
+    else:
+        prices = await _find_bot_prices_from_athena(limit, from_, to_)
+
     # Fetch bot meta data directly
-    bots_dict = await _find_bots_by_ids(bot_ids)
+    bots_dict = await _find_bots_by_ids([bot_id for bot_id, _ in prices])
 
     # Join bot meta data and usage data
     bot_usage = []
-    for row in rows:
-        bot_id = row["Data"][0].get("VarCharValue", "")
-        total_price = float(row["Data"][1].get("VarCharValue", 0))
-
+    for bot_id, total_price in prices:
         bot = bots_dict.get(bot_id)
 
         if bot:
@@ -260,17 +495,10 @@ LIMIT {limit};
     return bot_usage
 
 
-async def find_users_sorted_by_price(
-    limit: int = 20,
-    from_: str | None = None,
-    to_: str | None = None,
-) -> list[UsagePerUser]:
-    assert 1 <= limit <= 1000, "Limit must be between 1 and 1000."
-
-    assert (from_ and to_) or (
-        not from_ and not to_
-    ), "Both from_ and to_ must be specified or omitted."
-
+async def _find_user_prices_from_athena(
+    limit: int, from_: str | None, to_: str | None
+) -> list[tuple[str, float]]:
+    """Find user ids sorted by price by querying the stream export with Athena."""
     if from_ is not None and to_ is not None:
         from_str = re.sub(r"(\d{4})(\d{2})(\d{2})(\d{2})", r"\1/\2/\3/\4", from_)  # type: ignore
         to_str = re.sub(r"(\d{4})(\d{2})(\d{2})(\d{2})", r"\1/\2/\3/\4", to_)  # type: ignore
@@ -283,21 +511,21 @@ async def find_users_sorted_by_price(
     query = f"""
 WITH LatestRecords AS (
     SELECT
-        newimage.PK.S AS UserId,
+        split_part(newimage.SK.S, '#CONV#', 1) AS UserId,
         newimage.SK.S AS SK,
         MAX(datehour) AS LatestDateHour
     FROM
         {USAGE_ANALYSIS_DATABASE}.{USAGE_ANALYSIS_TABLE}
     WHERE
         datehour BETWEEN '{from_str}' AND '{to_str}'
-        AND Keys.SK.S LIKE CONCAT(Keys.PK.S, '#CONV#%')
+        AND Keys.SK.S LIKE '{CONVERSATION_SK_PATTERN}'
     GROUP BY
-        newimage.PK.S,
+        split_part(newimage.SK.S, '#CONV#', 1),
         newimage.SK.S
 ),
 PreAggregatedData AS (
     SELECT
-        d.newimage.PK.S AS UserId,
+        split_part(d.newimage.SK.S, '#CONV#', 1) AS UserId,
         d.newimage.SK.S AS SK,
         d.datehour,
         d.newimage.TotalPrice.N AS TotalPrice
@@ -305,7 +533,7 @@ PreAggregatedData AS (
         {USAGE_ANALYSIS_DATABASE}.{USAGE_ANALYSIS_TABLE} d
     WHERE
         datehour BETWEEN '{from_str}' AND '{to_str}'
-        AND d.Keys.SK.S LIKE CONCAT(d.Keys.PK.S, '#CONV#%')
+        AND d.Keys.SK.S LIKE '{CONVERSATION_SK_PATTERN}'
 ),
 AggregatedData AS (
     SELECT
@@ -329,27 +557,41 @@ LIMIT {limit};
 """
 
     logger.debug(query)
-    response = await run_athena_query(
+    execution_id = await run_athena_query(
         query,
         USAGE_ANALYSIS_DATABASE,
         USAGE_ANALYSIS_WORKGROUP,
         USAGE_ANALYSIS_OUTPUT_LOCATION,
     )
-    rows = response["ResultSet"]["Rows"][1:]
+    return [
+        (id, float(total_price or 0))
+        async for id, total_price in iter_athena_query_rows(execution_id)
+        if id is not None
+    ]
+
+
+async def find_users_sorted_by_price(
+    limit: int = 20,
+    from_: str | None = None,
+    to_: str | None = None,
+) -> list[UsagePerUser]:
+    assert 1 <= limit <= 1000, "Limit must be between 1 and 1000."
+
+    assert (from_ and to_) or (
+        not from_ and not to_
+    ), "Both from_ and to_ must be specified or omitted."
+
+    if await _is_covered_by_rollups(from_, to_):
+        prices = await _find_top_prices_from_rollups("USER", limit, from_, to_)
+    else:
+        prices = await _find_user_prices_from_athena(limit, from_, to_)
 
     users = await _find_cognito_users_by_ids(
-        user_ids=[
-            item["Data"][0]["VarCharValue"]
-            for item in rows
-            if item["Data"][0].get("VarCharValue", None) is not None
-        ]
+        user_ids=[user_id for user_id, _ in prices]
     )
     users_dict = {user["id"]: user for user in users}
     usages = []
-    for row in rows:
-        user_id = row["Data"][0].get("VarCharValue", "")
-        total_price = float(row["Data"][1].get("VarCharValue", 0))
-
+    for user_id, total_price in prices:
         user = users_dict.get(user_id)
         if user:
             usages.append(
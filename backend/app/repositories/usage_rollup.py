@@ -0,0 +1,220 @@
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal as decimal
+from typing import Literal
+
+import boto3
+from app.utils import TTLCache
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DDB_ENDPOINT_URL = os.environ.get("DDB_ENDPOINT_URL")
+REGION = os.environ.get("REGION", "ap-northeast-1")
+# Rollups are disabled unless the table is configured
+USAGE_ROLLUP_TABLE_NAME = os.environ.get("USAGE_ROLLUP_TABLE_NAME", "")
+# Hourly aggregates are expired after this period. Use Athena for older history.
+USAGE_ROLLUP_RETENTION_DAYS = int(os.environ.get("USAGE_ROLLUP_RETENTION_DAYS", "400"))
+# The start of the rollups is cached for this period
+USAGE_ROLLUP_START_CACHE_TTL_SECONDS = 3600
+# Attempts to apply a price change conflicting with concurrent changes of the same conversation
+APPLY_MAX_ATTEMPTS = 3
+
+type_rollup_kind = Literal["BOT", "USER"]
+
+# Layout of the rollup table:
+# - Aggregate: PK=`{kind}#{YYYYMMDD}`, SK=`{HH}#{bot or user id}`, `TotalPrice`
+#   Rankings of a day are a single query on the partition.
+# - Conversation state: PK=`{conversation SK}`, SK=`STATE`, `TotalPrice`
+#   The latest price applied to the aggregates. Only the increase since then is added,
+#   so records delivered more than once are counted once.
+#   Expired with the aggregates unless the conversation is updated again.
+# - Start: PK=`META`, SK=`START`, `StartTime`
+#   The first hour aggregated. Earlier periods are not covered by the rollups.
+
+
+def is_usage_rollup_enabled() -> bool:
+    return bool(USAGE_ROLLUP_TABLE_NAME)
+
+
+# Key: always "START". Value: epoch seconds of the first hour aggregated
+rollup_start_cache: TTLCache[str, int] = TTLCache(
+    maxsize=1, ttl_seconds=USAGE_ROLLUP_START_CACHE_TTL_SECONDS
+)
+
+
+def _get_table():
+    if DDB_ENDPOINT_URL and "AWS_EXECUTION_ENV" not in os.environ:
+        resource = boto3.resource(
+            "dynamodb",
+            endpoint_url=DDB_ENDPOINT_URL,
+            aws_access_key_id="key",
+            aws_secret_access_key="key",
+            region_name=REGION,
+        )
+    else:
+        resource = boto3.resource("dynamodb", region_name=REGION)
+    return resource.Table(USAGE_ROLLUP_TABLE_NAME)
+
+
+def _compose_aggregate_key(kind: type_rollup_kind, hour: datetime, id: str) -> dict:
+    return {"PK": f"{kind}#{hour:%Y%m%d}", "SK": f"{hour:%H}#{id}"}
+
+
+def apply_conversation_price(
+    conversation_sk: str,
+    user_id: str,
+    bot_id: str | None,
+    total_price: decimal,
+    hour: datetime,
+):
+    """Add the increase of the conversation price since the last applied price to hourly aggregates of the user and the bot.
+    The state and the aggregates are updated in one transaction conditioned on the last applied price.
+    """
+    table = _get_table()
+    client = table.meta.client
+    expire_time = int((hour + timedelta(days=USAGE_ROLLUP_RETENTION_DAYS)).timestamp())
+
+    for _ in range(APPLY_MAX_ATTEMPTS):
+        state = table.get_item(
+            Key={"PK": conversation_sk, "SK": "STATE"}, ConsistentRead=True
+        ).get("Item")
+        last_price = state["TotalPrice"] if state else None
+        delta = total_price - (last_price or 0)
+        if delta <= 0:
+            # Already applied, or an older record delivered late
+            return
+
+        state_update: dict = {
+            "TableName": USAGE_ROLLUP_TABLE_NAME,
+            "Key": {"PK": conversation_sk, "SK": "STATE"},
+            "UpdateExpression": "SET TotalPrice = :price, ExpireTime = :expire_time",
+            "ExpressionAttributeValues": {
+                ":price": total_price,
+                ":expire_time": expire_time,
+            },
+        }
+        if last_price is None:
+            state_update["ConditionExpression"] = "attribute_not_exists(TotalPrice)"
+        else:
+            state_update["ConditionExpression"] = "TotalPrice = :last_price"
+            state_update["ExpressionAttributeValues"][":last_price"] = last_price
+
+        aggregates: list[tuple[type_rollup_kind, str]] = [("USER", user_id)]
+        if bot_id:
+            aggregates.append(("BOT", bot_id))
+
+        try:
+            client.transact_write_items(
+                TransactItems=[
+                    {"Update": state_update},
+                    *(
+                        {
+                            "Update": {
+                                "TableName": USAGE_ROLLUP_TABLE_NAME,
+                                "Key": _compose_aggregate_key(kind, hour, id),
+                                "UpdateExpression": "ADD TotalPrice :delta SET ExpireTime = :expire_time",
+                                "ExpressionAttributeValues": {
+                                    ":delta": delta,
+                                    ":expire_time": expire_time,
+                                },
+                            }
+                        }
+                        for kind, id in aggregates
+                    ),
+                ]
+            )
+            return
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise e
+            logger.info(f"Conflicting update of {conversation_sk}. Retrying.")
+
+    raise RuntimeError(f"Failed to apply price of {conversation_sk}")
+
+
+def remove_conversation_state(conversation_sk: str):
+    """Forget the state of a deleted conversation. Aggregated prices are kept."""
+    _get_table().delete_item(Key={"PK": conversation_sk, "SK": "STATE"})
+
+
+def record_rollup_start(hour: datetime):
+    """Record `hour` as the start of the rollups unless an earlier hour is recorded."""
+    try:
+        _get_table().update_item(
+            Key={"PK": "META", "SK": "START"},
+            UpdateExpression="SET StartTime = :start_time",
+            ConditionExpression="attribute_not_exists(StartTime) OR StartTime > :start_time",
+            ExpressionAttributeValues={":start_time": int(hour.timestamp())},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+
+
+def find_rollup_start() -> datetime | None:
+    """Find the first hour aggregated. None if nothing is aggregated yet."""
+    start_time = rollup_start_cache.get("START")
+    if start_time is None:
+        item = _get_table().get_item(Key={"PK": "META", "SK": "START"}).get("Item")
+        if item is None:
+            return None
+        start_time = int(item["StartTime"])
+        rollup_start_cache.set("START", start_time)
+
+    return datetime.fromtimestamp(start_time, timezone.utc)
+
+
+def is_covered_by_rollups(from_hour: datetime) -> bool:
+    """Whether the rollups hold the aggregates of the period starting at `from_hour`.
+    Periods starting before the rollups were deployed or beyond the retention are not covered.
+    """
+    retention_start = datetime.now(timezone.utc) - timedelta(
+        days=USAGE_ROLLUP_RETENTION_DAYS
+    )
+    if from_hour < retention_start:
+        return False
+
+    # The first hour may be partially aggregated if the stream was trimmed
+    start = find_rollup_start()
+    return start is not None and start < from_hour
+
+
+def find_top_prices(
+    kind: type_rollup_kind, limit: int, from_hour: datetime, to_hour: datetime
+) -> list[tuple[str, float]]:
+    """Find ids sorted by the total price between `from_hour` and `to_hour`, both inclusive.
+    One query is issued per day of the period.
+    """
+    table = _get_table()
+    totals: dict[str, decimal] = defaultdict(decimal)
+
+    day = from_hour.replace(hour=0)
+    while day <= to_hour:
+        start = max(from_hour, day)
+        end = min(to_hour, day.replace(hour=23))
+        query_params = {
+            "KeyConditionExpression": Key("PK").eq(f"{kind}#{day:%Y%m%d}")
+            & Key("SK").between(f"{start:%H}#", f"{end:%H}#\uffff"),
+            "ProjectionExpression": "SK, TotalPrice",
+        }
+        while True:
+            response = table.query(**query_params)
+            for item in response["Items"]:
+                totals[item["SK"].split("#", 1)[1]] += item["TotalPrice"]
+            if "LastEvaluatedKey" not in response:
+                break
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        day += timedelta(days=1)
+
+    ranking = sorted(totals.items(), key=lambda entry: entry[1], reverse=True)
+    return [(id, float(price)) for id, price in ranking[:limit]]
+
+
+def parse_hour(value: str) -> datetime:
+    """Parse `YYYYMMDDHH` as UTC."""
+    return datetime.strptime(value, "%Y%m%d%H").replace(tzinfo=timezone.utc)
@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Generic, Iterable, TypeVar, cast
+
+import boto3
+from app.repositories.user import client
+from app.user import UserGroup, UserWithoutGroups
+from app.utils import get_current_time
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
+USER_POOL_ID = os.environ.get("USER_POOL_ID", "")
+# Snapshots of users and groups are built by a scheduled job and stored to the large message bucket by default,
+# so that Cognito is listed once per refresh rather than by every Lambda environment.
+# If no bucket is configured, searches go to Cognito directly.
+USER_INDEX_BUCKET = os.environ.get(
+    "USER_INDEX_BUCKET", os.environ.get("LARGE_MESSAGE_BUCKET", "")
+)
+USER_INDEX_PREFIX = "user_index"
+# Interval to reload the snapshots from S3. Set 0 to disable the index.
+USER_INDEX_REFRESH_SECONDS = int(os.environ.get("USER_INDEX_REFRESH_SECONDS", "300"))
+# Pools with more users than this are searched by Cognito directly
+USER_INDEX_MAX_USERS = int(os.environ.get("USER_INDEX_MAX_USERS", "50000"))
+
+s3_client = boto3.client("s3", BEDROCK_REGION)
+
+V = TypeVar("V")
+
+
+class PrefixIndex(Generic[V]):
+    """Immutable sorted array of case-insensitive keys, answering prefix queries by binary search."""
+
+    def __init__(self, entries: Iterable[tuple[str, V]]):
+        pairs = sorted(
+            ((key.lower(), value) for key, value in entries), key=lambda pair: pair[0]
+        )
+        self._keys = [key for key, _ in pairs]
+        self._values = [value for _, value in pairs]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def find(self, prefix: str, limit: int) -> list[V]:
+        prefix = prefix.lower()
+        results: list[V] = []
+        for i in range(bisect_left(self._keys, prefix), len(self._keys)):
+            if len(results) >= limit or not self._keys[i].startswith(prefix):
+                break
+            results.append(self._values[i])
+        return results
+
+
+class RefreshingPrefixIndex(Generic[V]):
+    """Prefix index reloaded from the snapshot in a background thread when older than `USER_INDEX_REFRESH_SECONDS`.
+    Queries never wait for loading. They are answered by the last loaded index,
+    or `None` is returned if it is not available yet so that callers can fall back to Cognito.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Iterable[tuple[str, V]] | None]):
+        self.name = name
+        self._load = load
+        self._index: PrefixIndex[V] | None = None
+        self._loaded_at = float("-inf")
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def find(self, prefix: str, limit: int) -> list[V] | None:
+        if USER_INDEX_REFRESH_SECONDS <= 0 or not USER_INDEX_BUCKET:
+            return None
+
+        self._refresh_if_stale()
+        index = self._index
+        return None if index is None else index.find(prefix, limit)
+
+    def _refresh_if_stale(self):
+        with self._lock:
+            if (
+                self._refreshing
+                or time.monotonic() - self._loaded_at < USER_INDEX_REFRESH_SECONDS
+            ):
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def refresh(self):
+        """Reload the index. A failed or unavailable load is retried after the refresh interval."""
+        try:
+            entries = self._load()
+            self._index = None if entries is None else PrefixIndex(entries)
+            logger.info(
+                f"Loaded {self.name} index: {len(self._index) if self._index else 'unavailable'}"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to load {self.name} index: {e}")
+        finally:
+            with self._lock:
+                self._loaded_at = time.monotonic()
+                self._refreshing = False
+
+
+def _list_users() -> list[UserWithoutGroups] | None:
+    """List users with email from Cognito. Returns None if the pool has more than `USER_INDEX_MAX_USERS` users."""
+    users = []
+    paginator = client.get_paginator("list_users")
+    for page in paginator.paginate(
+        UserPoolId=USER_POOL_ID,
+        AttributesToGet=["email"],
+        PaginationConfig={"MaxItems": USER_INDEX_MAX_USERS + 1, "PageSize": 60},
+    ):
+        for item in page["Users"]:
+            if not any(attr["Name"] == "email" for attr in item.get("Attributes", [])):
+                continue
+            users.append(UserWithoutGroups.from_cognito_idp_response(cast(dict, item)))
+
+        if len(users) > USER_INDEX_MAX_USERS:
+            logger.info(
+                f"User pool has more than {USER_INDEX_MAX_USERS} users. Users are not indexed."
+            )
+            return None
+
+    return users
+
+
+def _list_groups() -> list[UserGroup]:
+    groups = []
+    paginator = client.get_paginator("list_groups")
+    for page in paginator.paginate(UserPoolId=USER_POOL_ID):
+        for item in page["Groups"]:
+            groups.append(UserGroup.from_cognito_idp_response(cast(dict, item)))
+
+    return groups
+
+
+def _compose_snapshot_path(name: str) -> str:
+    return f"{USER_INDEX_PREFIX}/{name}.json"
+
+
+def _store_snapshot(name: str, entries: list[dict] | None):
+    s3_client.put_object(
+        Bucket=USER_INDEX_BUCKET,
+        Key=_compose_snapshot_path(name),
+        Body=json.dumps({"RefreshedTime": get_current_time(), "Entries": entries}),
+        ContentType="application/json",
+    )
+    logger.info(
+        f"Stored {name} snapshot: {len(entries) if entries is not None else 'not indexed'}"
+    )
+
+
+def _load_snapshot(name: str) -> list[dict[str, Any]] | None:
+    try:
+        response = s3_client.get_object(
+            Bucket=USER_INDEX_BUCKET, Key=_compose_snapshot_path(name)
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            logger.warning(f"Snapshot {name} has not been built yet.")
+            return None
+        raise e
+
+    return json.loads(response["Body"].read())["Entries"]
+
+
+def build_snapshots():
+    """List users and groups from Cognito and store them as snapshots loaded by the indexes."""
+    if not USER_INDEX_BUCKET:
+        logger.warning("Bucket for user index snapshots is not configured.")
+        return
+
+    users = _list_users()
+    _store_snapshot(
+        "users", None if users is None else [user.model_dump() for user in users]
+    )
+    _store_snapshot("groups", [group.model_dump() for group in _list_groups()])
+
+
+def _load_users() -> list[tuple[str, UserWithoutGroups]] | None:
+    entries = _load_snapshot("users")
+    if entries is None:
+        return None
+
+    users = [UserWithoutGroups(**entry) for entry in entries]
+    return [(user.email, user) for user in users]
+
+
+def _load_groups() -> list[tuple[str, UserGroup]] | None:
+    entries = _load_snapshot("groups")
+    if entries is None:
+        return None
+
+    groups = [UserGroup(**entry) for entry in entries]
+    return [(group.name, group) for group in groups]
+
+
+users_by_email_index = RefreshingPrefixIndex("user", _load_users)
+groups_by_name_index = RefreshingPrefixIndex("group", _load_groups)
@@ -29,6 +29,7 @@ from app.usecases.bot import (
     fetch_all_pinned_bots,
     fetch_available_agent_tools,
     fetch_bot_summary,
+    fetch_owned_bots_page,
     issue_presigned_url,
     modify_bot_visibility,
     modify_owned_bot,
@@ -38,7 +39,7 @@ from app.usecases.bot import (
     remove_uploaded_file,
 )
 from app.user import User
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -87,9 +88,11 @@ def patch_bot_shared_status(
 @router.get("/bot", response_model=list[BotMetaOutput])
 def get_all_bots(
     request: Request,
+    response: Response,
     kind: Literal["private", "mixed"] = "private",
     starred: bool = False,
     limit: int | None = None,
+    next_token: str | None = None,
 ):
     """Get all bots. The order is descending by `last_used_time`.
     - If `kind` is `private`, only private bots will be returned.
@@ -98,9 +101,17 @@ def get_all_bots(
         - When kind is `private`, this will be ignored.
     - If `limit` is specified, only the first n bots will be returned.
         - Cannot specify both `starred` and `limit`.
+    - If `kind` is `private` and `limit` or `next_token` is specified, a page of bots will be returned.
+        - The token to fetch the next page is returned in `X-Next-Token` header if more bots exist.
     """
     current_user: User = request.state.current_user
 
+    if kind == "private" and (limit or next_token):
+        bots, next_token = fetch_owned_bots_page(current_user, limit, next_token)
+        if next_token:
+            response.headers["X-Next-Token"] = next_token
+        return bots
+
     bots = fetch_all_bots(current_user, limit, starred, kind)
     return bots
 
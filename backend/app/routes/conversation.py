@@ -14,6 +14,7 @@ from app.routes.schemas.conversation import (
     Conversation,
     ConversationMetaOutput,
     ConversationSearchResult,
+    ConversationSuggestion,
     FeedbackInput,
     FeedbackOutput,
     NewTitleInput,
@@ -26,6 +27,7 @@ from app.usecases.chat import (
     fetch_conversation,
     propose_conversation_title,
     search_conversations as search_conversations_usecase,
+    suggest_conversations,
 )
 from app.user import User
 from fastapi import APIRouter, Request
@@ -136,6 +138,15 @@ def search_conversations(request: Request, query: str):
     return output
 
 
+@router.get("/conversations/suggest", response_model=list[ConversationSuggestion])
+def get_conversation_suggestions(request: Request, query: str, limit: int = 5):
+    """Suggest conversations by the prefix of words in the title or the first message.
+    Lightweight search for typeahead. Use `/conversations/search` for full results.
+    """
+    current_user: User = request.state.current_user
+    return suggest_conversations(query, current_user, limit)
+
+
 @router.patch("/conversation/{conversation_id}/title")
 def patch_conversation_title(
     request: Request, conversation_id: str, new_title_input: NewTitleInput
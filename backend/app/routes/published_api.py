@@ -4,20 +4,77 @@ from time import sleep
 
 import boto3
 from app.routes.schemas.conversation import ChatInput, Conversation, MessageInput
+from app.repositories.models.batch import BatchItemModel
 from app.routes.schemas.published_api import (
+    BatchInput,
+    BatchItemOutput,
+    BatchOutput,
+    BatchRequestedResponse,
     ChatInputWithoutBotId,
     ChatOutputWithoutBotId,
     MessageRequestedResponse,
+    MessageResultOutput,
+)
+from app.usecases.batch import (
+    accept_batch,
+    fetch_batch,
+    reject_batch_item,
+    reserve_batch_request,
 )
 from app.usecases.chat import chat, fetch_conversation
+from app.usecases.message_result import (
+    accept_message,
+    fetch_message_result,
+    release_request,
+    reserve_request,
+)
 from app.user import User
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Header, HTTPException, Request
 from ulid import ULID
 
 router = APIRouter(tags=["published_api"])
 
 sqs_client = boto3.client("sqs")
 QUEUE_URL = os.environ.get("QUEUE_URL", "")
+# Limits of `SendMessageBatch`
+SQS_BATCH_MAX_ENTRIES = 10
+SQS_BATCH_MAX_BYTES = 256 * 1024
+
+
+def _send_message_batches(bodies: list[str]) -> dict[int, str]:
+    """Send messages with `SendMessageBatch` to reduce requests.
+    Returns:
+        Map of the index of each message failed to send to the error.
+    """
+    chunks: list[list[int]] = []
+    size = 0
+    for i, body in enumerate(bodies):
+        body_size = len(body.encode("utf-8"))
+        if (
+            not chunks
+            or len(chunks[-1]) >= SQS_BATCH_MAX_ENTRIES
+            or size + body_size > SQS_BATCH_MAX_BYTES
+        ):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(i)
+        size += body_size
+
+    errors: dict[int, str] = {}
+    for chunk in chunks:
+        try:
+            response = sqs_client.send_message_batch(
+                QueueUrl=QUEUE_URL,
+                Entries=[{"Id": str(i), "MessageBody": bodies[i]} for i in chunk],
+            )
+        except Exception as e:
+            errors.update({i: str(e) for i in chunk})
+            continue
+
+        for failure in response.get("Failed", []):
+            errors[int(failure["Id"])] = failure.get("Message", failure["Code"])
+
+    return errors
 
 
 @router.get("/health")
@@ -27,7 +84,16 @@ def health():
 
 
 @router.post("/conversation", response_model=MessageRequestedResponse)
-def post_message(request: Request, message_input: ChatInputWithoutBotId):
+def post_message(
+    request: Request,
+    message_input: ChatInputWithoutBotId,
+    idempotency_key: str | None = Header(
+        None,
+        max_length=256,
+        description="""Unique key of the request.
+        Retries with the same key within 24 hours return the response of the first request without sending the message again.""",
+    ),
+):
     """Send chat message"""
     current_user: User = request.state.current_user
 
@@ -60,11 +126,30 @@ def post_message(request: Request, message_input: ChatInputWithoutBotId):
         enable_reasoning=message_input.enable_reasoning,
     )
 
+    if idempotency_key is not None:
+        # Scoped to the conversation because the same key may be reused for another conversation
+        idempotency_key = f"{message_input.conversation_id or ''}#{idempotency_key}"
+        previous = reserve_request(
+            current_user.id, idempotency_key, conversation_id, response_message_id
+        )
+        if previous is not None:
+            return previous
+
     try:
+        # Store before enqueue so that the result can be polled as soon as the response is returned
+        accept_message(
+            user_id=current_user.id,
+            conversation_id=conversation_id,
+            message_id=response_message_id,
+            callback_url=message_input.callback_url,
+        )
         _ = sqs_client.send_message(
             QueueUrl=QUEUE_URL, MessageBody=chat_input.model_dump_json()
         )
     except Exception as e:
+        # Allow the client to retry with the same key
+        if idempotency_key is not None:
+            release_request(current_user.id, idempotency_key)
         raise HTTPException(status_code=500, detail=str(e))
 
     return MessageRequestedResponse(
@@ -72,6 +157,116 @@ def post_message(request: Request, message_input: ChatInputWithoutBotId):
     )
 
 
+@router.get("/result/{message_id}", response_model=MessageResultOutput)
+def get_message_result(request: Request, message_id: str):
+    """Get the result of the message sent by `POST /conversation`. If the result does not exist, it will return 404.
+    This does not load the conversation, so use this to poll the completion.
+    """
+    current_user: User = request.state.current_user
+
+    return fetch_message_result(current_user.id, message_id)
+
+
+@router.post("/batch", response_model=BatchRequestedResponse)
+def post_batch(
+    request: Request,
+    batch_input: BatchInput,
+    idempotency_key: str | None = Header(
+        None,
+        max_length=256,
+        description="""Unique key of the request.
+        Retries with the same key within 24 hours return the response of the first request without sending the messages again.""",
+    ),
+):
+    """Send multiple chat messages at once.
+    Each item is answered asynchronously in the same way as `POST /conversation`.
+    Poll `GET /batch/{batch_id}` for the progress, and download the results when completed.
+    """
+    current_user: User = request.state.current_user
+
+    bot_id = (
+        current_user.id.split("#")[1] if "#" in current_user.id else current_user.id
+    )
+
+    batch_id = str(ULID())
+    items = [
+        BatchItemModel(
+            custom_id=item.custom_id,
+            conversation_id=(
+                str(ULID()) if item.conversation_id is None else item.conversation_id
+            ),
+            message_id=str(ULID()),
+        )
+        for item in batch_input.items
+    ]
+    response = BatchRequestedResponse(
+        batch_id=batch_id,
+        items=[
+            BatchItemOutput(
+                custom_id=item.custom_id,
+                conversation_id=item.conversation_id,
+                message_id=item.message_id,
+            )
+            for item in items
+        ],
+    )
+
+    if idempotency_key is not None:
+        idempotency_key = f"BATCH#{idempotency_key}"
+        previous = reserve_batch_request(current_user.id, idempotency_key, response)
+        if previous is not None:
+            return previous
+
+    try:
+        accept_batch(current_user.id, batch_id, items)
+    except Exception as e:
+        if idempotency_key is not None:
+            release_request(current_user.id, idempotency_key)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    bodies = []
+    for item, item_input in zip(items, batch_input.items):
+        chat_input = ChatInput(
+            conversation_id=item.conversation_id,
+            message=MessageInput(
+                role="user",
+                content=item_input.message.content,
+                model=item_input.message.model,
+                parent_message_id=None,  # Use the latest message as the parent
+                message_id=item.message_id,
+            ),
+            bot_id=bot_id,
+            continue_generate=False,
+            enable_reasoning=batch_input.enable_reasoning,
+        )
+        # The consumer records completion of the item on the batch
+        bodies.append(
+            json.dumps(
+                {**json.loads(chat_input.model_dump_json()), "batchId": batch_id}
+            )
+        )
+
+    # Items not enqueued are completed as failed, so that the batch still completes.
+    for i, error in _send_message_batches(bodies).items():
+        reject_batch_item(
+            current_user.id,
+            batch_id,
+            items[i].conversation_id,
+            items[i].message_id,
+            error,
+        )
+
+    return response
+
+
+@router.get("/batch/{batch_id}", response_model=BatchOutput)
+def get_batch(request: Request, batch_id: str):
+    """Get the progress of the batch sent by `POST /batch`. If the batch does not exist, it will return 404."""
+    current_user: User = request.state.current_user
+
+    return fetch_batch(current_user.id, batch_id)
+
+
 @router.get("/conversation/{conversation_id}", response_model=Conversation)
 def get_conversation(request: Request, conversation_id: str):
     """Get a conversation history. If the conversation does not exist, it will return 404."""
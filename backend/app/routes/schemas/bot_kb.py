@@ -97,6 +97,7 @@ class BedrockKnowledgeBaseInput(BaseSchema):
     search_params: SearchParams
     knowledge_base_id: str | None = None
     exist_knowledge_base_id: str | None = None
+    shared_knowledge_base_ids: list[str] = []
     parsing_model: type_kb_parsing_model = "disabled"
     web_crawling_scope: type_kb_web_crawling_scope = "DEFAULT"
     web_crawling_filters: WebCrawlingFilters = WebCrawlingFilters(
@@ -118,6 +119,7 @@ class BedrockKnowledgeBaseOutput(BaseSchema):
     search_params: SearchParams
     knowledge_base_id: str | None = None
     exist_knowledge_base_id: str | None = None
+    shared_knowledge_base_ids: list[str] = []
     data_source_ids: list[str] | None = None
     parsing_model: type_kb_parsing_model = "disabled"
     web_crawling_scope: type_kb_web_crawling_scope = "DEFAULT"
@@ -236,6 +236,11 @@ class ConversationSearchResult(BaseSchema):
     highlights: list[SearchHighlight] | None = None
 
 
+class ConversationSuggestion(BaseSchema):
+    id: str
+    title: str
+
+
 class Conversation(BaseSchema):
     id: str
     title: str
@@ -1,6 +1,14 @@
+from typing import Literal
+from urllib.parse import urlparse
+
+from app.repositories.models.message_result import type_message_result_status
 from app.routes.schemas.base import BaseSchema
 from app.routes.schemas.conversation import Content, MessageOutput, type_model_name
-from pydantic import Field
+from app.utils import is_private_host
+from pydantic import Field, field_validator
+
+# Maximum number of items per batch, bounded so that all items are enqueued within a request
+BATCH_MAX_ITEMS = 500
 
 
 class MessageInputWithoutMessageId(BaseSchema):
@@ -17,6 +25,25 @@ class ChatInputWithoutBotId(BaseSchema):
     message: MessageInputWithoutMessageId
     continue_generate: bool = Field(False)
     enable_reasoning: bool = Field(False)
+    callback_url: str | None = Field(
+        None,
+        description="""HTTPS URL to receive the result by POST request when the generation completes.
+        The request body is the same as the response of `GET /result/{message_id}`.
+        The request is signed with the callback signing secret of the API:
+        `X-Signature` is `sha256=` followed by the hex HMAC-SHA256 of `{X-Signature-Timestamp}.{body}`.""",
+    )
+
+    @field_validator("callback_url")
+    def validate_callback_url(cls, v):
+        if v is None:
+            return v
+        url = urlparse(v)
+        if url.scheme != "https" or not url.hostname:
+            raise ValueError("Callback URL must be an HTTPS URL")
+        # Host names are resolved again before the callback, because they may change
+        if is_private_host(url.hostname):
+            raise ValueError("Callback URL must not be a private address")
+        return v
 
 
 class ChatOutputWithoutBotId(BaseSchema):
@@ -28,3 +55,82 @@ class ChatOutputWithoutBotId(BaseSchema):
 class MessageRequestedResponse(BaseSchema):
     conversation_id: str
     message_id: str
+
+
+class MessageResultOutput(BaseSchema):
+    conversation_id: str
+    message_id: str
+    status: type_message_result_status = Field(
+        ..., description="Either `PENDING`, `SUCCEEDED` or `FAILED`."
+    )
+    message: MessageOutput | None = Field(
+        None,
+        description="""Response message. Omitted if too large to store.
+        Use `GET /conversation/{conversation_id}/{message_id}` in that case.""",
+    )
+    error: str | None
+    create_time: float
+    complete_time: float | None
+
+
+class BatchItemResultOutput(MessageResultOutput):
+    custom_id: str | None
+
+
+class BatchItemInput(BaseSchema):
+    custom_id: str | None = Field(
+        None,
+        max_length=128,
+        description="Identifier of the item on the client side. It is copied to the result of the item.",
+    )
+    conversation_id: str | None = Field(
+        None,
+        description="""Unique conversation id.
+        If not provided, new conversation will be generated.
+        Must be unique within the batch, since items are processed concurrently.""",
+    )
+    message: MessageInputWithoutMessageId
+
+
+class BatchInput(BaseSchema):
+    items: list[BatchItemInput] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    enable_reasoning: bool = Field(False)
+
+    @field_validator("items")
+    def validate_unique_conversation_ids(cls, v):
+        # Concurrent messages to the same conversation overwrite each other
+        conversation_ids = [
+            item.conversation_id for item in v if item.conversation_id is not None
+        ]
+        if len(conversation_ids) != len(set(conversation_ids)):
+            raise ValueError("Conversation ids must be unique within a batch")
+        return v
+
+
+class BatchItemOutput(BaseSchema):
+    custom_id: str | None
+    conversation_id: str
+    message_id: str
+
+
+class BatchRequestedResponse(BaseSchema):
+    batch_id: str
+    items: list[BatchItemOutput] = Field(
+        ...,
+        description="Items in the same order as the request. Each result can also be polled by `GET /result/{message_id}`.",
+    )
+
+
+class BatchOutput(BaseSchema):
+    batch_id: str
+    status: Literal["RUNNING", "COMPLETED"]
+    total: int
+    succeeded: int
+    failed: int
+    create_time: float
+    complete_time: float | None
+    result_url: str | None = Field(
+        None,
+        description="""Presigned URL of the results in JSONL, one `BatchItemResultOutput` per line in the same order as the request.
+        Available when the status is `COMPLETED`.""",
+    )
@@ -1,27 +1,167 @@
 import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from app.routes.schemas.conversation import ChatInput
+from app.usecases.batch import complete_batch_item
 from app.usecases.chat import chat, chat_output_from_message
+from app.usecases.message_result import (
+    abort_message,
+    complete_message,
+    fetch_message_result,
+    start_message,
+)
 from app.user import User
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-def handler(event, context):
-    """SQS consumer.
-    This is used for async invocation for published api.
+# Maximum number of records processed concurrently
+SQS_CONSUMER_MAX_WORKERS = int(os.environ.get("SQS_CONSUMER_MAX_WORKERS", "10"))
+# Time reserved before the invocation times out to report failed records
+DEADLINE_MARGIN_MILLISECONDS = 10_000
+# Same as `maxReceiveCount` of the queue. Failures are stored only on the last attempt.
+CHAT_QUEUE_MAX_RECEIVE_COUNT = int(os.environ.get("CHAT_QUEUE_MAX_RECEIVE_COUNT", "2"))
+
+
+def _is_last_receive(record: dict) -> bool:
+    return (
+        int(record["attributes"]["ApproximateReceiveCount"])
+        >= CHAT_QUEUE_MAX_RECEIVE_COUNT
+    )
+
+
+def fail_record(record: dict, error: str):
+    """Store the failure of a record on its last receive. The record is moved to the dead-letter queue,
+    so otherwise its result stays pending and its batch never completes.
+    The ids are read from the raw body, so that records which cannot be parsed as `ChatInput` are also completed.
     """
-    for record in event["Records"]:
+    try:
+        message_body = json.loads(record["body"])
+        bot_id = message_body["bot_id"]
+        conversation_id = message_body["conversation_id"]
+        message_id = message_body["message"].get("message_id")
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.error(f"Message {record['messageId']} cannot be identified: {error}")
+        return
+    if message_id is None:
+        return
+
+    user = User.from_published_api_id(bot_id)
+    complete_message(
+        user_id=user.id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        error=error,
+    )
+    # Set for items sent by `POST /batch`
+    batch_id = message_body.get("batchId")
+    if batch_id is not None:
+        complete_batch_item(user.id, batch_id, message_id, succeeded=False)
+
+
+def process_record(record: dict):
+    try:
         message_body = json.loads(record["body"])
+        # Set for items sent by `POST /batch`
+        batch_id = message_body.pop("batchId", None)
         chat_input = ChatInput(**message_body)
+    except Exception as e:
+        if _is_last_receive(record):
+            fail_record(record, f"Invalid request: {e}")
+        raise
 
-        assert chat_input.bot_id is not None, "bot_id is required for published api"
+    assert chat_input.bot_id is not None, "bot_id is required for published api"
 
-        user = User.from_published_api_id(chat_input.bot_id)
+    user = User.from_published_api_id(chat_input.bot_id)
+    message_id = chat_input.message.message_id
 
+    if message_id is not None and not start_message(
+        user.id, chat_input.conversation_id, message_id
+    ):
+        # Redelivered message. Do not call the model again.
+        logger.info(f"Message {message_id} is already answered or being answered")
+        # Record the completion again in case the previous attempt failed after answering.
+        # This is not counted twice.
+        if (
+            batch_id is not None
+            and fetch_message_result(user.id, message_id).status == "SUCCEEDED"
+        ):
+            complete_batch_item(user.id, batch_id, message_id, succeeded=True)
+        return
+
+    try:
         conversation, message = chat(user=user, chat_input=chat_input)
-        chat_result = chat_output_from_message(
-            conversation=conversation,
-            message=message,
+    except Exception as e:
+        if message_id is not None:
+            if _is_last_receive(record):
+                fail_record(record, str(e))
+            else:
+                abort_message(user.id, message_id)
+        raise
+
+    chat_result = chat_output_from_message(
+        conversation=conversation,
+        message=message,
+    )
+    if message_id is not None:
+        complete_message(
+            user_id=user.id,
+            conversation_id=chat_result.conversation_id,
+            message_id=message_id,
+            output=chat_result.message,
+        )
+        if batch_id is not None:
+            complete_batch_item(user.id, batch_id, message_id, succeeded=True)
+
+
+def handler(event, context):
+    """SQS consumer.
+    This is used for async invocation for published api.
+    Records are processed concurrently, and only failed or unfinished records are reported
+    in `batchItemFailures` so that succeeded records are not delivered again.
+    """
+    records = event["Records"]
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(SQS_CONSUMER_MAX_WORKERS, len(records)))
+    )
+    futures = {executor.submit(process_record, record): record for record in records}
+
+    timeout = (
+        max(context.get_remaining_time_in_millis() - DEADLINE_MARGIN_MILLISECONDS, 0)
+        / 1000
+    )
+    done, not_done = wait(futures, timeout=timeout)
+    # Running threads cannot be cancelled, but records not started yet are never processed.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    failed_message_ids = []
+    for future in done:
+        exception = future.exception()
+        if exception is not None:
+            message_id = futures[future]["messageId"]
+            logger.error(
+                f"Failed to process message {message_id}: {exception}",
+                exc_info=exception,
+            )
+            failed_message_ids.append(message_id)
+    for future in not_done:
+        record = futures[future]
+        logger.warning(
+            f"Message {record['messageId']} did not complete before deadline"
         )
-        print(chat_result)
+        failed_message_ids.append(record["messageId"])
+        if _is_last_receive(record):
+            # The running attempt may still complete and overwrite the failure
+            try:
+                fail_record(record, "Did not complete before deadline")
+            except Exception as e:
+                logger.error(f"Failed to store failure of {record['messageId']}: {e}")
 
-    return {"statusCode": 200, "body": json.dumps("Processing completed")}
+    logger.info(f"Processed {len(records)} messages. Failed: {len(failed_message_ids)}")
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id} for message_id in failed_message_ids
+        ]
+    }
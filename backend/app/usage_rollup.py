@@ -0,0 +1,77 @@
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal as decimal
+from typing import Any
+
+from app.repositories.usage_rollup import (
+    apply_conversation_price,
+    record_rollup_start,
+    remove_conversation_state,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The start is recorded once per execution environment
+is_rollup_start_recorded = False
+
+
+def _compose_hour(approximate_creation_date_time: Any) -> datetime:
+    return datetime.fromtimestamp(
+        float(approximate_creation_date_time), timezone.utc
+    ).replace(minute=0, second=0, microsecond=0)
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Usage rollup handler.
+    This function is triggered by the conversation table stream.
+    Hourly cost aggregates per bot and per user are updated with the latest `TotalPrice` of each conversation,
+    so that admin rankings do not scan the stream export with Athena.
+    Retried batches are safe, because only the increase since the last applied price is aggregated.
+    """
+    global is_rollup_start_recorded
+
+    # Key: conversation SK. Records are ordered per item, so the last one is the latest.
+    latest: dict[str, dict] = {}
+    for record in event["Records"]:
+        keys = record["dynamodb"]["Keys"]
+        sk = keys.get("SK", {}).get("S", "")
+        if "#CONV#" not in sk:
+            # Ignore related documents
+            continue
+        latest[sk] = record
+
+    if latest and not is_rollup_start_recorded:
+        record_rollup_start(
+            min(
+                _compose_hour(record["dynamodb"]["ApproximateCreationDateTime"])
+                for record in latest.values()
+            )
+        )
+        is_rollup_start_recorded = True
+
+    applied = removed = 0
+    for sk, record in latest.items():
+        if record["eventName"] == "REMOVE":
+            remove_conversation_state(sk)
+            removed += 1
+            continue
+
+        image = record["dynamodb"]["NewImage"]
+        if "TotalPrice" not in image:
+            continue
+
+        hour = _compose_hour(record["dynamodb"]["ApproximateCreationDateTime"])
+        apply_conversation_price(
+            conversation_sk=sk,
+            # SK is not sharded unlike PK of published API conversations
+            user_id=sk.split("#CONV#", 1)[0],
+            bot_id=image.get("BotId", {}).get("S"),
+            total_price=decimal(image["TotalPrice"]["N"]),
+            hour=hour,
+        )
+        applied += 1
+
+    result = {"applied": applied, "removed": removed}
+    logger.info(f"Rollup completed: {result}")
+    return result
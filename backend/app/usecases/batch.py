@@ -0,0 +1,120 @@
+import logging
+
+from app.repositories.batch import (
+    BATCH_RESULT_BUCKET,
+    add_batch_completion,
+    find_batch,
+    find_batch_items,
+    store_batch,
+    store_batch_results,
+)
+from app.repositories.idempotency import store_idempotency_record
+from app.repositories.message_result import (
+    find_message_results,
+    store_pending_message_results,
+)
+from app.repositories.models.batch import BatchItemModel, BatchModel
+from app.routes.schemas.published_api import (
+    BatchItemResultOutput,
+    BatchOutput,
+    BatchRequestedResponse,
+)
+from app.usecases.message_result import complete_message, to_message_result_output
+from app.utils import generate_presigned_url
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BATCH_RESULT_URL_EXPIRATION_SECONDS = 3600
+
+
+def reserve_batch_request(
+    user_id: str, idempotency_key: str, response: BatchRequestedResponse
+) -> BatchRequestedResponse | None:
+    """Reserve the idempotency key for the batch.
+    If the key is already reserved by a previous request, the response of that request is returned.
+    """
+    previous = store_idempotency_record(user_id, idempotency_key, response.model_dump())
+    if previous is None:
+        return None
+    return BatchRequestedResponse(**previous)
+
+
+def accept_batch(user_id: str, batch_id: str, items: list[BatchItemModel]):
+    """Record the batch and the results of its items, so that clients can poll the progress."""
+    store_batch(user_id, batch_id, items)
+    store_pending_message_results(
+        user_id, [(item.conversation_id, item.message_id) for item in items]
+    )
+
+
+def fetch_batch(user_id: str, batch_id: str) -> BatchOutput:
+    batch = find_batch(user_id, batch_id)
+    return BatchOutput(
+        batch_id=batch.id,
+        status="COMPLETED" if batch.result_path is not None else "RUNNING",
+        total=batch.total,
+        succeeded=batch.succeeded,
+        failed=batch.failed,
+        create_time=batch.create_time,
+        complete_time=batch.complete_time,
+        result_url=(
+            generate_presigned_url(
+                BATCH_RESULT_BUCKET,
+                batch.result_path,
+                expiration=BATCH_RESULT_URL_EXPIRATION_SECONDS,
+                client_method="get_object",
+            )
+            if batch.result_path is not None
+            else None
+        ),
+    )
+
+
+def complete_batch_item(user_id: str, batch_id: str, message_id: str, succeeded: bool):
+    """Record completion of the item. The results are written when the last item completed."""
+    batch = add_batch_completion(user_id, batch_id, message_id, succeeded)
+    if batch.is_completed() and batch.result_path is None:
+        _store_results(user_id, batch)
+
+
+def reject_batch_item(
+    user_id: str, batch_id: str, conversation_id: str, message_id: str, error: str
+):
+    """Complete the item as failed without generation, e.g. when it could not be enqueued."""
+    complete_message(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        error=error,
+    )
+    complete_batch_item(user_id, batch_id, message_id, succeeded=False)
+
+
+def _store_results(user_id: str, batch: BatchModel):
+    items = find_batch_items(user_id, batch.id)
+    results = find_message_results(user_id, [item.message_id for item in items])
+
+    lines = []
+    for item in items:
+        result = results.get(item.message_id)
+        if result is not None:
+            output = BatchItemResultOutput(
+                custom_id=item.custom_id,
+                **to_message_result_output(result).model_dump(),
+            )
+        else:
+            output = BatchItemResultOutput(
+                custom_id=item.custom_id,
+                conversation_id=item.conversation_id,
+                message_id=item.message_id,
+                status="FAILED",
+                message=None,
+                error="Result not found",
+                create_time=batch.create_time,
+                complete_time=None,
+            )
+        lines.append(output.model_dump_json(by_alias=True))
+
+    result_path = store_batch_results(user_id, batch.id, lines)
+    logger.info(f"Stored results of batch {batch.id} to {result_path}")
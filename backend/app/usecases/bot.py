@@ -6,6 +6,12 @@ from app.agents.tools.agent_tool import AgentTool
 from app.agents.utils import get_available_tools
 from app.config import DEFAULT_GENERATION_CONFIG
 from app.config import GenerationParams as GenerationParamsDict
+from app.repositories.bot_store_feed import (
+    find_feed,
+    remove_bot_from_feeds,
+    update_pinned_feed,
+)
+from app.repositories.bot_usage import record_bot_usage, record_last_used_time
 from app.repositories.common import RecordNotFoundError
 from app.repositories.custom_bot import (
     alias_exists,
@@ -14,6 +20,7 @@ from app.repositories.custom_bot import (
     find_alias_by_bot_id,
     find_bot_by_id,
     find_owned_bots_by_user_id,
+    find_owned_bots_page,
     find_pinned_public_bots,
     find_recently_used_bots_by_user_id,
     find_starred_bots_by_user_id,
@@ -22,18 +29,16 @@ from app.repositories.custom_bot import (
     store_alias,
     store_bot,
     update_alias_is_origin_accessible,
-    update_alias_last_used_time,
     update_alias_star_status,
     update_bot,
-    update_bot_last_used_time,
     update_bot_shared_status,
     update_bot_star_status,
-    update_bot_stats,
 )
 from app.repositories.models.custom_bot import (
     ActiveModelsModel,
     AgentModel,
     BotAliasModel,
+    BotMeta,
     BotModel,
     ConversationQuickStarterModel,
     GenerationParamsModel,
@@ -392,9 +397,31 @@ def fetch_all_bots(
     return bot_metas
 
 
+def fetch_owned_bots_page(
+    user: User, limit: int | None = None, next_token: str | None = None
+) -> tuple[list[BotMetaOutput], str | None]:
+    """Fetch a page of private owned bots.
+    The order is descending by `last_used_time`.
+    Returns the bots and the token to fetch the next page, which is None on the last page.
+    """
+    if limit and (limit < 0 or limit > 100):
+        raise ValueError("Limit must be between 0 and 100")
+
+    bots, next_token = find_owned_bots_page(user.id, limit=limit, next_token=next_token)
+    return [bot.to_output() for bot in bots], next_token
+
+
 def fetch_all_pinned_bots(user: User) -> list[BotMetaOutput]:
     """Fetch all pinned bots. Currently, only public pinned bots are supported."""
-    bots = find_pinned_public_bots()
+    feed = find_feed("pinned")
+    if feed is None:
+        bots = find_pinned_public_bots()
+    else:
+        # Note: pinned bot should not be editable directly, so `owned=False`
+        bots = [
+            BotMeta.from_dynamo_item(item, owned=False, is_origin_accessible=True)
+            for item in feed
+        ]
     bot_metas = []
     for bot in bots:
         bot_metas.append(bot.to_output())
@@ -462,6 +489,8 @@ def remove_bot_by_id(user: User, bot_id: str):
     if bot.is_editable_by_user(user):
         owner_user_id = bot.owner_user_id
         delete_bot_by_id(owner_user_id, bot_id)
+        if bot.shared_scope == "all":
+            remove_bot_from_feeds(bot_id)
     else:
         delete_alias_by_id(user.id, bot_id)
 
@@ -546,6 +575,8 @@ def modify_bot_visibility(
         target_allowed_user_ids,
         target_allowed_group_ids,
     )
+    if bot.shared_scope == "all" and target_shared_scope != "all":
+        remove_bot_from_feeds(bot_id)
 
 
 def modify_pinning_status(bot_id: str, push_input: PushBotInput):
@@ -577,24 +608,29 @@ def modify_pinning_status(bot_id: str, push_input: PushBotInput):
         bot.allowed_cognito_users,
         bot.allowed_cognito_groups,
     )
+    update_pinned_feed(bot.owner_user_id, bot_id)
 
 
 def modify_bot_last_used_time(user: User, bot: BotModel):
-    """Modify bot last used time."""
+    """Modify bot last used time.
+    The write is buffered and aggregated per bot. Call `flush_bot_usage` to write it.
+    """
     if bot.is_owned_by_user(user):
-        return update_bot_last_used_time(user.id, bot.id)
+        record_last_used_time(user.id, bot.id, "bot")
     else:
-        return update_alias_last_used_time(user.id, bot.id)
+        record_last_used_time(user.id, bot.id, "alias")
 
 
 def modify_bot_stats(user: User, bot: BotModel, increment: int):
-    """Modify bot stats."""
+    """Modify bot stats.
+    The write is buffered and aggregated per bot. Call `flush_bot_usage` to write it.
+    """
     if bot.is_owned_by_user(user):
         owner_id = user.id
     else:
         owner_id = bot.owner_user_id
 
-    return update_bot_stats(owner_id, bot.id, increment)
+    record_bot_usage(owner_id, bot.id, increment)
 
 
 def issue_presigned_url(
@@ -1,10 +1,14 @@
 import logging
+import random
 
 from app.repositories.bot_store import (
     find_bots_by_query,
     find_bots_sorted_by_usage_count,
+    find_non_public_bot_sources,
     find_random_bots,
 )
+from app.repositories.bot_store_feed import find_feed
+from app.repositories.models.custom_bot import BotMeta
 from app.routes.schemas.bot import BotMetaOutput
 from app.routes.schemas.bot_guardrails import BedrockGuardrailsOutput
 from app.routes.schemas.bot_kb import BedrockKnowledgeBaseOutput
@@ -31,17 +35,42 @@ def search_bots(
     return bot_metas
 
 
+def _merge_feed_with_non_public_bots(
+    user: User, feed: list[dict], limit: int
+) -> list[dict]:
+    """Merge the public bots of the feed with the bots accessible only by the user."""
+    sources = {source["BotId"]: source for source in feed}
+    for source in find_non_public_bot_sources(user, limit=limit):
+        sources[source["BotId"]] = source
+    return list(sources.values())
+
+
+def _usage_count(source: dict) -> int:
+    return source.get("UsageStats", {}).get("usage_count", 0)
+
+
 def fetch_popular_bots(
     user: User,
     limit: int = 20,
 ) -> list[BotMetaOutput]:
     """Search bots sorted by usage count.
     This method is used for bot-store functionality (Popular bots).
+    Public bots are read from the precomputed feed if available.
     """
-    bots = find_bots_sorted_by_usage_count(
-        user,
-        limit=limit,
-    )
+    feed = find_feed("popular")
+    if feed is None:
+        bots = find_bots_sorted_by_usage_count(
+            user,
+            limit=limit,
+        )
+    else:
+        sources = _merge_feed_with_non_public_bots(user, feed, limit)
+        sources.sort(key=_usage_count, reverse=True)
+        bots = [
+            BotMeta.from_opensearch_response({"_source": source}, user.id)
+            for source in sources[:limit]
+        ]
+
     bot_metas = []
     for bot in bots:
         bot_metas.append(bot.to_output())
@@ -54,11 +83,21 @@ def fetch_pickup_bots(
 ) -> list[BotMetaOutput]:
     """Search bots sorted by usage count.
     This method is used for bot-store functionality (Today's pickup bots).
+    Public bots are sampled from the precomputed feed if available.
     """
-    bots = find_random_bots(
-        user,
-        limit=limit,
-    )
+    feed = find_feed("pickup")
+    if feed is None:
+        bots = find_random_bots(
+            user,
+            limit=limit,
+        )
+    else:
+        sources = _merge_feed_with_non_public_bots(user, feed, limit)
+        bots = [
+            BotMeta.from_opensearch_response({"_source": source}, user.id)
+            for source in random.sample(sources, min(limit, len(sources)))
+        ]
+
     bot_metas = []
     for bot in bots:
         bot_metas.append(bot.to_output())
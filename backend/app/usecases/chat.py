@@ -1,5 +1,8 @@
 import logging
-from typing import Callable, Dict
+import os
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Dict
 
 from app.agents.tools.agent_tool import AgentTool, ToolRunResult
 from app.agents.tools.knowledge import create_knowledge_tool
@@ -10,13 +13,17 @@ from app.bedrock import (
     is_tooluse_supported,
 )
 from app.prompt import build_rag_prompt, get_prompt_to_cite_tool_results
+from app.repositories.bot_usage import flush_bot_usage
 from app.repositories.conversation import (
     RecordNotFoundError,
     find_conversation_by_id,
     store_conversation,
     store_related_documents,
 )
-from app.repositories.conversation_search import find_conversations_by_query
+from app.repositories.conversation_search import (
+    find_conversation_suggestions,
+    find_conversations_by_query,
+)
 from app.repositories.custom_bot import alias_exists, store_alias
 from app.repositories.models.conversation import (
     ConversationModel,
@@ -41,37 +48,101 @@ from app.routes.schemas.conversation import (
     Conversation,
     ConversationMetaOutput,
     ConversationSearchResult,
+    ConversationSuggestion,
     FeedbackOutput,
     MessageOutput,
     SearchHighlight,
+    TextContent,
     type_model_name,
 )
 from app.stream import ConverseApiStreamHandler, OnStopInput, OnThinking
 from app.usecases.bot import fetch_bot, modify_bot_last_used_time, modify_bot_stats
 from app.user import User
-from app.utils import get_current_time
+from app.utils import emit_metric, get_current_time
 from app.vector_search import (
     SearchResult,
     search_related_docs,
     search_result_to_related_document,
     to_guardrails_grounding_source,
 )
+from reretry import retry_call
 from ulid import ULID
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Used to overlap I/O bound steps of chat. Reused across invocations of the same Lambda environment.
+# Each chat runs up to two steps at once, so handlers running chats concurrently (e.g. the SQS consumer)
+# size this by their concurrency.
+CHAT_EXECUTOR_MAX_WORKERS = int(os.environ.get("CHAT_EXECUTOR_MAX_WORKERS", "4"))
+executor = ThreadPoolExecutor(max_workers=CHAT_EXECUTOR_MAX_WORKERS)
+
+POST_RESPONSE_TASK_TRIES = 3
+POST_RESPONSE_TASK_DELAY = 0.2
+
+
+def prefetch_conversation_and_bot(
+    user: User,
+    chat_input: ChatInput,
+    bot_future: Future[tuple[bool, BotModel]] | None = None,
+) -> tuple[ConversationModel | None, tuple[bool, BotModel] | None]:
+    """Fetch the conversation and the bot concurrently.
+    The conversation is `None` if it does not exist yet.
+    Raises as soon as either fetch fails, without waiting for the other.
+    """
+    if bot_future is None:
+        if not chat_input.bot_id:
+            try:
+                return (
+                    find_conversation_by_id(user.id, chat_input.conversation_id),
+                    None,
+                )
+            except RecordNotFoundError:
+                return None, None
+
+        logger.info("Bot id is provided. Fetching bot.")
+        bot_future = executor.submit(fetch_bot, user, chat_input.bot_id)
+
+    conversation_future = executor.submit(
+        find_conversation_by_id, user.id, chat_input.conversation_id
+    )
+    futures: list[Future[Any]] = [conversation_future, bot_future]
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        error = future.exception()
+        # NOTE: Conversation not found means a new conversation
+        if error is not None and not (
+            future is conversation_future and isinstance(error, RecordNotFoundError)
+        ):
+            raise error
+
+    try:
+        conversation = conversation_future.result()
+    except RecordNotFoundError:
+        conversation = None
+    return conversation, bot_future.result()
+
 
 def prepare_conversation(
     user: User,
     chat_input: ChatInput,
+    bot_future: Future[tuple[bool, BotModel]] | None = None,
 ) -> tuple[str, ConversationModel, BotModel | None]:
+    """Prepare conversation to chat.
+    If `bot_future` is given, the bot is taken from it instead of fetching.
+    """
     current_time = get_current_time()
     bot = None
 
-    try:
-        # Fetch existing conversation
-        conversation = find_conversation_by_id(user.id, chat_input.conversation_id)
+    found_conversation, fetched_bot = prefetch_conversation_and_bot(
+        user, chat_input, bot_future=bot_future
+    )
+    if fetched_bot is not None:
+        owned, bot = fetched_bot
+
+    if found_conversation is not None:
+        # Existing conversation
+        conversation = found_conversation
         logger.info(f"Found conversation: {conversation}")
         parent_id = chat_input.message.parent_message_id
         if chat_input.message.parent_message_id == "system" and chat_input.bot_id:
@@ -79,10 +150,7 @@ def prepare_conversation(
             parent_id = "instruction"
         elif chat_input.message.parent_message_id is None:
             parent_id = conversation.last_message_id
-        if chat_input.bot_id:
-            logger.info("Bot id is provided. Fetching bot.")
-            owned, bot = fetch_bot(user, chat_input.bot_id)
-    except RecordNotFoundError:
+    else:
         # The case for new conversation. Note that editing first user message is not considered as new conversation.
         logger.info(
             f"No conversation found with id: {chat_input.conversation_id}. Creating new conversation."
@@ -109,10 +177,9 @@ def prepare_conversation(
         }
         parent_id = "system"
         if chat_input.bot_id:
-            logger.info("Bot id is provided. Fetching bot.")
+            assert bot is not None
             parent_id = "instruction"
-            # Fetch bot and append instruction
-            owned, bot = fetch_bot(user, chat_input.bot_id)
+            # Append instruction of the bot
             initial_message_map["instruction"] = MessageModel(
                 role="instruction",
                 content=[
@@ -131,16 +198,14 @@ def prepare_conversation(
             )
             initial_message_map["system"].children.append("instruction")
 
-            if not owned:
-                try:
-                    # Check alias is already created
-                    alias_exists(user.id, chat_input.bot_id)
-                except RecordNotFoundError:
-                    logger.info(
-                        "Bot is not owned by the user. Creating alias to shared bot."
-                    )
-                    # Create alias item
-                    store_alias(user.id, BotAliasModel.from_bot_for_initial_alias(bot))
+            # NOTE: Alias is checked only for the first message of the conversation,
+            # so it is not prefetched to avoid an extra read on every message.
+            if not owned and not alias_exists(user.id, chat_input.bot_id):
+                logger.info(
+                    "Bot is not owned by the user. Creating alias to shared bot."
+                )
+                # Create alias item
+                store_alias(user.id, BotAliasModel.from_bot_for_initial_alias(bot))
 
         # Create new conversation
         conversation = ConversationModel(
@@ -208,6 +273,69 @@ def trace_to_root(
     return result[::-1]
 
 
+def _run_post_response_task(name: str, task: Callable[[], Any]) -> None:
+    try:
+        retry_call(
+            task,
+            tries=POST_RESPONSE_TASK_TRIES,
+            delay=POST_RESPONSE_TASK_DELAY,
+            backoff=2,
+            logger=logger,
+        )
+    except Exception as e:
+        # NOTE: The response has already been delivered. Do not fail the chat.
+        logger.exception(f"Post-response task {name} failed: {e}")
+        emit_metric("PostResponseTaskFailure", 1, Task=name)
+
+
+def start_post_response_tasks(tasks: dict[str, Callable[[], Any]]) -> list[Future]:
+    """Start bookkeeping tasks which are not needed to deliver the response.
+    Tasks run concurrently and are retried. Failures are logged and emitted as metrics.
+    Callers must wait for the returned futures before the Lambda invocation ends.
+    """
+    return [
+        executor.submit(_run_post_response_task, name, task)
+        for name, task in tasks.items()
+    ]
+
+
+def _search_related_docs_of_bot(
+    bot_future: Future[tuple[bool, BotModel]], query: str
+) -> list[SearchResult]:
+    _, bot = bot_future.result()
+    if not bot.has_knowledge():
+        return []
+    return search_related_docs(bot=bot, query=query)
+
+
+def start_speculative_search(
+    user: User, chat_input: ChatInput
+) -> tuple[Future[tuple[bool, BotModel]], Future[list[SearchResult]]] | None:
+    """Start fetching the bot and searching its knowledge in background,
+    so that the retrieval overlaps with loading the conversation.
+    Returns `None` if the query cannot be known before loading the conversation,
+    or the retrieval is not needed (agent mode handles retrieval as a tool).
+    """
+    if (
+        chat_input.bot_id is None
+        or chat_input.continue_generate
+        or is_tooluse_supported(chat_input.message.model)
+    ):
+        return None
+
+    # NOTE: Currently embedding not support multi-modal. Use the last content as in `chat`.
+    content = chat_input.message.content[-1]
+    if not isinstance(content, TextContent):
+        return None
+
+    bot_future = executor.submit(fetch_bot, user, chat_input.bot_id)
+    # NOTE: Submitted after `bot_future`, so it never occupies a worker the bot fetch is waiting for
+    search_future = executor.submit(
+        _search_related_docs_of_bot, bot_future, content.body
+    )
+    return bot_future, search_future
+
+
 def chat(
     user: User,
     chat_input: ChatInput,
@@ -217,7 +345,10 @@ def chat(
     on_tool_result: Callable[[ToolRunResult], None] | None = None,
     on_reasoning: Callable[[str], None] | None = None,
 ) -> tuple[ConversationModel, MessageModel]:
-    user_msg_id, conversation, bot = prepare_conversation(user, chat_input)
+    speculation = start_speculative_search(user, chat_input)
+    user_msg_id, conversation, bot = prepare_conversation(
+        user, chat_input, bot_future=speculation[0] if speculation else None
+    )
 
     # # Set tools only when tooluse is supported
     tools: Dict[str, AgentTool] = {}
@@ -271,7 +402,12 @@ def chat(
                         }
                     )
 
-                search_results = search_related_docs(bot=bot, query=content.body)
+                search_results = (
+                    # Join the retrieval started before loading the conversation
+                    speculation[1].result()
+                    if speculation
+                    else search_related_docs(bot=bot, query=content.body)
+                )
                 logger.info(f"Search results from vector store: {search_results}")
 
                 if on_tool_result:
@@ -478,22 +614,31 @@ def chat(
 
     # Store conversation before finish streaming so that front-end can avoid 404 issue
     store_conversation(user.id, conversation)
-    store_related_documents(
-        user_id=user.id,
-        conversation_id=conversation.id,
-        related_documents=related_documents,
-    )
 
-    if on_stop:
-        on_stop(result)
-
-    # Update bot last used time
+    # Other writes are not needed to finish streaming
+    post_response_tasks: dict[str, Callable[[], Any]] = {}
+    if related_documents:
+        post_response_tasks["store_related_documents"] = partial(
+            store_related_documents,
+            user_id=user.id,
+            conversation_id=conversation.id,
+            related_documents=related_documents,
+        )
     if bot:
         logger.info("Bot is provided. Updating bot last used time.")
         # Update bot last used time
         modify_bot_last_used_time(user, bot)
         # Update bot stats
         modify_bot_stats(user, bot, increment=1)
+        # NOTE: Updates above are aggregated per bot to avoid hot bot items
+        post_response_tasks["flush_bot_usage"] = flush_bot_usage
+    post_response_futures = start_post_response_tasks(post_response_tasks)
+
+    if on_stop:
+        on_stop(result)
+
+    # NOTE: Background threads are frozen once the Lambda invocation ends
+    wait(post_response_futures)
 
     return conversation, message
 
@@ -683,3 +828,21 @@ def search_conversations(query: str, user: User) -> list[ConversationSearchResul
         )
 
     return output
+
+
+def suggest_conversations(
+    query: str, user: User, limit: int = 5
+) -> list[ConversationSuggestion]:
+    """Suggest conversations while the user types the search query"""
+    if not 1 <= limit <= 20:
+        raise ValueError("limit must be between 1 and 20")
+
+    # Suggestions are useless until a meaningful prefix is typed
+    query = query.strip()
+    if not query:
+        return []
+
+    return [
+        ConversationSuggestion(id=suggestion.id, title=suggestion.title)
+        for suggestion in find_conversation_suggestions(query, user, limit)
+    ]
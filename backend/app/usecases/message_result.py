@@ -0,0 +1,201 @@
+import hashlib
+import hmac
+import logging
+import os
+import time
+from urllib.parse import urlparse
+
+import boto3
+import requests
+from app.repositories.idempotency import (
+    delete_idempotency_record,
+    store_idempotency_record,
+)
+from app.repositories.message_result import (
+    complete_message_result,
+    find_message_result,
+    lock_message_result,
+    store_pending_message_result,
+    unlock_message_result,
+)
+from app.repositories.models.message_result import MessageResultModel
+from app.routes.schemas.conversation import MessageOutput
+from app.routes.schemas.published_api import (
+    MessageRequestedResponse,
+    MessageResultOutput,
+)
+from app.utils import TTLCache, is_private_host
+from reretry import retry
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CALLBACK_TIMEOUT_SECONDS = 10
+# Secret of the published API to sign callbacks. Callbacks are not signed if empty.
+CALLBACK_SIGNING_SECRET_ARN = os.environ.get("CALLBACK_SIGNING_SECRET_ARN", "")
+CALLBACK_SIGNING_SECRET_CACHE_TTL_SECONDS = 3600
+
+# Key: secret ARN
+callback_signing_secret_cache: TTLCache[str, str] = TTLCache(
+    maxsize=1, ttl_seconds=CALLBACK_SIGNING_SECRET_CACHE_TTL_SECONDS
+)
+
+
+class CallbackError(Exception):
+    pass
+
+
+def to_message_result_output(result: MessageResultModel) -> MessageResultOutput:
+    return MessageResultOutput(
+        conversation_id=result.conversation_id,
+        message_id=result.message_id,
+        status=result.status,
+        message=(
+            MessageOutput.model_validate_json(result.output)
+            if result.output is not None
+            else None
+        ),
+        error=result.error,
+        create_time=result.create_time,
+        complete_time=result.complete_time,
+    )
+
+
+def reserve_request(
+    user_id: str, idempotency_key: str, conversation_id: str, message_id: str
+) -> MessageRequestedResponse | None:
+    """Reserve the idempotency key for the message.
+    If the key is already reserved by a previous request, the response of that request is returned.
+    """
+    previous = store_idempotency_record(
+        user_id,
+        idempotency_key,
+        {"conversation_id": conversation_id, "message_id": message_id},
+    )
+    if previous is None:
+        return None
+    return MessageRequestedResponse(**previous)
+
+
+def release_request(user_id: str, idempotency_key: str):
+    delete_idempotency_record(user_id, idempotency_key)
+
+
+def accept_message(
+    user_id: str,
+    conversation_id: str,
+    message_id: str,
+    callback_url: str | None = None,
+):
+    """Record that a message is accepted for asynchronous generation, so that clients can poll the result."""
+    store_pending_message_result(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        callback_url=callback_url,
+    )
+
+
+def fetch_message_result(user_id: str, message_id: str) -> MessageResultOutput:
+    return to_message_result_output(find_message_result(user_id, message_id))
+
+
+def start_message(user_id: str, conversation_id: str, message_id: str) -> bool:
+    """Start generation of the message. Returns False if it is a duplicate of a message already answered or being answered."""
+    return lock_message_result(user_id, conversation_id, message_id)
+
+
+def abort_message(user_id: str, message_id: str):
+    """Allow the message to be processed again after a failure."""
+    unlock_message_result(user_id, message_id)
+
+
+def complete_message(
+    user_id: str,
+    conversation_id: str,
+    message_id: str,
+    output: MessageOutput | None = None,
+    error: str | None = None,
+) -> MessageResultOutput:
+    """Store the result of the generation and deliver it to the callback URL if requested.
+    Failure of the callback does not fail the generation, because the result can be polled.
+    """
+    result = complete_message_result(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        message_id=message_id,
+        status="FAILED" if error is not None else "SUCCEEDED",
+        output=output.model_dump_json(by_alias=True) if output is not None else None,
+        error=error,
+    )
+    result_output = to_message_result_output(result)
+
+    if result.callback_url and is_private_host(
+        urlparse(result.callback_url).hostname or "", resolve=True
+    ):
+        logger.warning(
+            f"Result of {message_id} is not delivered to a private address {result.callback_url}"
+        )
+    elif result.callback_url:
+        try:
+            _post_callback(
+                result.callback_url, result_output.model_dump_json(by_alias=True)
+            )
+        except CallbackError as e:
+            logger.warning(f"Failed to deliver the result of {message_id}: {e}")
+
+    return result_output
+
+
+def _get_callback_signing_secret() -> str | None:
+    if not CALLBACK_SIGNING_SECRET_ARN:
+        return None
+
+    secret = callback_signing_secret_cache.get(CALLBACK_SIGNING_SECRET_ARN)
+    if secret is None:
+        response = boto3.client("secretsmanager").get_secret_value(
+            SecretId=CALLBACK_SIGNING_SECRET_ARN
+        )
+        secret = response["SecretString"]
+        callback_signing_secret_cache.set(CALLBACK_SIGNING_SECRET_ARN, secret)
+    return secret
+
+
+def _compose_callback_headers(body: bytes) -> dict[str, str]:
+    """Headers of the callback request, signed with the secret of the published API
+    so that receivers can verify the sender and reject replayed requests by the timestamp.
+    """
+    headers = {"Content-Type": "application/json"}
+    secret = _get_callback_signing_secret()
+    if secret is not None:
+        timestamp = str(int(time.time()))
+        signature = hmac.new(
+            secret.encode("utf-8"),
+            timestamp.encode("utf-8") + b"." + body,
+            hashlib.sha256,
+        ).hexdigest()
+        headers["X-Signature-Timestamp"] = timestamp
+        headers["X-Signature"] = f"sha256={signature}"
+    return headers
+
+
+@retry(CallbackError, tries=3, delay=1, backoff=2)
+def _post_callback(url: str, body: str):
+    data = body.encode("utf-8")
+    try:
+        response = requests.post(
+            url,
+            data=data,
+            headers=_compose_callback_headers(data),
+            timeout=CALLBACK_TIMEOUT_SECONDS,
+            # Redirects may lead to private addresses
+            allow_redirects=False,
+        )
+    except requests.RequestException as e:
+        raise CallbackError(str(e))
+
+    # Retry only if the receiver may accept later
+    if response.status_code == 429 or response.status_code >= 500:
+        raise CallbackError(f"Callback responded {response.status_code}")
+    if not response.ok:
+        logger.warning(f"Callback rejected with status {response.status_code}")
@@ -3,17 +3,29 @@ from app.repositories.user import (
     find_user_by_id,
     find_users_by_email_prefix,
 )
+from app.repositories.user_index import groups_by_name_index, users_by_email_index
 from app.user import UserGroup, UserWithoutGroups
 
+# Maximum number of groups returned by a search
+GROUP_SEARCH_LIMIT = 100
+
 
 def search_user_by_email_prefix(
     prefix: str, limit: int = 10
 ) -> list[UserWithoutGroups]:
-    return find_users_by_email_prefix(prefix=prefix, limit=limit)
+    # Search the in-process index first, because Cognito is slow and rate limited.
+    # Users created since the last snapshot are not indexed, so a miss is searched in Cognito.
+    users = users_by_email_index.find(prefix, limit)
+    if not users:
+        return find_users_by_email_prefix(prefix=prefix, limit=limit)
+    return users
 
 
 def search_group_by_name_prefix(prefix: str) -> list[UserGroup]:
-    return find_group_by_name_prefix(prefix=prefix)
+    groups = groups_by_name_index.find(prefix, GROUP_SEARCH_LIMIT)
+    if not groups:
+        return find_group_by_name_prefix(prefix=prefix)[:GROUP_SEARCH_LIMIT]
+    return groups
 
 
 def get_user_by_id(id: str) -> UserWithoutGroups | None:
@@ -0,0 +1,23 @@
+import json
+import logging
+from typing import Any
+
+from app.repositories.user_index import build_snapshots
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def handler(event: dict, context: Any) -> dict:
+    """User index snapshot handler.
+    This function is triggered by EventBridge schedule.
+    Users and groups are listed from Cognito once and stored to S3, so that API environments load the snapshots
+    instead of listing the user pool each.
+    """
+    logger.info(f"Received event: {event}")
+
+    build_snapshots()
+
+    result = {"built": ["users", "groups"]}
+    logger.info(f"Build completed: {result}")
+    return {"statusCode": 200, "body": json.dumps(result)}
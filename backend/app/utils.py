@@ -1,8 +1,12 @@
+import ipaddress
 import json
 import logging
 import os
+import socket
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Literal
+from typing import Any, Callable, Generic, Hashable, Literal, TypeVar
 
 import boto3
 from app.repositories.models.custom_bot_guardrails import BedrockGuardrailsModel
@@ -61,6 +65,96 @@ def get_current_time():
     return int(datetime.now().timestamp() * 1000)
 
 
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "BedrockAIAssistant")
+
+
+def emit_metric(
+    name: str, value: float, unit: str = "Count", **dimensions: str
+) -> None:
+    """Emit a CloudWatch metric in Embedded Metric Format.
+    Metrics are extracted from the log asynchronously, so this never blocks on CloudWatch API.
+    Ref: https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+    """
+    # NOTE: Print directly because the log format of the Lambda logger breaks EMF
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": get_current_time(),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [list(dimensions.keys())],
+                            "Metrics": [{"Name": name, "Unit": unit}],
+                        }
+                    ],
+                },
+                name: value,
+                **dimensions,
+            }
+        )
+    )
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Thread-safe in-memory LRU cache whose entries expire after `ttl_seconds`.
+    The cache lives as long as the Lambda execution environment.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # Value: (cached time in milliseconds epoch, value)
+        self._items: OrderedDict[K, tuple[int, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K, not_before: int | None = None) -> V | None:
+        """Get cached value. Entries cached before `not_before` (milliseconds epoch) are treated as expired."""
+        now = get_current_time()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                cached_time, value = entry
+                if cached_time + self.ttl_seconds * 1000 > now and (
+                    not_before is None or cached_time >= not_before
+                ):
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._items[key]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: K, value: V) -> None:
+        with self._lock:
+            self._items[key] = (get_current_time(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[K], bool] | None = None) -> None:
+        """Remove entries whose key matches `predicate`. Remove all entries if omitted."""
+        with self._lock:
+            if predicate is None:
+                self._items.clear()
+                return
+
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
+
+
 def generate_presigned_url(
     bucket: str,
     key: str,
@@ -169,6 +263,32 @@ def move_file_in_s3(bucket: str, key: str, new_key: str):
     return response
 
 
+def is_private_host(host: str, resolve: bool = False) -> bool:
+    """Whether the host is a loopback, private, link-local or other address not reachable on the internet.
+    Host names other than `localhost` are checked only if `resolve` is True, in which case
+    all resolved addresses must be public. Names which cannot be resolved are treated as private.
+    """
+    if host == "localhost" or host.endswith(".localhost"):
+        return True
+
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        if not resolve:
+            return False
+        try:
+            infos = socket.getaddrinfo(host, None)
+        except socket.gaierror:
+            return True
+        addresses = [
+            # Remove the scope id of IPv6 addresses
+            ipaddress.ip_address(str(info[4][0]).split("%", 1)[0])
+            for info in infos
+        ]
+
+    return not all(address.is_global for address in addresses)
+
+
 def start_codebuild_project(environment_variables: dict) -> str:
     environment_variables_override = [
         {"name": key, "value": value} for key, value in environment_variables.items()
@@ -1,4 +1,6 @@
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Any
 from urllib.parse import urlparse
 
@@ -7,7 +9,7 @@ from app.repositories.models.conversation import (
     TextToolResultModel,
 )
 from app.repositories.models.custom_bot import BotModel
-from app.utils import get_bedrock_agent_runtime_client
+from app.utils import TTLCache, get_bedrock_agent_runtime_client
 from botocore.exceptions import ClientError
 from mypy_boto3_bedrock_agent_runtime.type_defs import (
     KnowledgeBaseRetrievalResultTypeDef,
@@ -18,6 +20,19 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 agent_client = get_bedrock_agent_runtime_client()
 
+RETRIEVAL_CACHE_MAX_SIZE = int(os.environ.get("RETRIEVAL_CACHE_MAX_SIZE", "256"))
+RETRIEVAL_CACHE_TTL_SECONDS = int(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+
+# Constant of reciprocal rank fusion. Ref: https://plg.uwaterloo.ca/~gvcormac/cormacksigir09-rrf.pdf
+RRF_K = 60
+# Max number of concurrent retrievals across knowledge bases and queries
+MAX_CONCURRENT_RETRIEVALS = int(os.environ.get("MAX_CONCURRENT_RETRIEVALS", "8"))
+
+# Key: (knowledge_base_id, normalized query, search type, max results)
+retrieval_cache: TTLCache[
+    tuple[str, str, str, int], list[KnowledgeBaseRetrievalResultTypeDef]
+] = TTLCache(maxsize=RETRIEVAL_CACHE_MAX_SIZE, ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS)
+
 
 class SearchResult(TypedDict):
     bot_id: str
@@ -60,12 +75,56 @@ def to_guardrails_grounding_source(
     )
 
 
-def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResult]:
+def normalize_query(query: str) -> str:
+    """Normalize query to share cache entries between trivially different queries."""
+    return " ".join(query.split()).casefold()
+
+
+def invalidate_retrieval_cache(knowledge_base_id: str | None = None) -> None:
+    """Invalidate cached retrieval results of the knowledge base. Invalidate all if omitted."""
+    retrieval_cache.invalidate(
+        None if knowledge_base_id is None else lambda key: key[0] == knowledge_base_id
+    )
+
+
+def get_retrieval_cache_stats() -> dict[str, int]:
+    """Get hit/miss counters of the retrieval cache."""
+    return retrieval_cache.stats()
+
+
+def _retrieve(
+    knowledge_base_id: str,
+    query: str,
+    search_type: str,
+    limit: int,
+    not_before: int | None,
+) -> list[KnowledgeBaseRetrievalResultTypeDef]:
+    cache_key = (knowledge_base_id, normalize_query(query), search_type, limit)
+    # NOTE: Results cached before the last sync of the knowledge base are stale
+    cached = retrieval_cache.get(cache_key, not_before=not_before)
+    if cached is not None:
+        logger.info(f"Retrieval cache hit: {retrieval_cache.stats()}")
+        return cached
+
+    response = agent_client.retrieve(
+        knowledgeBaseId=knowledge_base_id,
+        retrievalQuery={"text": query},
+        retrievalConfiguration={
+            "vectorSearchConfiguration": {
+                "numberOfResults": limit,
+                "overrideSearchType": search_type,
+            }
+        },
+    )
+    retrieval_results = response.get("retrievalResults", [])
+    retrieval_cache.set(cache_key, retrieval_results)
+    return retrieval_results
+
+
+def _bedrock_knowledge_base_search(
+    bot: BotModel, knowledge_base_id: str, query: str
+) -> list[SearchResult]:
     assert bot.bedrock_knowledge_base is not None
-    assert (
-        bot.bedrock_knowledge_base.knowledge_base_id is not None
-        or bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
-    ), "Either knowledge_base_id or exist_knowledge_base_id must be set"
 
     if bot.bedrock_knowledge_base.search_params.search_type == "semantic":
         search_type = "SEMANTIC"
@@ -75,23 +134,20 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
         raise ValueError("Invalid search type")
 
     limit = bot.bedrock_knowledge_base.search_params.max_results
-    # Use exist_knowledge_base_id if available, otherwise use knowledge_base_id
-    knowledge_base_id = (
-        bot.bedrock_knowledge_base.exist_knowledge_base_id
-        if bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
-        else bot.bedrock_knowledge_base.knowledge_base_id
-    )
 
     try:
-        response = agent_client.retrieve(
-            knowledgeBaseId=knowledge_base_id,
-            retrievalQuery={"text": query},
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {
-                    "numberOfResults": limit,
-                    "overrideSearchType": search_type,
-                }
-            },
+        retrieval_results = _retrieve(
+            knowledge_base_id,
+            query,
+            search_type,
+            limit,
+            # NOTE: Shared knowledge bases are not synced by this bot. They rely on the TTL.
+            not_before=(
+                bot.sync_completed_time
+                if knowledge_base_id
+                not in bot.bedrock_knowledge_base.shared_knowledge_base_ids
+                else None
+            ),
         )
 
         def extract_source_from_retrieval_result(
@@ -129,13 +185,14 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
             return None
 
         search_results = []
-        for i, retrieval_result in enumerate(response.get("retrievalResults", [])):
+        for i, retrieval_result in enumerate(retrieval_results):
             content = retrieval_result.get("content", {}).get("text", "")
             source = extract_source_from_retrieval_result(retrieval_result)
 
             if source is not None:
                 # get page number from metadata
-                metadata = retrieval_result.get("metadata", {})
+                # NOTE: Values are typed as documents by boto3 stubs, but are JSON scalars, e.g. page numbers
+                metadata: dict[str, Any] = retrieval_result.get("metadata", {})
                 page_number = None
                 if "x-amz-bedrock-kb-document-page-number" in metadata:
                     try:
@@ -164,5 +221,59 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
         raise e
 
 
-def search_related_docs(bot: BotModel, query: str) -> list[SearchResult]:
-    return _bedrock_knowledge_base_search(bot, query)
+def fuse_search_results(
+    results_list: list[list[SearchResult]], limit: int
+) -> list[SearchResult]:
+    """Merge ranked search results with reciprocal rank fusion.
+    Results are deduplicated by source, and the scores of all chunks of the same source are summed.
+    The best ranked chunk of each source is kept. Ranks of the fused results are renumbered from 0.
+    """
+    scores: dict[str, float] = {}
+    # Value: (rank in its search, result)
+    fused: dict[str, tuple[int, SearchResult]] = {}
+    for search_results in results_list:
+        for i, result in enumerate(search_results):
+            key = result["source_link"]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + i + 1)
+            if key not in fused or i < fused[key][0]:
+                fused[key] = (i, result)
+
+    ranked_keys = sorted(scores, key=lambda key: scores[key], reverse=True)[:limit]
+    return [
+        SearchResult(**{**fused[key][1], "rank": i})
+        for i, key in enumerate(ranked_keys)
+    ]
+
+
+def search_related_docs(
+    bot: BotModel, query: str, reformulated_queries: list[str] | None = None
+) -> list[SearchResult]:
+    """Search all knowledge bases attached to the bot.
+    When multiple knowledge bases or queries are given, retrievals are issued concurrently
+    and the results are merged with reciprocal rank fusion.
+    """
+    assert bot.bedrock_knowledge_base is not None
+    knowledge_base_ids = bot.bedrock_knowledge_base.get_knowledge_base_ids()
+    assert len(knowledge_base_ids) > 0, "No knowledge base is attached to the bot"
+
+    queries = [query] + [q for q in reformulated_queries or [] if q and q != query]
+    searches = [
+        (knowledge_base_id, q)
+        for knowledge_base_id in knowledge_base_ids
+        for q in queries
+    ]
+    if len(searches) == 1:
+        return _bedrock_knowledge_base_search(bot, knowledge_base_ids[0], query)
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(searches), MAX_CONCURRENT_RETRIEVALS)
+    ) as executor:
+        results_list = list(
+            executor.map(
+                lambda search: _bedrock_knowledge_base_search(bot, *search), searches
+            )
+        )
+
+    return fuse_search_results(
+        results_list, limit=bot.bedrock_knowledge_base.search_params.max_results
+    )
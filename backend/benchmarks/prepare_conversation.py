@@ -0,0 +1,139 @@
+"""Benchmark pre-stream latency of `prepare_conversation`.
+
+DynamoDB reads are replaced with local stand-ins which sleep for a simulated round trip,
+so this can run without AWS credentials.
+"Sequential" runs the same code with an inline executor, which reproduces the previous behavior.
+
+Usage (from backend directory):
+    python -m benchmarks.prepare_conversation --latency-ms 15 --iterations 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import Executor, Future
+from typing import Any
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.repositories.models.conversation import (
+    ConversationModel,
+    MessageModel,
+    TextContentModel,
+)
+from app.routes.schemas.conversation import ChatInput, MessageInput, TextContent
+from app.usecases.chat import prepare_conversation
+from tests.test_repositories.utils.bot_factory import create_test_private_bot
+from tests.test_usecases.utils.user_factory import create_test_user
+
+
+class InlineExecutor(Executor):
+    """Executor which runs submitted functions immediately in the caller thread."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def _conversation() -> ConversationModel:
+    def message(role: str, parent: str | None, children: list[str]) -> MessageModel:
+        return MessageModel(
+            role=role,
+            content=[TextContentModel(content_type="text", body=role)],
+            model="claude-v3.5-sonnet",
+            children=children,
+            parent=parent,
+            create_time=0,
+            feedback=None,
+            used_chunks=None,
+            thinking_log=None,
+        )
+
+    return ConversationModel(
+        id="conversation",
+        create_time=0,
+        title="Benchmark",
+        total_price=0,
+        message_map={
+            "system": message("system", None, ["instruction"]),
+            "instruction": message("instruction", "system", ["user"]),
+            "user": message("user", "instruction", []),
+        },
+        last_message_id="user",
+        bot_id="bot",
+        should_continue=False,
+    )
+
+
+def run(latency_ms: float, iterations: int, sequential: bool) -> list[float]:
+    user = create_test_user("user")
+    bot = create_test_private_bot("bot", False, "user")
+    conversation = _conversation()
+    chat_input = ChatInput(
+        conversation_id="conversation",
+        message=MessageInput(
+            role="user",
+            content=[TextContent(content_type="text", body="Hello")],
+            model="claude-v3.5-sonnet",
+            parent_message_id=None,
+            message_id=None,
+        ),
+        bot_id="bot",
+        continue_generate=False,
+        enable_reasoning=False,
+    )
+
+    def find_conversation_by_id(user_id, conversation_id):
+        time.sleep(latency_ms / 1000)
+        return conversation.model_copy(deep=True)
+
+    def find_bot_by_id(bot_id):
+        time.sleep(latency_ms / 1000)
+        return bot
+
+    patches: list[Any] = [
+        patch(
+            "app.usecases.chat.find_conversation_by_id",
+            side_effect=find_conversation_by_id,
+        ),
+        patch("app.usecases.bot.find_bot_by_id", side_effect=find_bot_by_id),
+    ]
+    if sequential:
+        patches.append(patch("app.usecases.chat.executor", InlineExecutor()))
+
+    for p in patches:
+        p.start()
+    try:
+        elapsed = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            prepare_conversation(user, chat_input)
+            elapsed.append((time.perf_counter() - start) * 1000)
+        return elapsed
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=15)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"Simulated DynamoDB latency: {args.latency_ms} ms")
+    for label, sequential in (("sequential", True), ("concurrent", False)):
+        elapsed = run(args.latency_ms, args.iterations, sequential)
+        print(
+            f"{label:>10}: p50={statistics.median(elapsed):.1f} ms "
+            f"p95={statistics.quantiles(elapsed, n=20)[-1]:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
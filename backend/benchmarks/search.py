@@ -0,0 +1,165 @@
+"""Benchmark search latency of the local full-text index against the OpenSearch path.
+
+Synthetic conversations and bots are indexed to a temporary local index, then the same queries are run
+through the repository functions with `SEARCH_BACKEND=local`.
+With `--opensearch`, the queries are also run against the collection of `OPENSEARCH_DOMAIN_ENDPOINT`
+as the given user, which requires AWS credentials. The OpenSearch result cache is bypassed.
+
+Usage (from backend directory):
+    python -m benchmarks.search --conversations 5000 --bots 1000 --iterations 100
+    python -m benchmarks.search --opensearch --user-id <cognito user id>
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.repositories import local_search
+from app.repositories.bot_store import find_bots_by_query
+from app.repositories.common import search_result_cache
+from app.repositories.conversation_search import (
+    find_conversation_suggestions,
+    find_conversations_by_query,
+)
+from app.repositories.custom_bot import store_bot
+from app.repositories.models.conversation import (
+    ConversationModel,
+    MessageModel,
+    TextContentModel,
+)
+from app.user import User
+from tests.test_repositories.utils.bot_factory import create_test_public_bot
+
+WORDS = (
+    "python lambda dynamodb search index query latency bedrock model prompt "
+    "translate summary meeting travel kyoto recipe budget report contract email "
+    "schedule invoice design review deploy network security backup storage"
+).split()
+QUERIES = ["python", "lambda latency", "translate email", "kyoto travel budget"]
+
+
+def _sentence(length: int) -> str:
+    return " ".join(random.choices(WORDS, k=length))
+
+
+def _message(role: str, body: str, create_time: float) -> MessageModel:
+    return MessageModel(
+        role=role,
+        content=[TextContentModel(content_type="text", body=body)],
+        model="claude-v3.5-sonnet",
+        children=[],
+        parent=None,
+        create_time=create_time,
+        feedback=None,
+        used_chunks=None,
+        thinking_log=None,
+    )
+
+
+def _conversation(index: int, turns: int) -> ConversationModel:
+    message_map = {"system": _message("system", "", 0)}
+    for turn in range(turns):
+        message_map[f"user{turn}"] = _message("user", _sentence(20), turn * 2 + 1)
+        message_map[f"assistant{turn}"] = _message(
+            "assistant", _sentence(80), turn * 2 + 2
+        )
+    return ConversationModel(
+        id=f"conversation{index}",
+        create_time=0,
+        title=_sentence(4),
+        total_price=0,
+        message_map=message_map,
+        last_message_id=f"assistant{turns - 1}",
+        bot_id=None,
+        should_continue=False,
+    )
+
+
+def _measure(fn: Callable[[], object], iterations: int) -> list[float]:
+    elapsed = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return elapsed
+
+
+def _report(label: str, elapsed: list[float]):
+    print(
+        f"{label:>40}: p50={statistics.median(elapsed):.2f} ms "
+        f"p95={statistics.quantiles(elapsed, n=20)[-1]:.2f} ms"
+    )
+
+
+def run_queries(user: User, iterations: int):
+    for query in QUERIES:
+        for label, fn in (
+            ("search", lambda: find_conversations_by_query(query, user)),
+            ("suggest", lambda: find_conversation_suggestions(query[:3], user)),
+            ("bot search", lambda: find_bots_by_query(query, user)),
+        ):
+
+            def uncached():
+                search_result_cache.invalidate()
+                fn()
+
+            _report(f"{label} '{query}'", _measure(uncached, iterations))
+
+
+def run_local(conversations: int, bots: int, turns: int, iterations: int):
+    user = User(id="user", name="user", groups=[], email="user@example.com")
+    with tempfile.TemporaryDirectory() as directory, patch.object(
+        local_search, "SEARCH_BACKEND", "local"
+    ), patch("app.repositories.custom_bot.get_bot_table_client"):
+        local_search.reset_local_search_index(os.path.join(directory, "index.sqlite3"))
+
+        start = time.perf_counter()
+        for i in range(conversations):
+            conversation = _conversation(i, turns)
+            local_search.index_conversation(user.id, conversation, conversation.title)
+        for i in range(bots):
+            store_bot(
+                create_test_public_bot(f"bot{i}", False, "owner").model_copy(
+                    update={"title": _sentence(3), "description": _sentence(15)}
+                )
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"Indexed {conversations} conversations and {bots} bots in {elapsed:.1f} s "
+            f"({elapsed * 1000 / max(conversations + bots, 1):.2f} ms per document)"
+        )
+
+        run_queries(user, iterations)
+        local_search.reset_local_search_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--bots", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--opensearch", action="store_true")
+    parser.add_argument("--user-id", default="user")
+    args = parser.parse_args()
+
+    random.seed(0)
+    print("Local index (SQLite FTS5)")
+    run_local(args.conversations, args.bots, args.turns, args.iterations)
+
+    if args.opensearch:
+        print(f"OpenSearch ({os.environ.get('OPENSEARCH_DOMAIN_ENDPOINT')})")
+        user = User(id=args.user_id, name="user", groups=[], email="")
+        with patch.object(local_search, "SEARCH_BACKEND", "opensearch"):
+            run_queries(user, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from typing import Literal
 import boto3
 from app.repositories.common import compose_sk, decompose_sk, get_bot_table_client
 from app.routes.schemas.bot import type_sync_status
+from app.utils import get_current_time
 from reretry import retry
 
 logger = logging.getLogger()
@@ -26,14 +27,21 @@ def update_sync_status(
     last_exec_id: str,
 ):
     table = get_bot_table_client()
+    update_expression = "SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id"
+    expression_attribute_values = {
+        ":sync_status": sync_status,
+        ":sync_status_reason": sync_status_reason,
+        ":last_exec_id": last_exec_id,
+    }
+    if sync_status == "SUCCEEDED":
+        # Retrieval results cached before this time are invalidated
+        update_expression += ", SyncCompletedTime = :sync_completed_time"
+        expression_attribute_values[":sync_completed_time"] = get_current_time()
+
     table.update_item(
         Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-        UpdateExpression="SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id",
-        ExpressionAttributeValues={
-            ":sync_status": sync_status,
-            ":sync_status_reason": sync_status_reason,
-            ":last_exec_id": last_exec_id,
-        },
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=expression_attribute_values,
     )
 
 
@@ -0,0 +1,57 @@
+import sys
+import unittest
+
+sys.path.append(".")
+from app.prompt import build_rag_prompt, estimate_tokens, pack_search_results
+from app.vector_search import SearchResult
+
+
+def _result(content: str, rank: int) -> SearchResult:
+    return SearchResult(
+        bot_id="bot1",
+        content=content,
+        source_name="source.pdf",
+        source_link="s3://bucket/source.pdf",
+        rank=rank,
+        metadata={},
+        page_number=None,
+    )
+
+
+class TestPackSearchResults(unittest.TestCase):
+    def test_remove_near_duplicates(self):
+        results = [
+            _result("Ramen is a Japanese noodle soup with broth and toppings.", 0),
+            _result("Ramen is a Japanese noodle soup with broth and toppings!", 1),
+            _result("Sushi is vinegared rice with raw fish.", 2),
+        ]
+        packed = pack_search_results(results, token_budget=1000)
+        # Rank is kept as citation source id
+        self.assertEqual([r["rank"] for r in packed], [0, 2])
+
+    def test_token_budget(self):
+        results = [
+            _result("Ramen " * 100, 0),
+            _result("Sushi " * 100, 1),
+            _result("Udon is a thick wheat noodle.", 2),
+        ]
+        budget = estimate_tokens(results[0]["content"]) + 20
+        packed = pack_search_results(results, token_budget=budget)
+        # Second result does not fit, but the smaller third one does
+        self.assertEqual([r["rank"] for r in packed], [0, 2])
+
+    def test_keep_first_result_over_budget(self):
+        packed = pack_search_results([_result("Ramen " * 100, 5)], token_budget=1)
+        self.assertEqual([r["rank"] for r in packed], [5])
+
+    def test_build_rag_prompt(self):
+        prompt = build_rag_prompt(
+            [_result("Ramen is a noodle.", 3), _result("Sushi is rice.", 7)],
+            model="mistral-7b-instruct",
+        )
+        self.assertIn("<source>\n3\n</source>", prompt)
+        self.assertIn("<source>\n7\n</source>", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
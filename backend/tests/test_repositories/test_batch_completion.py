@@ -0,0 +1,99 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.repositories.batch import add_batch_completion
+from app.repositories.common import RecordNotFoundError
+from botocore.exceptions import ClientError
+
+
+def _cancel(*codes: str) -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException"},
+            "CancellationReasons": [{"Code": code} for code in codes],
+        },
+        "TransactWriteItems",
+    )
+
+
+class TestAddBatchCompletion(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.table.table_name = "conversation"
+        # Status counted on the result of each message
+        self.counted: dict[str, str] = {}
+        self.batch = {
+            "BatchId": "batch1",
+            "Total": 3,
+            "CreateTime": 1,
+            "SucceededCount": 0,
+            "FailedCount": 0,
+        }
+
+        def transact_write_items(TransactItems):
+            result, batch = (item["Update"] for item in TransactItems)
+            values = result["ExpressionAttributeValues"]
+            counted = self.counted.get(result["Key"]["SK"])
+            if counted != values.get(":counted_status"):
+                raise _cancel("ConditionalCheckFailed", "None")
+
+            self.counted[result["Key"]["SK"]] = values[":status"]
+            for update in batch["UpdateExpression"].removeprefix("ADD ").split(", "):
+                attribute, placeholder = update.split(" ")
+                self.batch[attribute] += batch["ExpressionAttributeValues"][placeholder]
+
+        self.table.meta.client.transact_write_items.side_effect = transact_write_items
+        self.table.get_item.side_effect = lambda **kwargs: {"Item": dict(self.batch)}
+        self.patch = patch(
+            "app.repositories.batch.get_conversation_table_client",
+            return_value=self.table,
+        )
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_count_once(self):
+        add_batch_completion("user1", "batch1", "message0", succeeded=True)
+        batch = add_batch_completion("user1", "batch1", "message0", succeeded=True)
+
+        self.assertEqual((batch.succeeded, batch.failed), (1, 0))
+        self.assertEqual(list(self.counted.keys()), ["user1#RESULT#message0"])
+
+    def test_move_retried_item_to_succeeded(self):
+        add_batch_completion("user1", "batch1", "message0", succeeded=False)
+        add_batch_completion("user1", "batch1", "message1", succeeded=True)
+        batch = add_batch_completion("user1", "batch1", "message0", succeeded=True)
+        self.assertEqual((batch.succeeded, batch.failed), (2, 0))
+
+        # A late failure does not undo the success
+        batch = add_batch_completion("user1", "batch1", "message0", succeeded=False)
+        self.assertEqual((batch.succeeded, batch.failed), (2, 0))
+
+        batch = add_batch_completion("user1", "batch1", "message2", succeeded=False)
+        self.assertTrue(batch.is_completed())
+
+    @patch("time.sleep")
+    def test_retry_on_conflict(self, _):
+        client = self.table.meta.client
+        client.transact_write_items.side_effect = [
+            _cancel("None", "TransactionConflict"),
+            None,
+        ]
+
+        add_batch_completion("user1", "batch1", "message0", succeeded=False)
+        self.assertEqual(client.transact_write_items.call_count, 2)
+
+    def test_batch_not_found(self):
+        self.table.meta.client.transact_write_items.side_effect = _cancel(
+            "None", "ConditionalCheckFailed"
+        )
+        with self.assertRaises(RecordNotFoundError):
+            add_batch_completion("user1", "batch1", "message0", succeeded=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
+import json
 import sys
 import unittest
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, ".")
 
@@ -13,6 +15,11 @@ from app.repositories.bot_store import (
     find_random_bots,
     get_opensearch_client,
 )
+from app.repositories.common import (
+    compose_access_principals,
+    compose_user_access_principals,
+    search_result_cache,
+)
 from app.repositories.models.custom_bot import BotMeta
 from app.user import User
 from opensearchpy import NotFoundError, OpenSearch
@@ -120,6 +127,12 @@ class TestFindBotsWithOpenSearch(unittest.TestCase):
                 "SK": f"BOT#{bot.id}",
                 "AllowedCognitoUsers": bot.allowed_cognito_users,
                 "AllowedCognitoGroups": bot.allowed_cognito_groups,
+                "AccessPrincipals": compose_access_principals(
+                    bot.owner_user_id,
+                    bot.shared_scope,
+                    bot.allowed_cognito_users,
+                    bot.allowed_cognito_groups,
+                ),
                 "SyncStatus": bot.sync_status,
                 "BedrockKnowledgeBase": bot.bedrock_knowledge_base,
                 "UsageStats": bot.usage_stats.model_dump(),
@@ -254,5 +267,102 @@ class TestFindBotsWithOpenSearch(unittest.TestCase):
         self.assertEqual(len(result), 5)
 
 
+class TestAccessPrincipals(unittest.TestCase):
+    def test_compose_access_principals(self):
+        self.assertEqual(
+            compose_access_principals("owner", "private", [], []), ["user#owner"]
+        )
+        self.assertEqual(
+            compose_access_principals("owner", "all", [], []),
+            ["user#owner", "public"],
+        )
+        self.assertEqual(
+            compose_access_principals("owner", "partial", ["user1"], ["group1"]),
+            ["user#owner", "user#user1", "group#group1"],
+        )
+
+    def test_filter_by_terms(self):
+        user = User(
+            id="user1", name="user1", groups=["group1"], email="user1@example.com"
+        )
+        client = MagicMock()
+        client.search.return_value = {"hits": {"hits": []}}
+
+        for find in [find_bots_sorted_by_usage_count, find_random_bots]:
+            find(user, client=client)
+            body = client.search.call_args.kwargs["body"]
+            self.assertNotIn('"script"', json.dumps(body))
+            self.assertIn(
+                {
+                    "terms": {
+                        "AccessPrincipals.keyword": compose_user_access_principals(
+                            user.id, user.groups
+                        )
+                    }
+                },
+                (
+                    body["query"]["bool"]["filter"]
+                    if "bool" in body["query"]
+                    else body["query"]["function_score"]["query"]["bool"]["filter"]
+                ),
+            )
+
+        find_bots_by_query("query", user, client=client)
+        self.assertNotIn('"script"', json.dumps(client.search.call_args.kwargs["body"]))
+
+
+class TestSearchResultCache(unittest.TestCase):
+    def setUp(self):
+        search_result_cache.invalidate()
+        self.user = User(
+            id="user1", name="user1", groups=["group1"], email="user1@example.com"
+        )
+        self.client = MagicMock()
+        self.client.search.return_value = {"hits": {"hits": []}}
+
+    def test_identical_search_is_cached(self):
+        with patch(
+            "app.repositories.bot_store.get_opensearch_client",
+            return_value=self.client,
+        ):
+            find_bots_by_query("query", self.user)
+            find_bots_by_query("query", self.user)
+            self.assertEqual(self.client.search.call_count, 1)
+
+            # Different query, limit and groups are searched separately
+            find_bots_by_query("query2", self.user)
+            find_bots_by_query("query", self.user, limit=10)
+            find_bots_by_query(
+                "query",
+                User(id="user1", name="user1", groups=[], email="user1@example.com"),
+            )
+            self.assertEqual(self.client.search.call_count, 4)
+
+    def test_injected_client_is_not_cached(self):
+        find_bots_by_query("query", self.user, client=self.client)
+        find_bots_by_query("query", self.user, client=self.client)
+        self.assertEqual(self.client.search.call_count, 2)
+
+    def test_latency_metric(self):
+        with patch("app.repositories.common.emit_metric") as emit_metric:
+            find_random_bots(self.user, client=self.client)
+        emit_metric.assert_called_once()
+        self.assertEqual(emit_metric.call_args.args[0], "SearchLatency")
+        self.assertEqual(emit_metric.call_args.kwargs["Query"], "find_random_bots")
+
+
+class TestOpenSearchClientPool(unittest.TestCase):
+    def test_client_is_reused_per_collection(self):
+        with patch(
+            "app.repositories.common.OPENSEARCH_DOMAIN_ENDPOINT",
+            "https://example.aoss.amazonaws.com",
+        ), patch("app.repositories.common._opensearch_clients", {}), patch(
+            "app.repositories.common.boto3.Session"
+        ):
+            bot_client = get_opensearch_client("bot")
+            self.assertIs(get_opensearch_client("bot"), bot_client)
+            self.assertIsNot(get_opensearch_client("conversation"), bot_client)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,158 @@
+import io
+import json
+import sys
+import unittest
+from decimal import Decimal as decimal
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories import bot_store_feed
+from app.repositories.bot_store_feed import (
+    find_feed,
+    remove_bot_from_feeds,
+    store_feed,
+    update_pinned_feed,
+)
+from botocore.exceptions import ClientError
+
+
+def _source(bot_id: str, shared_status: str = "shared") -> dict:
+    return {
+        "PK": "owner",
+        "SK": f"BOT#{bot_id}",
+        "ItemType": "owner#BOT",
+        "BotId": bot_id,
+        "Title": f"Bot {bot_id}",
+        "Description": "",
+        "CreateTime": 1,
+        "SyncStatus": "SUCCEEDED",
+        "SharedScope": "all",
+        "SharedStatus": shared_status,
+    }
+
+
+class TestBotStoreFeed(unittest.TestCase):
+    def setUp(self):
+        bot_store_feed.feed_cache.invalidate()
+        bot_store_feed.missing_feed_cache.invalidate()
+        # Objects stored to the mocked bucket. Key: object key
+        self.objects: dict[str, bytes] = {}
+        self.mock_s3 = MagicMock()
+        self.mock_s3.put_object.side_effect = self._put_object
+        self.mock_s3.get_object.side_effect = self._get_object
+        self.patchers = [
+            patch("app.repositories.bot_store_feed.s3_client", self.mock_s3),
+            patch("app.repositories.bot_store_feed.BOT_STORE_FEED_BUCKET", "bucket"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        bot_store_feed.feed_cache.invalidate()
+        bot_store_feed.missing_feed_cache.invalidate()
+
+    def _etag(self, Key) -> str:
+        return str(hash(self.objects[Key]))
+
+    def _put_object(self, Bucket, Key, Body, ContentType, IfMatch=None):
+        if IfMatch is not None and (
+            Key not in self.objects or self._etag(Key) != IfMatch
+        ):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = Body.encode("utf-8")
+
+    def _get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": self._etag(Key)}
+
+    def test_feed_not_built(self):
+        self.assertIsNone(find_feed("popular"))
+
+    def test_cache_feed_not_built(self):
+        self.assertIsNone(find_feed("popular"))
+        self.assertIsNone(find_feed("popular"))
+        self.assertEqual(self.mock_s3.get_object.call_count, 1)
+
+        # Built feed is found without waiting for the miss to expire
+        store_feed("popular", [_source("1")])
+        self.assertEqual(find_feed("popular"), [_source("1")])
+        bot_store_feed.feed_cache.invalidate()
+        self.assertEqual(find_feed("popular"), [_source("1")])
+
+    def test_store_and_find_feed(self):
+        item = {**_source("1"), "Instruction": "heavy", "CreateTime": decimal(1)}
+        store_feed("popular", [item])
+
+        # Heavy attributes are dropped and numbers are serializable
+        stored = json.loads(self.objects["bot_store_feeds/popular.json"])
+        self.assertNotIn("Instruction", stored["Bots"][0])
+
+        # Read through the cache
+        self.assertEqual(find_feed("popular"), [_source("1")])
+        self.mock_s3.get_object.assert_not_called()
+
+        bot_store_feed.feed_cache.invalidate()
+        self.assertEqual(find_feed("popular"), [_source("1")])
+        self.assertEqual(self.mock_s3.get_object.call_count, 1)
+
+    def test_remove_bot_from_feeds(self):
+        store_feed("popular", [_source("1"), _source("2")])
+        store_feed("pickup", [_source("2")])
+
+        remove_bot_from_feeds("1")
+        self.assertEqual([b["BotId"] for b in find_feed("popular")], ["2"])
+        self.assertEqual([b["BotId"] for b in find_feed("pickup")], ["2"])
+
+    @patch("app.repositories.bot_store_feed.get_bot_table_client")
+    def test_update_pinned_feed(self, mock_get_table):
+        mock_table = MagicMock()
+        mock_get_table.return_value = mock_table
+        store_feed("pinned", [_source("1", "pinned@002")])
+
+        # Pin
+        mock_table.get_item.return_value = {"Item": _source("2", "pinned@001")}
+        update_pinned_feed("owner", "2")
+        self.assertEqual([b["BotId"] for b in find_feed("pinned")], ["2", "1"])
+        self.assertTrue(mock_table.get_item.call_args.kwargs["ConsistentRead"])
+
+        # Unpin
+        mock_table.get_item.return_value = {"Item": _source("1", "shared")}
+        update_pinned_feed("owner", "1")
+        self.assertEqual([b["BotId"] for b in find_feed("pinned")], ["2"])
+
+    def test_retry_update_on_concurrent_refresh(self):
+        store_feed("popular", [_source("1"), _source("2")])
+
+        # The feed is refreshed between read and write of the first attempt
+        get_object = self.mock_s3.get_object.side_effect
+
+        def get_object_then_refresh(Bucket, Key):
+            response = get_object(Bucket, Key)
+            if self.mock_s3.get_object.call_count == 1:
+                store_feed("popular", [_source("1"), _source("2"), _source("3")])
+            return response
+
+        self.mock_s3.get_object.side_effect = get_object_then_refresh
+        remove_bot_from_feeds("1")
+
+        # Removed from the refreshed feed, which is not reverted
+        stored = json.loads(self.objects["bot_store_feeds/popular.json"])
+        self.assertEqual([b["BotId"] for b in stored["Bots"]], ["2", "3"])
+
+
+class TestBotStoreFeedDisabled(unittest.TestCase):
+    @patch("app.repositories.bot_store_feed.s3_client")
+    def test_skip_without_feed_bucket(self, mock_s3):
+        with patch("app.repositories.bot_store_feed.BOT_STORE_FEED_BUCKET", ""):
+            self.assertIsNone(find_feed("popular"))
+            remove_bot_from_feeds("1")
+            update_pinned_feed("owner", "1")
+        mock_s3.get_object.assert_not_called()
+        mock_s3.put_object.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import sys
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories import bot_usage
+from app.repositories.bot_usage import (
+    flush_bot_usage,
+    record_bot_usage,
+    record_last_used_time,
+)
+
+
+class TestBotUsage(unittest.TestCase):
+    def setUp(self):
+        bot_usage._pending.clear()
+        bot_usage._last_written_time.clear()
+        self.patcher = patch("app.repositories.bot_usage.get_bot_table_client")
+        self.mock_table = MagicMock()
+        self.patcher.start().return_value = self.mock_table
+
+    def tearDown(self):
+        if bot_usage._timer is not None:
+            bot_usage._timer.cancel()
+            bot_usage._timer = None
+        self.patcher.stop()
+
+    def test_aggregate_per_bot(self):
+        # First usage is written immediately, with one update per item
+        record_last_used_time("user1", "bot1", "bot")
+        record_bot_usage("user1", "bot1", 1)
+        flush_bot_usage()
+        self.assertEqual(self.mock_table.update_item.call_count, 1)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["Key"], {"PK": "user1", "SK": "BOT#bot1"})
+        self.assertIn("LastUsedTime", kwargs["UpdateExpression"])
+        self.assertEqual(kwargs["ExpressionAttributeValues"][":val"], 1)
+
+        # Following usage within the interval is buffered
+        for _ in range(3):
+            record_bot_usage("user1", "bot1", 1)
+            flush_bot_usage()
+        self.assertEqual(self.mock_table.update_item.call_count, 1)
+
+        # Buffered usage is written at once
+        flush_bot_usage(force=True)
+        self.assertEqual(self.mock_table.update_item.call_count, 2)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["ExpressionAttributeValues"][":val"], 3)
+        self.assertNotIn("LastUsedTime", kwargs["UpdateExpression"])
+
+    def test_keep_failed_usage(self):
+        self.mock_table.update_item.side_effect = [Exception("throttled"), None]
+
+        record_bot_usage("user1", "bot1", 2)
+        with self.assertRaises(Exception):
+            flush_bot_usage()
+        # Retried by the caller
+        flush_bot_usage()
+
+        self.assertEqual(self.mock_table.update_item.call_count, 2)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["ExpressionAttributeValues"][":val"], 2)
+
+    def test_read_updated_item_only_for_local_search(self):
+        record_bot_usage("user1", "bot1", 1)
+        flush_bot_usage(force=True)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["ReturnValues"], "NONE")
+
+        with patch(
+            "app.repositories.bot_usage.local_search.is_local_search_enabled",
+            return_value=True,
+        ), patch(
+            "app.repositories.bot_usage.local_search.index_bot_item"
+        ) as index_bot_item:
+            record_bot_usage("user1", "bot1", 1)
+            flush_bot_usage(force=True)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["ReturnValues"], "ALL_NEW")
+        index_bot_item.assert_called_once()
+
+    def test_flush_in_background_without_further_usage(self):
+        with patch("app.repositories.bot_usage.BOT_USAGE_FLUSH_INTERVAL_SECONDS", 0.1):
+            record_bot_usage("user1", "bot1", 1)
+            flush_bot_usage()
+            record_bot_usage("user1", "bot1", 2)
+            flush_bot_usage()
+            self.assertEqual(self.mock_table.update_item.call_count, 1)
+
+            self.assertIsNotNone(bot_usage._timer)
+
+            # Buffered usage is written after the interval
+            for _ in range(20):
+                if self.mock_table.update_item.call_count == 2:
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(self.mock_table.update_item.call_count, 2)
+        kwargs = self.mock_table.update_item.call_args.kwargs
+        self.assertEqual(kwargs["ExpressionAttributeValues"][":val"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
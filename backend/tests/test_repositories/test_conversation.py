@@ -1,4 +1,5 @@
 import base64
+import gzip
 import json
 import os
 import sys
@@ -10,6 +11,7 @@ from app.repositories.conversation import (
     ConversationModel,
     MessageModel,
     RecordNotFoundError,
+    archive_conversation,
     change_conversation_title,
     delete_conversation_by_id,
     delete_conversation_by_user_id,
@@ -18,6 +20,13 @@ from app.repositories.conversation import (
     store_conversation,
     update_feedback,
 )
+from app.repositories.common import (
+    PUBLISHED_API_PARTITION_SHARD_COUNT,
+    compose_partition_key,
+    compose_partition_keys,
+    decompose_partition_key,
+)
+from botocore.exceptions import ClientError
 from app.repositories.models.conversation import (
     ChunkModel,
     FeedbackModel,
@@ -426,5 +435,276 @@ class TestConversationRepository(unittest.TestCase):
         self.assertEqual(len(conversations), 0)
 
 
+class TestConversationArchive(unittest.TestCase):
+    def setUp(self):
+        self.patcher1 = patch("boto3.resource")
+        self.patcher2 = patch("app.repositories.conversation.s3_client")
+        self.mock_boto3_resource = self.patcher1.start()
+        self.mock_s3_client = self.patcher2.start()
+
+        self.mock_table = MagicMock()
+        self.mock_boto3_resource.return_value.Table.return_value = self.mock_table
+
+        self.message_map = {
+            "system": MessageModel(
+                role="system",
+                content=[TextContentModel(content_type="text", body="")],
+                model="claude-v3-haiku",
+                children=["a"],
+                parent=None,
+                create_time=1627984879.9,
+                feedback=None,
+                used_chunks=None,
+                thinking_log=None,
+            ),
+            "a": MessageModel(
+                role="user",
+                content=[TextContentModel(content_type="text", body="Hello")],
+                model="claude-v3-haiku",
+                children=[],
+                parent="system",
+                create_time=1627984879.9,
+                feedback=None,
+                used_chunks=None,
+                thinking_log=None,
+            ),
+        }
+        self.item = {
+            "PK": "user",
+            "SK": "user#CONV#1",
+            "Title": "Test Conversation",
+            "CreateTime": 1627984879.9,
+            "TotalPrice": 100,
+            "LastMessageId": "a",
+            "LastUpdateTime": 1627984879900,
+            "MessageMap": json.dumps(
+                {k: v.model_dump(by_alias=True) for k, v in self.message_map.items()}
+            ),
+            "IsLargeMessage": False,
+            "ShouldContinue": False,
+        }
+
+    def tearDown(self):
+        self.patcher1.stop()
+        self.patcher2.stop()
+
+    def test_archive_and_rehydrate_conversation(self):
+        self.mock_table.get_item.return_value = {"Item": self.item}
+
+        archived = archive_conversation(user_id="user", conversation_id="1")
+        self.assertTrue(archived)
+
+        # Message map is compressed and stored in S3
+        put_object_kwargs = self.mock_s3_client.put_object.call_args.kwargs
+        self.assertEqual(put_object_kwargs["Key"], "user/1/archive/message_map.json.gz")
+        archived_body = put_object_kwargs["Body"]
+        self.assertEqual(
+            json.loads(gzip.decompress(archived_body))["a"]["content"][0]["body"],
+            "Hello",
+        )
+
+        # Stub keeps only system message and is written conditionally
+        put_item_kwargs = self.mock_table.put_item.call_args.kwargs
+        stub = put_item_kwargs["Item"]
+        self.assertTrue(stub["IsArchived"])
+        self.assertEqual(list(json.loads(stub["MessageMap"]).keys()), ["system"])
+        self.assertEqual(
+            put_item_kwargs["ConditionExpression"], "LastUpdateTime = :last_update_time"
+        )
+
+        # Stub is still listed
+        self.mock_table.query.return_value = {"Items": [stub]}
+        conversations = find_conversation_by_user_id(user_id="user")
+        self.assertEqual(len(conversations), 1)
+        self.assertEqual(conversations[0].model, "claude-v3-haiku")
+
+        # Conversation is rehydrated from S3
+        self.mock_s3_client.get_object.return_value = {
+            "Body": MagicMock(read=lambda: archived_body)
+        }
+        found_conversation = find_conversation_by_id(
+            user_id="user", conversation_id="1"
+        )
+        self.assertEqual(len(found_conversation.message_map), 2)
+        self.assertEqual(found_conversation.message_map["a"].content[0].body, "Hello")  # type: ignore
+
+    def test_archive_updated_conversation(self):
+        self.mock_table.get_item.return_value = {"Item": self.item}
+        self.mock_table.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}},
+            "PutItem",
+        )
+
+        archived = archive_conversation(user_id="user", conversation_id="1")
+        self.assertFalse(archived)
+        # Uploaded archive is removed
+        self.mock_s3_client.delete_object.assert_called_once()
+
+    def test_archive_already_archived_conversation(self):
+        self.mock_table.get_item.return_value = {
+            "Item": {**self.item, "IsArchived": True}
+        }
+
+        archived = archive_conversation(user_id="user", conversation_id="1")
+        self.assertFalse(archived)
+        self.mock_s3_client.put_object.assert_not_called()
+
+
+class TestPublishedApiPartitionSharding(unittest.TestCase):
+    def setUp(self):
+        self.patcher1 = patch("boto3.resource")
+        self.patcher2 = patch("app.repositories.conversation.s3_client")
+        self.mock_boto3_resource = self.patcher1.start()
+        self.mock_s3_client = self.patcher2.start()
+
+        self.mock_table = MagicMock()
+        self.mock_boto3_resource.return_value.Table.return_value = self.mock_table
+        self.user_id = "PUBLISHED_API#bot1"
+
+    def tearDown(self):
+        self.patcher1.stop()
+        self.patcher2.stop()
+
+    def test_compose_partition_key(self):
+        self.assertEqual(compose_partition_key("user", "conv1"), "user")
+
+        partition_key = compose_partition_key(self.user_id, "conv1")
+        self.assertTrue(partition_key.startswith(f"{self.user_id}#"))
+        # Same conversation is always stored in the same shard
+        self.assertEqual(partition_key, compose_partition_key(self.user_id, "conv1"))
+        self.assertEqual(decompose_partition_key(partition_key), self.user_id)
+        self.assertEqual(decompose_partition_key(self.user_id), self.user_id)
+
+        partition_keys = compose_partition_keys(self.user_id)
+        self.assertIn(self.user_id, partition_keys)
+        self.assertIn(partition_key, partition_keys)
+        self.assertEqual(len(partition_keys), PUBLISHED_API_PARTITION_SHARD_COUNT + 1)
+
+    def test_store_conversation_to_shard(self):
+        conversation = ConversationModel(
+            id="conv1",
+            create_time=1627984879.9,
+            title="Test Conversation",
+            total_price=0,
+            message_map={},
+            last_message_id="",
+            bot_id="bot1",
+            should_continue=False,
+        )
+        store_conversation(self.user_id, conversation)
+        self.assertEqual(
+            self.mock_table.put_item.call_args.kwargs["Item"]["PK"],
+            compose_partition_key(self.user_id, "conv1"),
+        )
+
+    def test_find_conversation_by_user_id_fans_out(self):
+        def conversation_item(conversation_id: str, create_time: int):
+            return {
+                "PK": compose_partition_key(self.user_id, conversation_id),
+                "SK": f"{self.user_id}#CONV#{conversation_id}",
+                "Title": conversation_id,
+                "CreateTime": create_time,
+                "MessageMap": json.dumps({"system": {"model": "m"}}),
+            }
+
+        responses: list[dict] = [
+            {"Items": []} for _ in range(PUBLISHED_API_PARTITION_SHARD_COUNT + 1)
+        ]
+        responses[1]["Items"].append(conversation_item("conv1", 1))
+        responses[2]["Items"].append(conversation_item("conv2", 2))
+        self.mock_table.query.side_effect = responses
+
+        conversations = find_conversation_by_user_id(self.user_id)
+        self.assertEqual(
+            self.mock_table.query.call_count, PUBLISHED_API_PARTITION_SHARD_COUNT + 1
+        )
+        # Newest first
+        self.assertEqual([c.id for c in conversations], ["conv2", "conv1"])
+
+    def test_find_conversation_moves_unsharded_item(self):
+        item = {
+            "PK": self.user_id,
+            "SK": f"{self.user_id}#CONV#conv1",
+            "Title": "Test Conversation",
+            "CreateTime": 1627984879.9,
+            "LastMessageId": "",
+            "MessageMap": json.dumps({}),
+            "IsLargeMessage": False,
+        }
+        related_document_item = {
+            "PK": self.user_id,
+            "SK": f"{self.user_id}#RELATED_DOCUMENT#conv1#source1",
+        }
+        self.mock_table.query.side_effect = [
+            {"Items": [item]},
+            {"Items": [related_document_item]},
+        ]
+        writer = self.mock_table.batch_writer.return_value.__enter__.return_value
+
+        conversation = find_conversation_by_id(self.user_id, "conv1")
+        self.assertEqual(conversation.id, "conv1")
+
+        partition_key = compose_partition_key(self.user_id, "conv1")
+        put_calls = self.mock_table.put_item.call_args_list
+        self.assertEqual(
+            [c.kwargs["Item"]["PK"] for c in put_calls], [partition_key] * 2
+        )
+        # Items already moved are not overwritten
+        self.assertEqual(
+            {c.kwargs["ConditionExpression"] for c in put_calls},
+            {"attribute_not_exists(PK)"},
+        )
+        deleted_keys = [c.kwargs["Key"] for c in writer.delete_item.call_args_list]
+        self.assertEqual(
+            deleted_keys,
+            [{"PK": self.user_id, "SK": item["SK"]}]
+            + [{"PK": self.user_id, "SK": related_document_item["SK"]}],
+        )
+
+    def test_find_conversation_keeps_item_already_moved(self):
+        stale_item = {
+            "PK": self.user_id,
+            "SK": f"{self.user_id}#CONV#conv1",
+            "Title": "Test Conversation",
+            "CreateTime": 1627984879.9,
+            "LastMessageId": "",
+            "MessageMap": json.dumps({}),
+            "IsLargeMessage": False,
+        }
+        moved_item = {
+            **stale_item,
+            "PK": compose_partition_key(self.user_id, "conv1"),
+            "LastMessageId": "message1",
+        }
+        self.mock_table.query.side_effect = [{"Items": [stale_item]}, {"Items": []}]
+        self.mock_table.put_item.side_effect = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+        )
+        self.mock_table.get_item.return_value = {"Item": moved_item}
+
+        conversation = find_conversation_by_id(self.user_id, "conv1")
+        self.assertEqual(conversation.last_message_id, "message1")
+        self.assertTrue(self.mock_table.get_item.call_args.kwargs["ConsistentRead"])
+
+    def test_find_conversation_prefers_item_in_shard(self):
+        item = {
+            "PK": compose_partition_key(self.user_id, "conv1"),
+            "SK": f"{self.user_id}#CONV#conv1",
+            "Title": "Test Conversation",
+            "CreateTime": 1627984879.9,
+            "LastMessageId": "message1",
+            "MessageMap": json.dumps({}),
+            "IsLargeMessage": False,
+        }
+        # Old item not removed from the index yet
+        self.mock_table.query.return_value = {
+            "Items": [{**item, "PK": self.user_id, "LastMessageId": ""}, item]
+        }
+
+        conversation = find_conversation_by_id(self.user_id, "conv1")
+        self.assertEqual(conversation.last_message_id, "message1")
+        self.mock_table.put_item.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
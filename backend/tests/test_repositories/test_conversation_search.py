@@ -0,0 +1,97 @@
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, ".")
+
+from app.repositories.common import search_result_cache
+from app.repositories.conversation import _compose_first_user_message
+from app.repositories.conversation_search import find_conversation_suggestions
+from app.repositories.models.conversation import (
+    ImageContentModel,
+    MessageModel,
+    TextContentModel,
+)
+from app.user import User
+
+
+def _message(role: str, body: str, create_time: float) -> MessageModel:
+    return MessageModel(
+        role=role,
+        content=[TextContentModel(content_type="text", body=body)],
+        model="claude-v3.5-sonnet",
+        children=[],
+        parent=None,
+        create_time=create_time,
+        feedback=None,
+        used_chunks=None,
+        thinking_log=None,
+    )
+
+
+class TestComposeFirstUserMessage(unittest.TestCase):
+    def test_first_user_message(self):
+        message_map = {
+            "system": _message("system", "You are a helpful assistant", 0),
+            "2": _message("user", "second question", 3),
+            "1": _message("user", "first question", 1),
+            "a": _message("assistant", "answer", 2),
+        }
+        self.assertEqual(_compose_first_user_message(message_map), "first question")
+
+    def test_text_only_and_truncated(self):
+        message = _message("user", "x" * 1000, 1)
+        message.content.insert(
+            0,
+            ImageContentModel(
+                content_type="image", media_type="image/png", body=b"image"
+            ),
+        )
+        self.assertEqual(_compose_first_user_message({"1": message}), "x" * 256)
+
+    def test_no_user_message(self):
+        self.assertEqual(
+            _compose_first_user_message({"system": _message("system", "", 0)}), ""
+        )
+
+
+class TestFindConversationSuggestions(unittest.TestCase):
+    def setUp(self):
+        search_result_cache.invalidate()
+        self.user = User(id="user1", name="user1", groups=[], email="user1@a.com")
+
+    def test_suggestions(self):
+        client = MagicMock()
+        client.search.return_value = {
+            "hits": {
+                "hits": [
+                    {"_source": {"SK": "user1#CONV#conv1", "Title": "Hello world"}},
+                ]
+            }
+        }
+
+        suggestions = find_conversation_suggestions("hel", self.user, client=client)
+
+        self.assertEqual(len(suggestions), 1)
+        self.assertEqual(suggestions[0].id, "conv1")
+        self.assertEqual(suggestions[0].title, "Hello world")
+
+        body = client.search.call_args.kwargs["body"]
+        # Only ids and titles are fetched without highlights and sorting by messages
+        self.assertEqual(body["_source"], ["SK", "Title"])
+        self.assertNotIn("highlight", body)
+        self.assertEqual(
+            [
+                list(should["match"].keys())[0]
+                for should in body["query"]["bool"]["should"]
+            ],
+            ["Title.suggest", "FirstUserMessage.suggest"],
+        )
+        self.assertIn(
+            {"prefix": {"SK.keyword": "user1#CONV#"}},
+            body["query"]["bool"]["filter"]["bool"]["must"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
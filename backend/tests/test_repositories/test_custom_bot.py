@@ -1,8 +1,12 @@
 import sys
 import unittest
+from decimal import Decimal as decimal
+from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, ".")
 
+from app.repositories import custom_bot
+from app.repositories.bot_usage import flush_bot_usage, record_last_used_time
 from app.repositories.common import RecordNotFoundError
 from app.repositories.custom_bot import (
     alias_exists,
@@ -12,7 +16,9 @@ from app.repositories.custom_bot import (
     find_alias_by_bot_id,
     find_all_published_bots,
     find_bot_by_id,
+    find_original_bot_items,
     find_owned_bots_by_user_id,
+    find_owned_bots_page,
     find_pinned_public_bots,
     find_recently_used_bots_by_user_id,
     find_starred_bots_by_user_id,
@@ -21,14 +27,11 @@ from app.repositories.custom_bot import (
     store_alias,
     store_bot,
     update_alias_is_origin_accessible,
-    update_alias_last_used_time,
     update_alias_star_status,
     update_bot,
-    update_bot_last_used_time,
     update_bot_publication,
     update_bot_shared_status,
     update_bot_star_status,
-    update_bot_stats,
     update_knowledge_base_id,
 )
 from app.repositories.models.custom_bot import (
@@ -205,18 +208,6 @@ class TestCustomBotRepository(unittest.TestCase):
         bot = find_owned_bots_by_user_id("user1")
         self.assertEqual(len(bot), 0)
 
-    def test_update_bot_last_used_time(self):
-        bot = create_test_private_bot("1", False, "user1")
-        store_bot(bot)
-        update_bot_last_used_time("user1", "1")
-
-        bot = find_bot_by_id("1")
-        self.assertIsNotNone(bot.last_used_time)
-        self.assertNotEqual(bot.last_used_time, 1627984879.9)
-        self.assertEqual(bot.display_retrieved_chunks, True)
-
-        delete_bot_by_id("user1", "1")
-
     def test_update_bot_star_status(self):
         bot = create_test_private_bot("1", False, "user1")
         store_bot(bot)
@@ -427,17 +418,6 @@ class TestCustomBotRepository(unittest.TestCase):
 
         delete_bot_by_id("user1", "1")
 
-    def test_update_bot_stats(self):
-        # Note: default count is 0
-        bot = create_test_private_bot("1", False, "user1")
-        store_bot(bot)
-        update_bot_stats("user1", "1", 3)
-
-        bot = find_bot_by_id("1")
-        self.assertEqual(bot.usage_stats.usage_count, 3)
-
-        delete_bot_by_id("user1", "1")
-
 
 class TestBotAliasRepository(unittest.TestCase):
     def setUp(self) -> None:
@@ -575,6 +555,243 @@ class TestFindAllBots(unittest.TestCase):
         self.assertIsNone(next_token)
 
 
+class TestFindOwnedBotsPage(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("app.repositories.custom_bot.get_bot_table_client")
+        self.mock_table = MagicMock()
+        self.patcher.start().return_value = self.mock_table
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _item(self, bot_id: str, last_used_or_create_time: int) -> dict:
+        return {
+            "PK": "user1",
+            "SK": f"BOT#{bot_id}",
+            "ItemType": "user1#BOT",
+            "BotId": bot_id,
+            "Title": f"Bot {bot_id}",
+            "Description": "",
+            "CreateTime": decimal(1),
+            "LastUsedOrCreateTime": decimal(last_used_or_create_time),
+            "SyncStatus": "SUCCEEDED",
+            "SharedStatus": "unshared",
+        }
+
+    def _last_evaluated_key(self, item: dict) -> dict:
+        return {
+            key: item[key] for key in ("PK", "SK", "ItemType", "LastUsedOrCreateTime")
+        }
+
+    def test_query_page(self):
+        item = self._item("1", 3)
+        self.mock_table.query.return_value = {
+            "Items": [item],
+            "LastEvaluatedKey": self._last_evaluated_key(item),
+        }
+
+        bots, next_token = find_owned_bots_page("user1", limit=1)
+        self.assertEqual([bot.id for bot in bots], ["1"])
+        self.assertIsNotNone(next_token)
+
+        kwargs = self.mock_table.query.call_args.kwargs
+        self.assertEqual(kwargs["IndexName"], "OwnedBotIndex")
+        self.assertEqual(kwargs["Limit"], 1)
+        self.assertFalse(kwargs["ScanIndexForward"])
+        # Heavy attributes are not fetched
+        attributes = kwargs["ExpressionAttributeNames"].values()
+        self.assertNotIn("Instruction", attributes)
+        self.assertNotIn("Knowledge", attributes)
+
+        # Continue from the returned token
+        self.mock_table.query.return_value = {"Items": [self._item("2", 2)]}
+        bots, next_token = find_owned_bots_page("user1", limit=1, next_token=next_token)
+        self.assertEqual([bot.id for bot in bots], ["2"])
+        self.assertIsNone(next_token)
+        self.assertEqual(
+            self.mock_table.query.call_args.kwargs["ExclusiveStartKey"],
+            self._last_evaluated_key(item),
+        )
+
+    def test_reject_token_of_other_user(self):
+        self.mock_table.query.return_value = {
+            "Items": [],
+            "LastEvaluatedKey": self._last_evaluated_key(self._item("1", 3)),
+        }
+        _, next_token = find_owned_bots_page("user1", limit=1)
+
+        with self.assertRaises(ValueError):
+            find_owned_bots_page("user2", limit=1, next_token=next_token)
+
+    def test_find_owned_bots_across_pages(self):
+        items = [self._item(str(i), 10 - i) for i in range(5)]
+        self.mock_table.query.side_effect = [
+            {
+                "Items": items[:2],
+                "LastEvaluatedKey": self._last_evaluated_key(items[1]),
+            },
+            {
+                "Items": items[2:4],
+                "LastEvaluatedKey": self._last_evaluated_key(items[3]),
+            },
+            {"Items": items[4:]},
+        ]
+
+        bots = find_owned_bots_by_user_id("user1")
+        self.assertEqual([bot.id for bot in bots], ["0", "1", "2", "3", "4"])
+
+    def test_find_owned_bots_with_limit(self):
+        items = [self._item(str(i), 10 - i) for i in range(3)]
+        self.mock_table.query.side_effect = [
+            {
+                "Items": items[:2],
+                "LastEvaluatedKey": self._last_evaluated_key(items[1]),
+            },
+            {"Items": items[2:]},
+        ]
+
+        bots = find_owned_bots_by_user_id("user1", limit=3)
+        self.assertEqual([bot.id for bot in bots], ["0", "1", "2"])
+        # Only the remaining number of bots is requested
+        self.assertEqual(self.mock_table.query.call_args.kwargs["Limit"], 1)
+
+
+class TestFindOriginalBotItems(unittest.TestCase):
+    def setUp(self):
+        custom_bot.original_bot_cache.invalidate()
+        self.mock_client = MagicMock()
+        mock_table = MagicMock()
+        mock_table.table_name = "BotTable"
+        self.patchers = [
+            patch(
+                "app.repositories.custom_bot.get_dynamodb_client",
+                return_value=self.mock_client,
+            ),
+            patch(
+                "app.repositories.custom_bot.get_bot_table_client",
+                return_value=mock_table,
+            ),
+            patch("app.repositories.custom_bot.BATCH_READ_BASE_DELAY_SECONDS", 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        custom_bot.original_bot_cache.invalidate()
+
+    def _item(self, owner_user_id: str, bot_id: str) -> dict:
+        return {"PK": owner_user_id, "SK": f"BOT#{bot_id}", "BotId": bot_id}
+
+    def test_retry_unprocessed_keys(self):
+        unprocessed = {"BotTable": {"Keys": [{"PK": "user2", "SK": "BOT#2"}]}}
+        self.mock_client.batch_get_item.side_effect = [
+            {
+                "Responses": {"BotTable": [self._item("user1", "1")]},
+                "UnprocessedKeys": unprocessed,
+            },
+            {"Responses": {"BotTable": [self._item("user2", "2")]}},
+        ]
+
+        result = find_original_bot_items(
+            [("user1", "1"), ("user2", "2"), ("user3", "3")]
+        )
+        self.assertEqual(set(result.keys()), {("user1", "1"), ("user2", "2")})
+        self.assertEqual(self.mock_client.batch_get_item.call_count, 2)
+        self.assertEqual(
+            self.mock_client.batch_get_item.call_args.kwargs["RequestItems"],
+            unprocessed,
+        )
+
+    def test_cache_original_bots(self):
+        self.mock_client.batch_get_item.return_value = {
+            "Responses": {"BotTable": [self._item("user1", "1")]}
+        }
+        find_original_bot_items([("user1", "1")])
+        result = find_original_bot_items([("user1", "1")])
+        self.assertIn(("user1", "1"), result)
+        self.assertEqual(self.mock_client.batch_get_item.call_count, 1)
+
+        # Updated bot is read again
+        custom_bot.invalidate_original_bot_cache("user1", "1")
+        find_original_bot_items([("user1", "1")])
+        self.assertEqual(self.mock_client.batch_get_item.call_count, 2)
+
+    def test_split_into_batches(self):
+        self.mock_client.batch_get_item.side_effect = lambda RequestItems: {
+            "Responses": {
+                "BotTable": [
+                    {**key, "BotId": key["SK"].split("#")[1]}
+                    for key in RequestItems["BotTable"]["Keys"]
+                ]
+            }
+        }
+
+        keys = [("user1", str(i)) for i in range(250)]
+        result = find_original_bot_items(keys)
+        self.assertEqual(len(result), 250)
+        self.assertEqual(self.mock_client.batch_get_item.call_count, 3)
+
+
+class TestFindPublishedBotsIndex(unittest.TestCase):
+    @patch("app.repositories.custom_bot.get_bot_table_client")
+    def test_query_published_bot_index(self, mock_get_table):
+        mock_table = MagicMock()
+        mock_get_table.return_value = mock_table
+        last_evaluated_key = {
+            "PK": "user1",
+            "SK": "BOT#1",
+            "IsPublished": "TRUE",
+            "PublishedTime": decimal(1700000000000),
+        }
+        mock_table.query.return_value = {
+            "Items": [
+                {
+                    "PK": "user1",
+                    "BotId": "1",
+                    "Title": "Bot 1",
+                    "Description": "",
+                    "CreateTime": decimal(1),
+                    "SyncStatus": "SUCCEEDED",
+                    "ApiPublishmentStackName": "ApiPublishmentStack1",
+                    "ApiPublishedDatetime": decimal(1700000000000),
+                    "SharedScope": "all",
+                    "SharedStatus": "shared",
+                }
+            ],
+            "LastEvaluatedKey": last_evaluated_key,
+        }
+
+        bots, next_token = find_all_published_bots(limit=1)
+        self.assertEqual(bots[0].published_api_stack_name, "ApiPublishmentStack1")
+        kwargs = mock_table.query.call_args.kwargs
+        self.assertEqual(kwargs["IndexName"], "PublishedBotIndex")
+        # Sparse index does not require filtering
+        self.assertNotIn("FilterExpression", kwargs)
+
+        find_all_published_bots(limit=1, next_token=next_token)
+        self.assertEqual(
+            mock_table.query.call_args.kwargs["ExclusiveStartKey"], last_evaluated_key
+        )
+
+    @patch("app.repositories.custom_bot.PUBLISHED_BOT_INDEX_ENABLED", False)
+    @patch("app.repositories.custom_bot.get_bot_table_client")
+    def test_query_shared_scope_index_until_published_bot_index_enabled(
+        self, mock_get_table
+    ):
+        mock_table = MagicMock()
+        mock_get_table.return_value = mock_table
+        mock_table.query.return_value = {"Items": []}
+
+        bots, next_token = find_all_published_bots(limit=1)
+        self.assertEqual(bots, [])
+        self.assertIsNone(next_token)
+        kwargs = mock_table.query.call_args.kwargs
+        self.assertEqual(kwargs["IndexName"], "SharedScopeIndex")
+        self.assertIn("FilterExpression", kwargs)
+
+
 class TestUpdateBotSharedStatus(unittest.TestCase):
     def setUp(self) -> None:
         bot1 = create_test_private_bot("1", is_starred=True, owner_user_id="user1")
@@ -620,7 +837,7 @@ class TestRemoveFromRecentlyUsed(unittest.TestCase):
             id="owned_bot", is_starred=False, owner_user_id="user1"
         )
         store_bot(self.owned_bot)
-        update_bot_last_used_time("user1", "owned_bot")  # Ensure it has LastUsedTime
+        record_last_used_time("user1", "owned_bot", "bot")
 
         # Create a bot owned by user2 that user1 will use via alias
         self.shared_bot = create_test_public_bot(
@@ -631,7 +848,8 @@ class TestRemoveFromRecentlyUsed(unittest.TestCase):
         # Create an alias for user1 to access user2's bot
         alias_for_shared = BotAliasModel.from_bot_for_initial_alias(self.shared_bot)
         store_alias("user1", alias_for_shared)
-        update_alias_last_used_time("user1", "shared_bot")  # Ensure it has LastUsedTime
+        record_last_used_time("user1", "shared_bot", "alias")
+        flush_bot_usage(force=True)  # Ensure they have LastUsedTime
 
     def tearDown(self) -> None:
         delete_bot_by_id("user1", "owned_bot")
@@ -0,0 +1,97 @@
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.repositories.idempotency import (
+    delete_idempotency_record,
+    store_idempotency_record,
+)
+from botocore.exceptions import ClientError
+
+
+class TestStoreIdempotencyRecord(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        # Key: SK
+        self.items: dict[str, dict] = {}
+
+        def put_item(Item, ConditionExpression, ExpressionAttributeValues):
+            stored = self.items.get(Item["SK"])
+            if (
+                stored is not None
+                and stored["ExpireTime"] >= ExpressionAttributeValues[":now"]
+            ):
+                raise ClientError(
+                    {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+                )
+            self.items[Item["SK"]] = Item
+
+        self.table.put_item.side_effect = put_item
+        self.table.get_item.side_effect = lambda Key, **kwargs: (
+            {"Item": self.items[Key["SK"]]} if Key["SK"] in self.items else {}
+        )
+        self.table.delete_item.side_effect = lambda Key: self.items.pop(Key["SK"])
+        self.patches = [
+            patch(
+                "app.repositories.idempotency.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch(
+                "app.repositories.idempotency.get_current_time",
+                return_value=1_000_000_000,
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_return_stored_value(self):
+        self.assertIsNone(store_idempotency_record("user1", "key1", {"id": "first"}))
+        self.assertEqual(
+            store_idempotency_record("user1", "key1", {"id": "second"}),
+            {"id": "first"},
+        )
+
+        # The client supplied key is hashed, prefixed with the user id for row level security
+        (sk,) = self.items.keys()
+        self.assertTrue(sk.startswith("user1#IDEMPOTENCY#"))
+        self.assertNotIn("key1", sk)
+
+    def test_overwrite_expired_record(self):
+        store_idempotency_record("user1", "key1", {"id": "first"})
+        (item,) = self.items.values()
+        # Expired but not deleted by TTL yet
+        item["ExpireTime"] = 1_000_000 - 1
+
+        self.assertIsNone(store_idempotency_record("user1", "key1", {"id": "second"}))
+        (item,) = self.items.values()
+        self.assertEqual(item["Value"], '{"id": "second"}')
+
+    def test_store_again_after_delete(self):
+        store_idempotency_record("user1", "key1", {"id": "first"})
+        delete_idempotency_record("user1", "key1")
+
+        self.assertIsNone(store_idempotency_record("user1", "key1", {"id": "second"}))
+
+    def test_retry_if_deleted_after_conditional_check(self):
+        self.table.put_item.side_effect = [
+            ClientError(
+                {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+            ),
+            None,
+        ]
+        # Deleted between the conditional check and the read
+        self.table.get_item.side_effect = None
+        self.table.get_item.return_value = {}
+
+        self.assertIsNone(store_idempotency_record("user1", "key1", {"id": "first"}))
+        self.assertEqual(self.table.put_item.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
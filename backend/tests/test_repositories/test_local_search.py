@@ -0,0 +1,233 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.repositories import local_search
+from app.repositories.bot_store import (
+    find_bots_by_query,
+    find_bots_sorted_by_usage_count,
+    find_non_public_bot_sources,
+    find_public_bot_sources_sorted_by_usage_count,
+)
+from app.repositories.conversation import (
+    change_conversation_title,
+    delete_conversation_by_id,
+    store_conversation,
+)
+from app.repositories.conversation_search import (
+    find_conversation_suggestions,
+    find_conversations_by_query,
+)
+from app.repositories.custom_bot import delete_bot_by_id, store_bot
+from app.repositories.models.conversation import (
+    ConversationModel,
+    MessageModel,
+    TextContentModel,
+)
+from app.user import User
+from tests.test_repositories.utils.bot_factory import (
+    create_test_partial_shared_bot,
+    create_test_private_bot,
+    create_test_public_bot,
+)
+
+
+def _message(role: str, body: str, create_time: float) -> MessageModel:
+    return MessageModel(
+        role=role,
+        content=[TextContentModel(content_type="text", body=body)],
+        model="claude-v3.5-sonnet",
+        children=[],
+        parent=None,
+        create_time=create_time,
+        feedback=None,
+        used_chunks=None,
+        thinking_log=None,
+    )
+
+
+def _conversation(id: str, title: str, question: str, answer: str):
+    return ConversationModel(
+        id=id,
+        create_time=1,
+        title=title,
+        total_price=0,
+        message_map={
+            "system": _message("system", "", 1),
+            "1": _message("user", question, 2),
+            "2": _message("assistant", answer, 3),
+        },
+        last_message_id="2",
+        bot_id=None,
+        should_continue=False,
+    )
+
+
+class LocalSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        local_search.reset_local_search_index(
+            os.path.join(self.directory.name, "index.sqlite3")
+        )
+        self.patches = [
+            patch.object(local_search, "SEARCH_BACKEND", "local"),
+            patch("app.repositories.conversation.get_conversation_table_client"),
+            patch("app.repositories.conversation.delete_related_documents"),
+            patch("app.repositories.custom_bot.get_bot_table_client"),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.user = User(id="user1", name="user1", groups=[], email="user1@a.com")
+        self.other = User(
+            id="user2", name="user2", groups=["group1"], email="user2@a.com"
+        )
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        local_search.reset_local_search_index()
+        self.directory.cleanup()
+
+
+class TestLocalConversationSearch(LocalSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        store_conversation(
+            "user1",
+            _conversation(
+                "conv1",
+                "Python tips",
+                "How to sort a list?",
+                "Use the sorted function.",
+            ),
+        )
+        store_conversation(
+            "user1",
+            _conversation(
+                "conv2", "Travel", "Best places in Kyoto", "Visit the temples."
+            ),
+        )
+        store_conversation(
+            "user2",
+            _conversation("conv3", "Python secret", "sorted list", "private"),
+        )
+
+    def test_query_and_highlight(self):
+        results = find_conversations_by_query("sorted python", self.user)
+
+        # Conversations of other users are never returned
+        self.assertEqual([result.id for result in results], ["conv1"])
+        highlights = {
+            highlight.field_name: highlight.fragments
+            for highlight in results[0].highlights or []
+        }
+        self.assertEqual(highlights["Title"], ["<em>Python</em> tips"])
+        self.assertIn("<em>sorted</em>", highlights["MessageBody"][0])
+        self.assertEqual(results[0].last_updated_time, 3)
+
+    def test_title_is_weighted(self):
+        store_conversation(
+            "user1",
+            _conversation("conv4", "Kyoto", "Hello", "Hi"),
+        )
+        results = find_conversations_by_query("kyoto", self.user)
+        self.assertEqual([result.id for result in results], ["conv4", "conv2"])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(find_conversations_by_query('"* OR NOT (', self.user), [])
+
+    def test_suggestions(self):
+        suggestions = find_conversation_suggestions("best pla", self.user)
+        self.assertEqual([s.id for s in suggestions], ["conv2"])
+        # Message bodies other than the first user message are not suggested
+        self.assertEqual(find_conversation_suggestions("temp", self.user), [])
+
+    def test_updated_by_write_paths(self):
+        change_conversation_title("user1", "conv2", "Holiday")
+        self.assertEqual(
+            [s.title for s in find_conversation_suggestions("holi", self.user)],
+            ["Holiday"],
+        )
+
+        with patch(
+            "app.repositories.conversation.get_conversation_table_client"
+        ) as get_table:
+            get_table.return_value.get_item.return_value = {}
+            delete_conversation_by_id("user1", "conv2")
+        self.assertEqual(find_conversations_by_query("kyoto", self.user), [])
+
+
+class TestLocalBotSearch(LocalSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        store_bot(
+            create_test_public_bot(
+                "public1", False, "user3", usage_count=10
+            ).model_copy(
+                update={"title": "Translator", "description": "Translate texts"}
+            )
+        )
+        store_bot(create_test_public_bot("public2", False, "user3", usage_count=20))
+        store_bot(
+            create_test_private_bot("private1", False, "user1").model_copy(
+                update={"title": "My translator"}
+            )
+        )
+        store_bot(
+            create_test_partial_shared_bot(
+                "partial1", False, "user3", allowed_cognito_groups=["group1"]
+            ).model_copy(update={"title": "Group translator"})
+        )
+
+    def test_query_with_access_control(self):
+        self.assertEqual(
+            {bot.id for bot in find_bots_by_query("transl", self.user)},
+            {"public1", "private1"},
+        )
+        self.assertEqual(
+            {bot.id for bot in find_bots_by_query("translator", self.other)},
+            {"public1", "partial1"},
+        )
+        admin = User(id="admin", name="admin", groups=["Admin"], email="a@a.com")
+        self.assertEqual(
+            {bot.id for bot in find_bots_by_query("translator", admin)},
+            {"public1", "partial1"},
+        )
+
+    def test_sorted_by_usage_count(self):
+        self.assertEqual(
+            [bot.id for bot in find_bots_sorted_by_usage_count(self.user)][:2],
+            ["public2", "public1"],
+        )
+        self.assertEqual(
+            [
+                source["BotId"]
+                for source in find_public_bot_sources_sorted_by_usage_count()
+            ],
+            ["public2", "public1"],
+        )
+        self.assertEqual(
+            [source["BotId"] for source in find_non_public_bot_sources(self.other)],
+            ["partial1"],
+        )
+
+    def test_removed_on_delete(self):
+        delete_bot_by_id("user1", "private1")
+        self.assertEqual(
+            {bot.id for bot in find_bots_by_query("transl", self.user)}, {"public1"}
+        )
+
+    def test_injected_client_uses_opensearch(self):
+        client = MagicMock()
+        client.search.return_value = {"hits": {"hits": []}}
+        find_bots_by_query("query", self.user, client=client)
+        client.search.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
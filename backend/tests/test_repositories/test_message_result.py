@@ -0,0 +1,61 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+
+from app.repositories.message_result import (
+    complete_message_result,
+    lock_message_result,
+)
+from botocore.exceptions import ClientError
+
+
+class TestMessageResultRepository(unittest.TestCase):
+    @patch("app.repositories.message_result.get_conversation_table_client")
+    def test_drop_too_large_output(self, get_table):
+        table = get_table.return_value
+        table.update_item.return_value = {
+            "Attributes": {
+                "MessageId": "message1",
+                "ConversationId": "conversation1",
+                "Status": "SUCCEEDED",
+                "CreateTime": 1,
+                "CompleteTime": 2,
+            }
+        }
+
+        with patch("app.repositories.message_result.MAX_OUTPUT_SIZE", 3):
+            result = complete_message_result(
+                user_id="user1",
+                conversation_id="conversation1",
+                message_id="message1",
+                status="SUCCEEDED",
+                output="large",
+            )
+
+        kwargs = table.update_item.call_args.kwargs
+        self.assertIn("REMOVE #output, #error, LockedUntil", kwargs["UpdateExpression"])
+        self.assertEqual(kwargs["Key"], {"PK": "user1", "SK": "user1#RESULT#message1"})
+        self.assertIsNone(result.output)
+
+    @patch("app.repositories.message_result.get_conversation_table_client")
+    def test_lock_once(self, get_table):
+        table = get_table.return_value
+        table.update_item.side_effect = [
+            None,
+            ClientError(
+                {"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem"
+            ),
+        ]
+
+        self.assertTrue(lock_message_result("user1", "conversation1", "message1"))
+        self.assertFalse(lock_message_result("user1", "conversation1", "message1"))
+        self.assertIn(
+            "#status <> :succeeded",
+            table.update_item.call_args.kwargs["ConditionExpression"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
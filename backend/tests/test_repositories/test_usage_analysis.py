@@ -1,15 +1,22 @@
+import re
 import sys
 import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
 
 sys.path.append(".")
 
 from pprint import pprint
 
+from app.repositories import usage_analysis
 from app.repositories.usage_analysis import (
+    _find_bot_prices_from_athena,
     _find_cognito_user_by_id,
     _find_cognito_users_by_ids,
+    _find_user_prices_from_athena,
     find_bots_sorted_by_price,
     find_users_sorted_by_price,
+    iter_athena_query_rows,
+    run_athena_query,
 )
 
 
@@ -42,5 +49,202 @@ class TestCognitoUser(unittest.IsolatedAsyncioTestCase):
         pprint(users)
 
 
+def _rows(*values: list[str | None]) -> list[dict]:
+    return [
+        {"Data": [{} if v is None else {"VarCharValue": v} for v in row]}
+        for row in values
+    ]
+
+
+class TestRunAthenaQuery(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.athena = MagicMock()
+        self.athena.start_query_execution.return_value = {"QueryExecutionId": "exec1"}
+        self.patches = [
+            patch.object(usage_analysis, "athena", self.athena),
+            patch.object(usage_analysis, "ATHENA_POLL_INITIAL_INTERVAL_SECONDS", 0),
+        ]
+        for p in self.patches:
+            p.start()
+        usage_analysis.athena_query_cache.invalidate()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _status(self, state: str) -> dict:
+        return {"QueryExecution": {"Status": {"State": state}}}
+
+    async def test_poll_until_succeeded_and_cache(self):
+        self.athena.get_query_execution.side_effect = [
+            self._status("QUEUED"),
+            self._status("RUNNING"),
+            self._status("SUCCEEDED"),
+        ]
+
+        execution_id = await run_athena_query("SELECT  1", "db", "wg", "s3://out")
+        self.assertEqual(execution_id, "exec1")
+        self.assertEqual(self.athena.get_query_execution.call_count, 3)
+
+        # Same query except whitespaces is not executed again
+        execution_id = await run_athena_query("SELECT 1\n", "db", "wg", "s3://out")
+        self.assertEqual(execution_id, "exec1")
+        self.athena.start_query_execution.assert_called_once()
+
+    async def test_failed_query_is_not_cached(self):
+        self.athena.get_query_execution.return_value = {
+            "QueryExecution": {
+                "Status": {"State": "FAILED", "StateChangeReason": "syntax error"}
+            }
+        }
+
+        with self.assertRaisesRegex(Exception, "syntax error"):
+            await run_athena_query("SELECT", "db", "wg", "s3://out")
+        self.assertEqual(usage_analysis.athena_query_cache.stats()["size"], 0)
+
+    async def test_cancel_on_timeout(self):
+        self.athena.get_query_execution.return_value = self._status("RUNNING")
+
+        with patch.object(usage_analysis, "ATHENA_QUERY_TIMEOUT_SECONDS", 0):
+            with self.assertRaises(TimeoutError):
+                await run_athena_query("SELECT 1", "db", "wg", "s3://out")
+        self.athena.stop_query_execution.assert_called_once_with(
+            QueryExecutionId="exec1"
+        )
+
+    async def test_iterate_rows_across_pages(self):
+        self.athena.get_paginator.return_value.paginate.return_value = [
+            {"ResultSet": {"Rows": _rows(["BotId", "TotalPrice"], ["bot1", "2.0"])}},
+            {"ResultSet": {"Rows": _rows([None, "1.0"], ["bot2", "0.5"])}},
+        ]
+
+        rows = [row async for row in iter_athena_query_rows("exec1", max_rows=10)]
+
+        self.assertEqual(rows, [["bot1", "2.0"], [None, "1.0"], ["bot2", "0.5"]])
+        self.athena.get_paginator.return_value.paginate.assert_called_once_with(
+            QueryExecutionId="exec1",
+            PaginationConfig={"MaxItems": 11, "PageSize": 1000},
+        )
+
+
+class TestAthenaPriceQueries(unittest.IsolatedAsyncioTestCase):
+    # Published API conversation written after sharding
+    SHARDED_PK = "PUBLISHED_API#bot1#3"
+    SHARDED_SK = "PUBLISHED_API#bot1#CONV#conversation1"
+
+    def setUp(self):
+        async def iter_athena_query_rows(execution_id):
+            yield ["bot1", "1.5"]
+
+        self.patches = [
+            patch(
+                "app.repositories.usage_analysis.run_athena_query",
+                AsyncMock(return_value="exec1"),
+            ),
+            patch(
+                "app.repositories.usage_analysis.iter_athena_query_rows",
+                iter_athena_query_rows,
+            ),
+        ]
+        self.run_athena_query = self.patches[0].start()
+        self.patches[1].start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _assert_match_sharded_row(self, query: str):
+        self.assertNotIn("PK.S", query)
+        patterns = re.findall(r"SK\.S LIKE '([^']*)'", query)
+        self.assertTrue(patterns)
+        for pattern in patterns:
+            regex = re.escape(pattern).replace("%", ".*").replace("_", ".")
+            self.assertRegex(self.SHARDED_SK, f"^{regex}$")
+            self.assertNotRegex(
+                "PUBLISHED_API#bot1#RELATED_DOCUMENT#conversation1#0", f"^{regex}$"
+            )
+
+    async def test_bot_prices_include_sharded_conversations(self):
+        prices = await _find_bot_prices_from_athena(10, "2024010100", "2024010123")
+
+        self._assert_match_sharded_row(self.run_athena_query.call_args.args[0])
+        self.assertEqual(prices, [("bot1", 1.5)])
+
+    async def test_user_prices_group_shards_by_user(self):
+        await _find_user_prices_from_athena(10, "2024010100", "2024010123")
+
+        query = self.run_athena_query.call_args.args[0]
+        self._assert_match_sharded_row(query)
+        # User id is taken from SK, which is the same for all shards
+        delimiter = re.search(r"split_part\(newimage\.SK\.S, '([^']*)', 1\)", query)
+        self.assertIsNotNone(delimiter)
+        self.assertEqual(
+            self.SHARDED_SK.split(delimiter.group(1))[0],  # type: ignore
+            self.SHARDED_PK.rsplit("#", 1)[0],
+        )
+
+
+class TestCognitoUserEnrichment(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cognito = MagicMock()
+        self.cognito.exceptions.UserNotFoundException = type(
+            "UserNotFoundException", (Exception,), {}
+        )
+        self.cognito.exceptions.TooManyRequestsException = type(
+            "TooManyRequestsException", (Exception,), {}
+        )
+        self.patch = patch.object(usage_analysis, "cognito", self.cognito)
+        self.patch.start()
+        usage_analysis.cognito_user_cache.invalidate()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def _user(self, user_id: str) -> dict:
+        return {
+            "Username": user_id,
+            "Attributes": [{"Name": "email", "Value": f"{user_id}@example.com"}],
+        }
+
+    async def test_request_each_user_once(self):
+        def admin_get_user(UserPoolId, Username):
+            if Username == "unknown":
+                raise self.cognito.exceptions.UserNotFoundException()
+            return {"UserAttributes": self._user(Username)["Attributes"]}
+
+        self.cognito.admin_get_user.side_effect = admin_get_user
+
+        users = await _find_cognito_users_by_ids(["user1", "unknown", "user2"])
+        self.assertEqual(
+            users,
+            [
+                {"id": "user1", "email": "user1@example.com"},
+                {"id": "user2", "email": "user2@example.com"},
+            ],
+        )
+
+        # Cached users are not requested again
+        await _find_cognito_users_by_ids(["user2", "user1"])
+        self.assertEqual(self.cognito.admin_get_user.call_count, 3)
+
+    async def test_list_users_if_many_users_are_missing(self):
+        user_ids = [f"user{i}" for i in range(70)]
+        self.cognito.get_paginator.return_value.paginate.return_value = [
+            {"Users": [self._user(user_id) for user_id in user_ids[:60]]},
+            {"Users": [self._user(user_id) for user_id in user_ids[60:69]]},
+        ]
+        self.cognito.admin_get_user.return_value = {
+            "UserAttributes": self._user("user69")["Attributes"]
+        }
+
+        users = await _find_cognito_users_by_ids(user_ids)
+
+        self.assertEqual([user["id"] for user in users], user_ids)
+        # Only the user not listed is requested
+        self.cognito.admin_get_user.assert_called_once_with(
+            UserPoolId=usage_analysis.USER_POOL_ID, Username="user69"
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
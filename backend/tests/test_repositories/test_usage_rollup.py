@@ -0,0 +1,202 @@
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal as decimal
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+import app.usage_rollup
+from app.repositories import usage_rollup
+from app.repositories.usage_rollup import (
+    apply_conversation_price,
+    find_top_prices,
+    is_covered_by_rollups,
+    parse_hour,
+)
+from app.usage_rollup import handler
+from botocore.exceptions import ClientError
+
+
+def _record(event_name: str, sk: str, total_price: str, created: float, bot_id=None):
+    new_image = {"PK": {"S": "user1"}, "SK": {"S": sk}}
+    new_image["TotalPrice"] = {"N": total_price}
+    if bot_id:
+        new_image["BotId"] = {"S": bot_id}
+    dynamodb = {
+        "Keys": {"PK": {"S": "user1"}, "SK": {"S": sk}},
+        "ApproximateCreationDateTime": created,
+    }
+    if event_name != "REMOVE":
+        dynamodb["NewImage"] = new_image
+    return {"eventName": event_name, "dynamodb": dynamodb}
+
+
+class TestApplyConversationPrice(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.client = self.table.meta.client
+        self.patch = patch.object(usage_rollup, "_get_table", return_value=self.table)
+        self.patch.start()
+        self.hour = datetime(2024, 5, 1, 13, tzinfo=timezone.utc)
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_add_increase_since_last_applied_price(self):
+        self.table.get_item.return_value = {"Item": {"TotalPrice": decimal("0.5")}}
+
+        apply_conversation_price(
+            "user1#CONV#1", "user1", "bot1", decimal("0.75"), self.hour
+        )
+
+        items = self.client.transact_write_items.call_args.kwargs["TransactItems"]
+        state, user, bot = (item["Update"] for item in items)
+        self.assertEqual(state["ConditionExpression"], "TotalPrice = :last_price")
+        self.assertEqual(user["Key"], {"PK": "USER#20240501", "SK": "13#user1"})
+        self.assertEqual(bot["Key"], {"PK": "BOT#20240501", "SK": "13#bot1"})
+        self.assertEqual(user["ExpressionAttributeValues"][":delta"], decimal("0.25"))
+        # The state expires with the aggregates
+        self.assertEqual(
+            state["ExpressionAttributeValues"][":expire_time"],
+            user["ExpressionAttributeValues"][":expire_time"],
+        )
+
+    def test_skip_already_applied_price(self):
+        self.table.get_item.return_value = {"Item": {"TotalPrice": decimal("0.75")}}
+
+        apply_conversation_price(
+            "user1#CONV#1", "user1", None, decimal("0.75"), self.hour
+        )
+
+        self.client.transact_write_items.assert_not_called()
+
+    def test_retry_on_conflict(self):
+        self.table.get_item.side_effect = [
+            {},
+            {"Item": {"TotalPrice": decimal("0.5")}},
+        ]
+        self.client.transact_write_items.side_effect = [
+            ClientError(
+                {"Error": {"Code": "TransactionCanceledException"}},
+                "TransactWriteItems",
+            ),
+            None,
+        ]
+
+        apply_conversation_price(
+            "user1#CONV#1", "user1", None, decimal("0.75"), self.hour
+        )
+
+        items = self.client.transact_write_items.call_args.kwargs["TransactItems"]
+        self.assertEqual(len(items), 2)
+        self.assertEqual(
+            items[1]["Update"]["ExpressionAttributeValues"][":delta"],
+            decimal("0.25"),
+        )
+
+
+class TestFindTopPrices(unittest.TestCase):
+    def test_sum_across_hours_and_days(self):
+        table = MagicMock()
+        table.query.side_effect = [
+            {
+                "Items": [
+                    {"SK": "22#bot1", "TotalPrice": decimal("1")},
+                    {"SK": "23#bot2", "TotalPrice": decimal("2")},
+                ],
+                "LastEvaluatedKey": {"PK": "BOT#20240501", "SK": "23#bot2"},
+            },
+            {"Items": [{"SK": "23#bot1", "TotalPrice": decimal("0.5")}]},
+            {"Items": [{"SK": "01#bot1", "TotalPrice": decimal("1")}]},
+        ]
+
+        with patch.object(usage_rollup, "_get_table", return_value=table):
+            prices = find_top_prices(
+                "BOT", 10, parse_hour("2024050122"), parse_hour("2024050201")
+            )
+
+        self.assertEqual(prices, [("bot1", 2.5), ("bot2", 2.0)])
+        # One query per day, continued with the last evaluated key
+        self.assertEqual(table.query.call_count, 3)
+        self.assertIn("ExclusiveStartKey", table.query.call_args_list[1].kwargs)
+
+
+class TestIsCoveredByRollups(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.patch = patch.object(usage_rollup, "_get_table", return_value=self.table)
+        self.patch.start()
+        usage_rollup.rollup_start_cache.invalidate()
+        self.now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.table.get_item.return_value = {
+            "Item": {
+                "StartTime": decimal(int((self.now - timedelta(days=2)).timestamp()))
+            }
+        }
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_period_after_start(self):
+        self.assertTrue(is_covered_by_rollups(self.now - timedelta(days=1)))
+        # The start is cached
+        self.assertTrue(is_covered_by_rollups(self.now))
+        self.table.get_item.assert_called_once()
+
+    def test_period_before_start(self):
+        self.assertFalse(is_covered_by_rollups(self.now - timedelta(days=3)))
+
+    def test_period_beyond_retention(self):
+        self.table.get_item.return_value = {"Item": {"StartTime": decimal(0)}}
+        self.assertFalse(
+            is_covered_by_rollups(
+                self.now - timedelta(days=usage_rollup.USAGE_ROLLUP_RETENTION_DAYS + 1)
+            )
+        )
+
+    def test_nothing_aggregated(self):
+        self.table.get_item.return_value = {}
+        self.assertFalse(is_covered_by_rollups(self.now))
+
+
+class TestUsageRollupHandler(unittest.TestCase):
+    def setUp(self):
+        app.usage_rollup.is_rollup_start_recorded = False
+
+    @patch("app.usage_rollup.record_rollup_start")
+    @patch("app.usage_rollup.remove_conversation_state")
+    @patch("app.usage_rollup.apply_conversation_price")
+    def test_apply_latest_record_of_each_conversation(self, apply, remove, start):
+        created = datetime(2024, 5, 1, 13, 42, tzinfo=timezone.utc).timestamp()
+        result = handler(
+            {
+                "Records": [
+                    _record("INSERT", "user1#CONV#1", "0.1", created, "bot1"),
+                    _record("MODIFY", "user1#CONV#1", "0.3", created, "bot1"),
+                    _record("INSERT", "user1#CONV#2", "0.2", created),
+                    _record("REMOVE", "user1#CONV#3", "0", created),
+                    # Related documents are ignored
+                    _record("INSERT", "user1#RELATED_DOCUMENT#1#doc", "0", created),
+                ]
+            },
+            None,
+        )
+
+        self.assertEqual(result, {"applied": 2, "removed": 1})
+        first = apply.call_args_list[0].kwargs
+        self.assertEqual(first["total_price"], decimal("0.3"))
+        self.assertEqual(first["bot_id"], "bot1")
+        self.assertEqual(first["user_id"], "user1")
+        self.assertEqual(first["hour"], datetime(2024, 5, 1, 13, tzinfo=timezone.utc))
+        self.assertIsNone(apply.call_args_list[1].kwargs["bot_id"])
+        remove.assert_called_once_with("user1#CONV#3")
+        start.assert_called_once_with(datetime(2024, 5, 1, 13, tzinfo=timezone.utc))
+
+        # The start is recorded only once
+        handler({"Records": [_record("MODIFY", "user1#CONV#1", "0.4", created)]}, None)
+        start.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
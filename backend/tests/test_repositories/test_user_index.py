@@ -0,0 +1,180 @@
+import io
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.repositories import user_index
+from app.repositories.user_index import PrefixIndex, RefreshingPrefixIndex
+from app.usecases.user import search_group_by_name_prefix, search_user_by_email_prefix
+from app.user import UserGroup, UserWithoutGroups
+from botocore.exceptions import ClientError
+
+
+def _cognito_user(email: str) -> dict:
+    return {
+        "Username": email.split("@")[0],
+        "Attributes": [{"Name": "email", "Value": email}],
+    }
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def test_find(self):
+        index = PrefixIndex(
+            [("Bob@example.com", 2), ("alice@example.com", 1), ("alex@example.com", 3)]
+        )
+
+        self.assertEqual(index.find("al", 10), [3, 1])
+        self.assertEqual(index.find("AL", 1), [3])
+        self.assertEqual(index.find("bob", 10), [2])
+        self.assertEqual(index.find("carol", 10), [])
+        self.assertEqual(len(index.find("", 10)), 3)
+
+
+class TestRefreshingPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch.object(user_index, "USER_INDEX_BUCKET", "bucket")
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_load_in_background_and_reload_when_stale(self):
+        load = MagicMock(return_value=[("a", 1)])
+        index = RefreshingPrefixIndex("test", load)
+
+        with patch.object(user_index.threading, "Thread") as thread:
+            # Not loaded yet
+            self.assertIsNone(index.find("a", 10))
+            thread.assert_called_once_with(target=index.refresh, daemon=True)
+
+            index.refresh()
+            self.assertEqual(index.find("a", 10), [1])
+            thread.assert_called_once()
+
+            with patch.object(user_index, "USER_INDEX_REFRESH_SECONDS", 0.000001):
+                load.return_value = [("a", 1), ("ab", 2)]
+                index.find("a", 10)
+                self.assertEqual(thread.call_count, 2)
+                index.refresh()
+                self.assertEqual(index.find("a", 10), [1, 2])
+
+    def test_keep_previous_index_on_failure(self):
+        load = MagicMock(side_effect=[[("a", 1)], Exception("throttled")])
+        index = RefreshingPrefixIndex("test", load)
+
+        index.refresh()
+        index.refresh()
+
+        with patch.object(user_index.threading, "Thread"):
+            self.assertEqual(index.find("a", 10), [1])
+
+    def test_disabled_without_bucket(self):
+        load = MagicMock(return_value=[("a", 1)])
+        index = RefreshingPrefixIndex("test", load)
+
+        with patch.object(user_index, "USER_INDEX_BUCKET", ""):
+            self.assertIsNone(index.find("a", 10))
+        load.assert_not_called()
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        # Objects stored to the mocked bucket. Key: object key
+        self.objects: dict[str, bytes] = {}
+        self.mock_s3 = MagicMock()
+        self.mock_s3.put_object.side_effect = self._put_object
+        self.mock_s3.get_object.side_effect = self._get_object
+        self.client = MagicMock()
+        self.client.get_paginator.side_effect = lambda operation: MagicMock(
+            paginate=MagicMock(
+                return_value=(
+                    [
+                        {
+                            "Users": [
+                                _cognito_user(f"user{i}@example.com") for i in range(3)
+                            ]
+                            + [{"Username": "no-email", "Attributes": []}]
+                        }
+                    ]
+                    if operation == "list_users"
+                    else [{"Groups": [{"GroupName": "group1"}]}]
+                )
+            )
+        )
+        self.patchers = [
+            patch.object(user_index, "s3_client", self.mock_s3),
+            patch.object(user_index, "client", self.client),
+            patch.object(user_index, "USER_INDEX_BUCKET", "bucket"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def _put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body.encode("utf-8")
+
+    def _get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def test_load_built_snapshots(self):
+        # Not built yet
+        self.assertIsNone(user_index._load_users())
+
+        user_index.build_snapshots()
+        users = user_index._load_users()
+        self.assertEqual(
+            [email for email, _ in users],
+            [f"user{i}@example.com" for i in range(3)],
+        )
+        self.assertEqual(
+            user_index._load_groups(),
+            [("group1", UserGroup(name="group1", description=""))],
+        )
+        # Environments read the snapshots without listing Cognito
+        self.client.get_paginator.reset_mock()
+        user_index._load_users()
+        self.client.get_paginator.assert_not_called()
+
+    def test_too_many_users(self):
+        with patch.object(user_index, "USER_INDEX_MAX_USERS", 2):
+            user_index.build_snapshots()
+
+        self.assertIsNone(user_index._load_users())
+        self.assertEqual(len(user_index._load_groups()), 1)
+
+
+class TestSearchUsecases(unittest.TestCase):
+    @patch("app.usecases.user.find_users_by_email_prefix")
+    def test_search_user_from_index(self, find_users_by_email_prefix):
+        user = UserWithoutGroups(id="alice", name="alice", email="alice@example.com")
+        with patch.object(user_index.users_by_email_index, "find", return_value=[user]):
+            self.assertEqual(search_user_by_email_prefix("ali"), [user])
+        find_users_by_email_prefix.assert_not_called()
+
+    @patch("app.usecases.user.find_group_by_name_prefix")
+    def test_fall_back_to_cognito(self, find_group_by_name_prefix):
+        group = UserGroup(name="group1", description="")
+        find_group_by_name_prefix.return_value = [group]
+        with patch.object(user_index.groups_by_name_index, "find", return_value=None):
+            self.assertEqual(search_group_by_name_prefix("gro"), [group])
+        find_group_by_name_prefix.assert_called_once_with(prefix="gro")
+
+    @patch("app.usecases.user.find_users_by_email_prefix")
+    def test_search_user_missing_from_index(self, find_users_by_email_prefix):
+        # Created since the last snapshot
+        user = UserWithoutGroups(id="bob", name="bob", email="bob@example.com")
+        find_users_by_email_prefix.return_value = [user]
+        with patch.object(user_index.users_by_email_index, "find", return_value=[]):
+            self.assertEqual(search_user_by_email_prefix("bob"), [user])
+        find_users_by_email_prefix.assert_called_once_with(prefix="bob", limit=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import sys
+
+sys.path.append(".")
+import unittest
+
+from app.routes.schemas.conversation import TextContent
+from app.routes.schemas.published_api import (
+    BatchInput,
+    BatchItemInput,
+    ChatInputWithoutBotId,
+    MessageInputWithoutMessageId,
+)
+from pydantic import ValidationError
+
+
+def _item(conversation_id: str | None) -> BatchItemInput:
+    return BatchItemInput(
+        conversation_id=conversation_id,
+        message=MessageInputWithoutMessageId(
+            content=[TextContent(content_type="text", body="Hello")],
+            model="claude-v3.5-sonnet",
+        ),
+    )
+
+
+class TestBatchInput(unittest.TestCase):
+    def test_create_input_new_conversations(self):
+        obj = BatchInput(items=[_item(None), _item(None), _item("conversation1")])
+        self.assertEqual(len(obj.items), 3)
+
+    def test_create_input_duplicate_conversation_ids(self):
+        with self.assertRaises(ValidationError):
+            BatchInput(items=[_item("conversation1"), _item("conversation1")])
+
+
+class TestChatInputWithoutBotId(unittest.TestCase):
+    def test_reject_non_https_callback(self):
+        message = {
+            "content": [{"contentType": "text", "body": "Hello"}],
+            "model": "claude-v3.5-sonnet",
+        }
+        with self.assertRaises(ValidationError):
+            ChatInputWithoutBotId(message=message, callback_url="http://a.com/hook")  # type: ignore
+
+        chat_input = ChatInputWithoutBotId(message=message, callback_url="https://a.com/hook")  # type: ignore
+        self.assertEqual(chat_input.callback_url, "https://a.com/hook")
+
+    def test_reject_private_callback(self):
+        message = {
+            "content": [{"contentType": "text", "body": "Hello"}],
+            "model": "claude-v3.5-sonnet",
+        }
+        for url in [
+            "https://localhost/hook",
+            "https://127.0.0.1/hook",
+            "https://10.0.0.1/hook",
+            "https://169.254.169.254/latest/meta-data",
+            "https://[::1]/hook",
+            "https://[::ffff:192.168.0.1]/hook",
+        ]:
+            with self.subTest(url=url), self.assertRaises(ValidationError):
+                ChatInputWithoutBotId(message=message, callback_url=url)  # type: ignore
+
+
+if __name__ == "__main__":
+    unittest.main()
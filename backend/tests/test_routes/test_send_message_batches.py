@@ -0,0 +1,33 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+
+from app.routes.published_api import _send_message_batches
+
+
+class TestSendMessageBatches(unittest.TestCase):
+    @patch("app.routes.published_api.sqs_client")
+    def test_send_in_chunks(self, sqs_client):
+        sqs_client.send_message_batch.side_effect = [
+            {"Failed": [{"Id": "3", "Code": "InternalError", "Message": "failed"}]},
+            RuntimeError("throttled"),
+            {},
+        ]
+        bodies = ["small"] * 11 + ["x" * 200 * 1024, "y" * 200 * 1024]
+
+        errors = _send_message_batches(bodies)
+
+        self.assertEqual(
+            [
+                len(call.kwargs["Entries"])
+                for call in sqs_client.send_message_batch.call_args_list
+            ],
+            [10, 2, 1],
+        )
+        self.assertEqual(errors, {3: "failed", 10: "throttled", 11: "throttled"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import json
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.routes.schemas.conversation import ChatInput, MessageInput, TextContent
+from app.sqs_consumer import DEADLINE_MARGIN_MILLISECONDS, handler, process_record
+
+
+class TestSqsConsumer(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = []
+
+        def process_record(record: dict):
+            self.started.append(record["messageId"])
+            if record["body"] == "fail":
+                raise ValueError("invalid message")
+            if record["body"] == "slow":
+                self.release.wait(5)
+
+        self.patch = patch("app.sqs_consumer.process_record", process_record)
+        self.patch.start()
+
+        self.context = MagicMock()
+        self.context.get_remaining_time_in_millis.return_value = (
+            DEADLINE_MARGIN_MILLISECONDS + 200
+        )
+
+    def tearDown(self):
+        self.release.set()
+        self.patch.stop()
+
+    def _event(self, *bodies: str, receive_count: int = 1) -> dict:
+        return {
+            "Records": [
+                {
+                    "messageId": f"message{i}",
+                    "body": body,
+                    "attributes": {"ApproximateReceiveCount": str(receive_count)},
+                }
+                for i, body in enumerate(bodies)
+            ]
+        }
+
+    def test_report_failed_records_only(self):
+        result = handler(self._event("ok", "fail", "ok"), self.context)
+
+        self.assertEqual(
+            result, {"batchItemFailures": [{"itemIdentifier": "message1"}]}
+        )
+        self.assertCountEqual(self.started, ["message0", "message1", "message2"])
+
+    def test_report_records_not_completed_before_deadline(self):
+        with patch("app.sqs_consumer.SQS_CONSUMER_MAX_WORKERS", 1):
+            result = handler(self._event("slow", "ok"), self.context)
+
+        self.assertCountEqual(
+            result["batchItemFailures"],
+            [{"itemIdentifier": "message0"}, {"itemIdentifier": "message1"}],
+        )
+        # The record waiting for a worker is not started after the deadline
+        self.release.set()
+        self.assertEqual(self.started, ["message0"])
+
+    @patch("app.sqs_consumer.fail_record")
+    def test_fail_records_not_completed_on_last_receive(self, fail_record):
+        with patch("app.sqs_consumer.SQS_CONSUMER_MAX_WORKERS", 1):
+            handler(self._event("slow", "ok"), self.context)
+        fail_record.assert_not_called()
+
+        with patch("app.sqs_consumer.SQS_CONSUMER_MAX_WORKERS", 1):
+            handler(self._event("slow", "ok", receive_count=2), self.context)
+        # Both the running record and the one not started are moved to the dead-letter queue
+        self.assertCountEqual(
+            [call.args[0]["messageId"] for call in fail_record.call_args_list],
+            ["message0", "message1"],
+        )
+
+
+class TestProcessRecord(unittest.TestCase):
+    def _record(self, receive_count: int, batch_id: str | None = None) -> dict:
+        chat_input = ChatInput(
+            conversation_id="conversation1",
+            message=MessageInput(
+                role="user",
+                content=[TextContent(content_type="text", body="Hello")],
+                model="claude-v3.5-sonnet",
+                parent_message_id=None,
+                message_id="message1",
+            ),
+            bot_id="bot1",
+        )
+        body = json.loads(chat_input.model_dump_json())
+        if batch_id is not None:
+            body["batchId"] = batch_id
+        return {
+            "messageId": "sqs1",
+            "body": json.dumps(body),
+            "attributes": {"ApproximateReceiveCount": str(receive_count)},
+        }
+
+    def setUp(self):
+        self.patches = [
+            patch("app.sqs_consumer.start_message", return_value=True),
+            patch("app.sqs_consumer.abort_message"),
+            patch("app.sqs_consumer.complete_batch_item"),
+        ]
+        self.start_message, self.abort_message, self.complete_batch_item = (
+            p.start() for p in self.patches
+        )
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    @patch("app.sqs_consumer.complete_message")
+    @patch("app.sqs_consumer.chat_output_from_message")
+    @patch("app.sqs_consumer.chat")
+    def test_store_result(self, chat, chat_output_from_message, complete_message):
+        chat.return_value = (MagicMock(), MagicMock())
+        chat_output_from_message.return_value.conversation_id = "conversation1"
+
+        process_record(self._record(1))
+
+        complete_message.assert_called_once_with(
+            user_id="PUBLISHED_API#bot1",
+            conversation_id="conversation1",
+            message_id="message1",
+            output=chat_output_from_message.return_value.message,
+        )
+
+    @patch("app.sqs_consumer.complete_message")
+    @patch("app.sqs_consumer.chat")
+    def test_store_failure_on_last_attempt(self, chat, complete_message):
+        chat.side_effect = RuntimeError("throttled")
+
+        with self.assertRaises(RuntimeError):
+            process_record(self._record(1))
+        complete_message.assert_not_called()
+        # Unlocked to be processed again
+        self.abort_message.assert_called_once_with("PUBLISHED_API#bot1", "message1")
+
+        with self.assertRaises(RuntimeError):
+            process_record(self._record(2))
+        self.assertEqual(complete_message.call_args.kwargs["error"], "throttled")
+
+    @patch("app.sqs_consumer.complete_message")
+    @patch("app.sqs_consumer.chat")
+    def test_skip_duplicate(self, chat, complete_message):
+        self.start_message.return_value = False
+
+        process_record(self._record(2))
+
+        chat.assert_not_called()
+        complete_message.assert_not_called()
+
+    @patch("app.sqs_consumer.complete_message")
+    @patch("app.sqs_consumer.chat_output_from_message")
+    @patch("app.sqs_consumer.chat")
+    def test_complete_batch_item(self, chat, chat_output_from_message, _):
+        chat.return_value = (MagicMock(), MagicMock())
+
+        process_record(self._record(1, batch_id="batch1"))
+        self.complete_batch_item.assert_called_once_with(
+            "PUBLISHED_API#bot1", "batch1", "message1", succeeded=True
+        )
+
+        chat.side_effect = RuntimeError("throttled")
+        with self.assertRaises(RuntimeError):
+            process_record(self._record(2, batch_id="batch1"))
+        self.complete_batch_item.assert_called_with(
+            "PUBLISHED_API#bot1", "batch1", "message1", succeeded=False
+        )
+
+    @patch("app.sqs_consumer.complete_message")
+    def test_fail_invalid_record_on_last_receive(self, complete_message):
+        record = self._record(1, batch_id="batch1")
+        body = json.loads(record["body"])
+        del body["message"]["role"]
+        record["body"] = json.dumps(body)
+
+        with self.assertRaises(ValueError):
+            process_record(record)
+        complete_message.assert_not_called()
+
+        record["attributes"]["ApproximateReceiveCount"] = "2"
+        with self.assertRaises(ValueError):
+            process_record(record)
+        self.assertEqual(complete_message.call_args.kwargs["message_id"], "message1")
+        self.assertIn("Invalid request", complete_message.call_args.kwargs["error"])
+        self.complete_batch_item.assert_called_once_with(
+            "PUBLISHED_API#bot1", "batch1", "message1", succeeded=False
+        )
+
+        # Records which cannot be identified are left to the dead-letter queue
+        complete_message.reset_mock()
+        with self.assertRaises(ValueError):
+            process_record({**record, "body": "not json"})
+        complete_message.assert_not_called()
+
+    @patch("app.sqs_consumer.fetch_message_result")
+    @patch("app.sqs_consumer.chat")
+    def test_complete_batch_item_again_on_duplicate(self, chat, fetch_message_result):
+        self.start_message.return_value = False
+        fetch_message_result.return_value.status = "SUCCEEDED"
+
+        process_record(self._record(2, batch_id="batch1"))
+
+        chat.assert_not_called()
+        self.complete_batch_item.assert_called_once_with(
+            "PUBLISHED_API#bot1", "batch1", "message1", succeeded=True
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
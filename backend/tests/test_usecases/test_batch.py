@@ -0,0 +1,113 @@
+import json
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.repositories.models.batch import BatchItemModel, BatchModel
+from app.repositories.models.message_result import MessageResultModel
+from app.usecases.batch import complete_batch_item, fetch_batch
+
+
+def _batch(**kwargs) -> BatchModel:
+    return BatchModel(
+        **{
+            "id": "batch1",
+            "total": 3,
+            "create_time": 1,
+            "complete_time": None,
+            "succeeded": 0,
+            "failed": 0,
+            "result_path": None,
+            **kwargs,
+        }
+    )
+
+
+def _items() -> list[BatchItemModel]:
+    return [
+        BatchItemModel(
+            custom_id=f"note{i}",
+            conversation_id=f"conversation{i}",
+            message_id=f"message{i}",
+        )
+        for i in range(3)
+    ]
+
+
+def _result(message_id: str, status: str) -> MessageResultModel:
+    return MessageResultModel(
+        message_id=message_id,
+        conversation_id=message_id.replace("message", "conversation"),
+        status=status,  # type: ignore
+        create_time=1,
+        complete_time=2,
+        output=None,
+        error="throttled" if status == "FAILED" else None,
+        callback_url=None,
+    )
+
+
+class TestCompleteBatchItem(unittest.TestCase):
+    @patch("app.usecases.batch.store_batch_results")
+    @patch("app.usecases.batch.add_batch_completion")
+    def test_store_results_only_when_all_items_completed(
+        self, add_batch_completion, store_batch_results
+    ):
+        add_batch_completion.return_value = _batch(succeeded=1, failed=1)
+
+        complete_batch_item("user1", "batch1", "message1", succeeded=False)
+        store_batch_results.assert_not_called()
+
+    @patch("app.usecases.batch.store_batch_results")
+    @patch("app.usecases.batch.find_message_results")
+    @patch("app.usecases.batch.find_batch_items", return_value=_items())
+    @patch("app.usecases.batch.add_batch_completion")
+    def test_store_results_in_request_order(
+        self, add_batch_completion, _, find_message_results, store_batch_results
+    ):
+        add_batch_completion.return_value = _batch(succeeded=2, failed=1)
+        # message2 is expired or lost
+        find_message_results.return_value = {
+            "message1": _result("message1", "FAILED"),
+            "message0": _result("message0", "SUCCEEDED"),
+        }
+
+        complete_batch_item("user1", "batch1", "message2", succeeded=True)
+
+        lines = [json.loads(line) for line in store_batch_results.call_args.args[2]]
+        self.assertEqual(
+            [line["customId"] for line in lines], ["note0", "note1", "note2"]
+        )
+        self.assertEqual(
+            [line["status"] for line in lines], ["SUCCEEDED", "FAILED", "FAILED"]
+        )
+        self.assertEqual(lines[1]["error"], "throttled")
+        self.assertEqual(lines[2]["messageId"], "message2")
+
+    @patch("app.usecases.batch.store_batch_results")
+    @patch("app.usecases.batch.add_batch_completion")
+    def test_not_store_results_again(self, add_batch_completion, store_batch_results):
+        add_batch_completion.return_value = _batch(
+            succeeded=3, result_path="batch_results/user1/batch1.jsonl"
+        )
+
+        complete_batch_item("user1", "batch1", "message2", succeeded=True)
+        store_batch_results.assert_not_called()
+
+
+class TestFetchBatch(unittest.TestCase):
+    @patch("app.usecases.batch.find_batch")
+    def test_running_batch(self, find_batch):
+        find_batch.return_value = _batch(succeeded=1, failed=1)
+
+        output = fetch_batch("user1", "batch1")
+
+        self.assertEqual(output.status, "RUNNING")
+        self.assertEqual((output.total, output.succeeded, output.failed), (3, 1, 1))
+        self.assertIsNone(output.result_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
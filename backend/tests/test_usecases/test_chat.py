@@ -8,12 +8,16 @@ os.environ["ENABLE_BEDROCK_CROSS_REGION_INFERENCE"] = "true"
 
 sys.path.insert(0, ".")
 import unittest
+import time
 from pprint import pprint
+from concurrent.futures import wait
+from unittest.mock import MagicMock, patch
 
 import boto3
 from app.agents.tools.agent_tool import ToolRunResult
 from app.prompt import build_rag_prompt
 from app.repositories.conversation import (
+    RecordNotFoundError,
     delete_conversation_by_id,
     delete_conversation_by_user_id,
     find_conversation_by_id,
@@ -46,7 +50,11 @@ from app.usecases.chat import (
     chat,
     chat_output_from_message,
     fetch_conversation,
+    prefetch_conversation_and_bot,
+    prepare_conversation,
     propose_conversation_title,
+    start_post_response_tasks,
+    start_speculative_search,
     trace_to_root,
 )
 from app.vector_search import SearchResult
@@ -182,6 +190,164 @@ class TestTraceToRoot(unittest.TestCase):
         self.assertEqual(messages[4].content[0].body, "user_3b")
 
 
+class TestSpeculativeSearch(unittest.TestCase):
+    def setUp(self):
+        self.user = create_test_user("user1")
+        self.bot = create_test_private_bot(
+            "bot1", False, "user1", set_dummy_knowledge=True
+        )
+
+    def _chat_input(self, model: type_model_name, bot_id: str | None = "bot1"):
+        return ChatInput(
+            conversation_id="conv1",
+            message=MessageInput(
+                role="user",
+                content=[TextContent(content_type="text", body="What is ramen?")],
+                model=model,
+                parent_message_id=None,
+                message_id=None,
+            ),
+            bot_id=bot_id,
+            continue_generate=False,
+        )
+
+    @patch("app.usecases.chat.search_related_docs")
+    @patch("app.usecases.chat.fetch_bot")
+    def test_start_speculative_search(self, mock_fetch_bot, mock_search_related_docs):
+        mock_fetch_bot.return_value = (True, self.bot)
+        mock_search_related_docs.return_value = ["result"]
+
+        speculation = start_speculative_search(
+            self.user, self._chat_input("deepseek-r1")
+        )
+        assert speculation is not None
+        bot_future, search_future = speculation
+        self.assertEqual(bot_future.result(), (True, self.bot))
+        self.assertEqual(search_future.result(), ["result"])
+        mock_search_related_docs.assert_called_once_with(
+            bot=self.bot, query="What is ramen?"
+        )
+
+    def test_no_speculative_search(self):
+        # Agent mode searches knowledge as a tool
+        self.assertIsNone(start_speculative_search(self.user, self._chat_input(MODEL)))
+        # No bot
+        self.assertIsNone(
+            start_speculative_search(
+                self.user, self._chat_input("deepseek-r1", bot_id=None)
+            )
+        )
+
+
+class TestPrefetchConversationAndBot(unittest.TestCase):
+    def setUp(self):
+        self.user = create_test_user("user1")
+        self.bot = create_test_private_bot("bot1", False, "user1")
+        self.chat_input = ChatInput(
+            conversation_id="conv1",
+            message=MessageInput(
+                role="user",
+                content=[TextContent(content_type="text", body="Hello")],
+                model=MODEL,
+                parent_message_id=None,
+                message_id=None,
+            ),
+            bot_id="bot1",
+            continue_generate=False,
+        )
+
+    @patch("app.usecases.chat.fetch_bot")
+    @patch("app.usecases.chat.find_conversation_by_id")
+    def test_new_conversation(self, mock_find_conversation_by_id, mock_fetch_bot):
+        mock_find_conversation_by_id.side_effect = RecordNotFoundError()
+        mock_fetch_bot.return_value = (True, self.bot)
+
+        conversation, fetched_bot = prefetch_conversation_and_bot(
+            self.user, self.chat_input
+        )
+        self.assertIsNone(conversation)
+        self.assertEqual(fetched_bot, (True, self.bot))
+
+    @patch("app.usecases.chat.fetch_bot")
+    @patch("app.usecases.chat.find_conversation_by_id")
+    def test_short_circuit_on_bot_error(
+        self, mock_find_conversation_by_id, mock_fetch_bot
+    ):
+        mock_find_conversation_by_id.side_effect = lambda *args: time.sleep(1)
+        mock_fetch_bot.side_effect = PermissionError()
+
+        start = time.perf_counter()
+        with self.assertRaises(PermissionError):
+            prefetch_conversation_and_bot(self.user, self.chat_input)
+        # Not waiting for the conversation
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+class TestSharedBotAlias(unittest.TestCase):
+    def setUp(self):
+        self.user = create_test_user("user1")
+        self.bot = create_test_private_bot("bot1", False, "user2")
+        self.chat_input = ChatInput(
+            conversation_id="conv1",
+            message=MessageInput(
+                role="user",
+                content=[TextContent(content_type="text", body="Hello")],
+                model=MODEL,
+                parent_message_id=None,
+                message_id=None,
+            ),
+            bot_id="bot1",
+            continue_generate=False,
+        )
+
+    @patch("app.usecases.chat.store_alias")
+    @patch("app.usecases.chat.alias_exists")
+    @patch("app.usecases.chat.fetch_bot")
+    @patch("app.usecases.chat.find_conversation_by_id")
+    def test_create_alias_on_first_message(
+        self,
+        mock_find_conversation_by_id,
+        mock_fetch_bot,
+        mock_alias_exists,
+        mock_store_alias,
+    ):
+        mock_find_conversation_by_id.side_effect = RecordNotFoundError()
+        mock_fetch_bot.return_value = (False, self.bot)
+
+        mock_alias_exists.return_value = False
+        prepare_conversation(self.user, self.chat_input)
+        mock_alias_exists.assert_called_once_with("user1", "bot1")
+        self.assertEqual(mock_store_alias.call_args.args[0], "user1")
+
+        # Not created again
+        mock_store_alias.reset_mock()
+        mock_alias_exists.return_value = True
+        prepare_conversation(self.user, self.chat_input)
+        mock_store_alias.assert_not_called()
+
+
+class TestPostResponseTasks(unittest.TestCase):
+    @patch("app.usecases.chat.POST_RESPONSE_TASK_DELAY", 0)
+    @patch("app.usecases.chat.emit_metric")
+    def test_retry_and_emit_failure(self, mock_emit_metric):
+        flaky_task = MagicMock(side_effect=[Exception("throttled"), None])
+        failing_task = MagicMock(side_effect=Exception("failed"))
+
+        futures = start_post_response_tasks(
+            {"flaky_task": flaky_task, "failing_task": failing_task}
+        )
+        wait(futures)
+
+        # Failures never propagate to the chat
+        for future in futures:
+            self.assertIsNone(future.exception())
+        self.assertEqual(flaky_task.call_count, 2)
+        self.assertEqual(failing_task.call_count, 3)
+        mock_emit_metric.assert_called_once_with(
+            "PostResponseTaskFailure", 1, Task="failing_task"
+        )
+
+
 class TestStartChat(unittest.TestCase):
     user = create_test_user("user1")
 
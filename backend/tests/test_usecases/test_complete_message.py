@@ -0,0 +1,180 @@
+import hashlib
+import hmac
+import socket
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+import requests
+from app.repositories.models.message_result import MessageResultModel
+from app.routes.schemas.conversation import MessageOutput, TextContent
+from app.usecases import message_result
+from app.usecases.message_result import complete_message, reserve_request
+from botocore.exceptions import ClientError
+
+
+def _result(**kwargs) -> MessageResultModel:
+    return MessageResultModel(
+        **{
+            "message_id": "message1",
+            "conversation_id": "conversation1",
+            "status": "SUCCEEDED",
+            "create_time": 1,
+            "complete_time": 2,
+            "output": None,
+            "error": None,
+            "callback_url": None,
+            **kwargs,
+        }
+    )
+
+
+def _output() -> MessageOutput:
+    return MessageOutput(
+        role="assistant",
+        content=[TextContent(content_type="text", body="Hello")],
+        model="claude-v3.5-sonnet",
+        children=[],
+        parent="message1",
+        feedback=None,
+        used_chunks=None,
+        thinking_log=None,
+    )
+
+
+class TestReserveRequest(unittest.TestCase):
+    def setUp(self):
+        self.table = MagicMock()
+        self.items: dict[str, dict] = {}
+
+        def put_item(Item, **kwargs):
+            if Item["SK"] in self.items:
+                raise ClientError(
+                    {"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem"
+                )
+            self.items[Item["SK"]] = Item
+
+        self.table.put_item.side_effect = put_item
+        self.table.get_item.side_effect = lambda Key, **kwargs: {
+            "Item": self.items[Key["SK"]]
+        }
+        self.patch = patch(
+            "app.repositories.idempotency.get_conversation_table_client",
+            return_value=self.table,
+        )
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_return_previous_response(self):
+        self.assertIsNone(reserve_request("user1", "key1", "conversation1", "message1"))
+
+        previous = reserve_request("user1", "key1", "conversation1", "message2")
+        self.assertEqual(previous.message_id, "message1")  # type: ignore
+
+        # Other keys are not affected
+        self.assertIsNone(reserve_request("user1", "key2", "conversation1", "message3"))
+        self.assertTrue(
+            all(sk.startswith("user1#IDEMPOTENCY#") for sk in self.items.keys())
+        )
+
+
+def _addresses(*addresses: str):
+    return [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0))
+        for address in addresses
+    ]
+
+
+class TestCompleteMessage(unittest.TestCase):
+    def setUp(self):
+        self.patch = patch(
+            "socket.getaddrinfo", return_value=_addresses("93.184.215.14")
+        )
+        self.getaddrinfo = self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    @patch("app.usecases.message_result.requests.post")
+    @patch("app.usecases.message_result.complete_message_result")
+    def test_store_output_without_callback(self, complete, post):
+        def complete_message_result(**kwargs):
+            return _result(output=kwargs["output"])
+
+        complete.side_effect = complete_message_result
+
+        result = complete_message("user1", "conversation1", "message1", _output())
+
+        self.assertEqual(complete.call_args.kwargs["status"], "SUCCEEDED")
+        self.assertEqual(result.message.content[0].body, "Hello")  # type: ignore
+        post.assert_not_called()
+
+    @patch("time.sleep")
+    @patch("app.usecases.message_result.requests.post")
+    @patch("app.usecases.message_result.complete_message_result")
+    def test_retry_callback(self, complete, post, _):
+        complete.return_value = _result(
+            status="FAILED", error="throttled", callback_url="https://a.com/hook"
+        )
+        post.side_effect = [
+            requests.ConnectionError("refused"),
+            MagicMock(status_code=503),
+            MagicMock(status_code=200, ok=True),
+        ]
+
+        result = complete_message(
+            "user1", "conversation1", "message1", error="throttled"
+        )
+
+        self.assertEqual(complete.call_args.kwargs["status"], "FAILED")
+        self.assertEqual(post.call_count, 3)
+        self.assertIn(b'"status":"FAILED"', post.call_args.kwargs["data"])
+        self.assertEqual(result.error, "throttled")
+
+    @patch("time.sleep")
+    @patch("app.usecases.message_result.requests.post")
+    @patch("app.usecases.message_result.complete_message_result")
+    def test_callback_failure_is_not_raised(self, complete, post, _):
+        complete.return_value = _result(callback_url="https://a.com/hook")
+        post.side_effect = requests.ConnectionError("refused")
+
+        complete_message("user1", "conversation1", "message1", _output())
+        self.assertEqual(post.call_count, 3)
+
+    @patch("app.usecases.message_result.requests.post")
+    @patch("app.usecases.message_result.complete_message_result")
+    def test_skip_callback_resolved_to_private_address(self, complete, post):
+        complete.return_value = _result(callback_url="https://a.com/hook")
+        self.getaddrinfo.return_value = _addresses("93.184.215.14", "169.254.169.254")
+
+        complete_message("user1", "conversation1", "message1", _output())
+        post.assert_not_called()
+
+    @patch("app.usecases.message_result.requests.post")
+    @patch("app.usecases.message_result.complete_message_result")
+    def test_sign_callback(self, complete, post):
+        complete.return_value = _result(callback_url="https://a.com/hook")
+        post.return_value = MagicMock(status_code=200, ok=True)
+
+        with patch.object(
+            message_result, "_get_callback_signing_secret", return_value="secret"
+        ):
+            complete_message("user1", "conversation1", "message1", _output())
+
+        kwargs = post.call_args.kwargs
+        headers = kwargs["headers"]
+        expected = hmac.new(
+            b"secret",
+            headers["X-Signature-Timestamp"].encode() + b"." + kwargs["data"],
+            hashlib.sha256,
+        ).hexdigest()
+        self.assertEqual(headers["X-Signature"], f"sha256={expected}")
+        self.assertFalse(kwargs["allow_redirects"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+from app.usecases.bot_store import fetch_pickup_bots, fetch_popular_bots
+from tests.test_usecases.utils.user_factory import create_test_user
+
+
+def _source(bot_id: str, owner_user_id: str, usage_count: int, scope="all") -> dict:
+    return {
+        "PK": owner_user_id,
+        "SK": f"BOT#{bot_id}",
+        "BotId": bot_id,
+        "Title": f"Bot {bot_id}",
+        "Description": "",
+        "CreateTime": 1,
+        "SyncStatus": "SUCCEEDED",
+        "SharedScope": scope,
+        "SharedStatus": "shared",
+        "UsageStats": {"usage_count": usage_count},
+    }
+
+
+class TestBotStoreFeeds(unittest.TestCase):
+    def setUp(self):
+        self.user = create_test_user("user1")
+        self.feed = [
+            _source("public1", "user2", 30),
+            _source("public2", "user2", 10),
+        ]
+        self.non_public = [_source("partial1", "user1", 20, scope="partial")]
+
+    @patch("app.usecases.bot_store.find_bots_sorted_by_usage_count")
+    @patch("app.usecases.bot_store.find_non_public_bot_sources")
+    @patch("app.usecases.bot_store.find_feed")
+    def test_popular_bots_from_feed(
+        self, mock_find_feed, mock_find_non_public, mock_find_sorted
+    ):
+        mock_find_feed.return_value = self.feed
+        mock_find_non_public.return_value = self.non_public
+
+        bots = fetch_popular_bots(self.user, limit=2)
+        self.assertEqual([bot.id for bot in bots], ["public1", "partial1"])
+        self.assertTrue(bots[1].owned)
+        self.assertFalse(bots[0].owned)
+        # No per-user scripted query
+        mock_find_sorted.assert_not_called()
+
+    @patch("app.usecases.bot_store.find_bots_sorted_by_usage_count")
+    @patch("app.usecases.bot_store.find_feed")
+    def test_popular_bots_without_feed(self, mock_find_feed, mock_find_sorted):
+        mock_find_feed.return_value = None
+        mock_find_sorted.return_value = []
+
+        fetch_popular_bots(self.user, limit=2)
+        mock_find_sorted.assert_called_once()
+
+    @patch("app.usecases.bot_store.find_non_public_bot_sources")
+    @patch("app.usecases.bot_store.find_feed")
+    def test_pickup_bots_from_feed(self, mock_find_feed, mock_find_non_public):
+        mock_find_feed.return_value = self.feed
+        mock_find_non_public.return_value = self.non_public
+
+        bots = fetch_pickup_bots(self.user, limit=2)
+        self.assertEqual(len(bots), 2)
+        self.assertTrue({bot.id for bot in bots} <= {"public1", "public2", "partial1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
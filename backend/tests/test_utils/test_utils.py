@@ -40,5 +40,28 @@ class TestUtils(unittest.TestCase):
         assert reg == "us-west-2"
 
 
+class TestTTLCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        from app.utils import TTLCache
+
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        # "b" is the least recently used
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats() == {"hits": 3, "misses": 1, "size": 2}
+
+    def test_expiration(self):
+        from app.utils import TTLCache
+
+        cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl_seconds=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
 if __name__ == "__main__":
     unittest.main()
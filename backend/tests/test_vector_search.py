@@ -0,0 +1,164 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.append(".")
+from app.utils import get_current_time
+from app.vector_search import (
+    SearchResult,
+    fuse_search_results,
+    get_retrieval_cache_stats,
+    invalidate_retrieval_cache,
+    search_related_docs,
+)
+from tests.test_repositories.utils.bot_factory import create_test_private_bot
+
+
+class TestRetrievalCache(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("app.vector_search.agent_client")
+        self.mock_agent_client = self.patcher.start()
+        self.mock_agent_client.retrieve.return_value = {
+            "retrievalResults": [
+                {
+                    "content": {"text": "Ramen is a Japanese noodle dish."},
+                    "location": {
+                        "type": "S3",
+                        "s3Location": {"uri": "s3://bucket/Ramen.pdf"},
+                    },
+                    "metadata": {"x-amz-bedrock-kb-document-page-number": 1.0},
+                }
+            ]
+        }
+        invalidate_retrieval_cache()
+        self.bot = create_test_private_bot(
+            "bot1", False, "user1", set_dummy_knowledge=True
+        )
+
+    def tearDown(self):
+        self.patcher.stop()
+        invalidate_retrieval_cache()
+
+    def test_cache_hit(self):
+        before = get_retrieval_cache_stats()
+        results = search_related_docs(self.bot, "What is ramen?")
+        # Normalized query hits the cache
+        cached_results = search_related_docs(self.bot, "  what is   RAMEN? ")
+
+        self.assertEqual(self.mock_agent_client.retrieve.call_count, 1)
+        self.assertEqual(results, cached_results)
+        self.assertEqual(results[0]["source_name"], "Ramen.pdf")
+        self.assertEqual(results[0]["page_number"], 1)
+
+        stats = get_retrieval_cache_stats()
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertEqual(stats["misses"] - before["misses"], 1)
+
+    def test_invalidate_on_sync(self):
+        search_related_docs(self.bot, "What is ramen?")
+
+        # Knowledge base is synced after the result was cached
+        self.bot.sync_completed_time = get_current_time() + 1
+        search_related_docs(self.bot, "What is ramen?")
+        self.assertEqual(self.mock_agent_client.retrieve.call_count, 2)
+
+    def test_invalidate_knowledge_base(self):
+        search_related_docs(self.bot, "What is ramen?")
+        invalidate_retrieval_cache("test-knowledge-base-id")
+        search_related_docs(self.bot, "What is ramen?")
+        self.assertEqual(self.mock_agent_client.retrieve.call_count, 2)
+
+
+def _retrieval_result(text: str, uri: str) -> dict:
+    return {
+        "content": {"text": text},
+        "location": {"type": "S3", "s3Location": {"uri": uri}},
+        "metadata": {},
+    }
+
+
+class TestMultiKnowledgeBaseSearch(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("app.vector_search.agent_client")
+        self.mock_agent_client = self.patcher.start()
+        invalidate_retrieval_cache()
+        self.bot = create_test_private_bot(
+            "bot1", False, "user1", set_dummy_knowledge=True
+        )
+        assert self.bot.bedrock_knowledge_base is not None
+        self.bot.bedrock_knowledge_base.shared_knowledge_base_ids = [
+            "shared-knowledge-base-id"
+        ]
+
+    def tearDown(self):
+        self.patcher.stop()
+        invalidate_retrieval_cache()
+
+    def test_search_all_knowledge_bases(self):
+        def retrieve(knowledgeBaseId, retrievalQuery, **kwargs):
+            if knowledgeBaseId == "shared-knowledge-base-id":
+                return {
+                    "retrievalResults": [
+                        _retrieval_result("Sushi", "s3://bucket/Sushi.pdf"),
+                        _retrieval_result("Ramen", "s3://bucket/Ramen.pdf"),
+                    ]
+                }
+            return {
+                "retrievalResults": [
+                    _retrieval_result("Ramen", "s3://bucket/Ramen.pdf"),
+                    _retrieval_result("Udon", "s3://bucket/Udon.pdf"),
+                ]
+            }
+
+        self.mock_agent_client.retrieve.side_effect = retrieve
+
+        results = search_related_docs(
+            self.bot, "noodles", reformulated_queries=["Japanese noodles"]
+        )
+
+        # 2 knowledge bases x 2 queries
+        self.assertEqual(self.mock_agent_client.retrieve.call_count, 4)
+        # Ramen is found by all searches, so it is ranked first and not duplicated
+        self.assertEqual([r["content"] for r in results], ["Ramen", "Sushi", "Udon"])
+        self.assertEqual([r["rank"] for r in results], [0, 1, 2])
+
+
+class TestFuseSearchResults(unittest.TestCase):
+    def _result(
+        self, content: str, rank: int, source: str | None = None
+    ) -> SearchResult:
+        return SearchResult(
+            bot_id="bot1",
+            content=content,
+            source_name=source or content,
+            source_link=source or content,
+            rank=rank,
+            metadata={},
+            page_number=None,
+        )
+
+    def test_fuse(self):
+        fused = fuse_search_results(
+            [
+                [self._result("a", 0), self._result("b", 1), self._result("c", 2)],
+                [self._result("c", 0), self._result("b", 1)],
+            ],
+            limit=2,
+        )
+        self.assertEqual([r["content"] for r in fused], ["c", "b"])
+
+    def test_deduplicate_by_source(self):
+        fused = fuse_search_results(
+            [
+                [self._result("a1", 0, "a"), self._result("b", 1)],
+                [self._result("b", 0), self._result("a2", 1, "a")],
+                [self._result("a3", 0, "a")],
+            ],
+            limit=10,
+        )
+        # Chunks of the same source are merged into its best ranked chunk
+        self.assertEqual([r["content"] for r in fused], ["a1", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
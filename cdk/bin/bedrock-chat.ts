@@ -89,6 +89,7 @@ const chat = new BedrockAIAssistantStack(
     enableRagReplicas: params.enableRagReplicas,
     enableBedrockCrossRegionInference: params.enableBedrockCrossRegionInference,
     enableLambdaSnapStart: params.enableLambdaSnapStart,
+    enablePublishedBotIndex: params.enablePublishedBotIndex,
     alternateDomainName: params.alternateDomainName,
     hostedZoneId: params.hostedZoneId,
     enableBotStore: params.enableBotStore,
@@ -11,6 +11,7 @@ import * as wafv2 from "aws-cdk-lib/aws-wafv2";
 import * as sqs from "aws-cdk-lib/aws-sqs";
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as logs from "aws-cdk-lib/aws-logs";
+import * as secretsmanager from "aws-cdk-lib/aws-secretsmanager";
 import { excludeDockerImage } from "./constants/docker";
 
 interface ApiPublishmentStackProps extends StackProps {
@@ -41,10 +42,13 @@ export class ApiPublishmentStack extends Stack {
     const chatQueueDLQ = new sqs.Queue(this, "ChatQueueDlq", {
       retentionPeriod: cdk.Duration.days(14),
     });
+    const chatQueueMaxReceiveCount = 2; // one retry
+    // Records delivered to one invocation of the SQS consumer
+    const chatQueueBatchSize = 10;
     const chatQueue = new sqs.Queue(this, "ChatQueue", {
       visibilityTimeout: cdk.Duration.minutes(30),
       deadLetterQueue: {
-        maxReceiveCount: 2, // one retry
+        maxReceiveCount: chatQueueMaxReceiveCount,
         queue: chatQueueDLQ,
       },
     });
@@ -77,6 +81,18 @@ export class ApiPublishmentStack extends Stack {
     );
     largeMessageBucket.grantReadWrite(handlerRole);
 
+    // Requests to callback URLs are signed with this secret, so that receivers can verify them
+    const callbackSigningSecret = new secretsmanager.Secret(
+      this,
+      "CallbackSigningSecret",
+      {
+        generateSecretString: {
+          passwordLength: 64,
+          excludePunctuation: true,
+        },
+      }
+    );
+
     // Handler for FastAPI
     const apiHandler = new DockerImageFunction(this, "ApiHandler", {
       code: DockerImageCode.fromImageAsset(
@@ -136,14 +152,30 @@ export class ApiPublishmentStack extends Stack {
           ENABLE_BEDROCK_CROSS_REGION_INFERENCE: props.enableBedrockCrossRegionInference.toString(),
           BEDROCK_REGION: props.bedrockRegion,
           TABLE_ACCESS_ROLE_ARN: props.tableAccessRoleArn,
+          // Results of `POST /batch` are written to the bucket
+          LARGE_MESSAGE_BUCKET: props.largeMessageBucketName,
+          CHAT_QUEUE_MAX_RECEIVE_COUNT: chatQueueMaxReceiveCount.toString(),
+          // Records of a batch are chatted concurrently, each running two steps at once on the shared executor
+          SQS_CONSUMER_MAX_WORKERS: chatQueueBatchSize.toString(),
+          CHAT_EXECUTOR_MAX_WORKERS: (chatQueueBatchSize * 2).toString(),
+          CALLBACK_SIGNING_SECRET_ARN: callbackSigningSecret.secretArn,
         },
         role: handlerRole,
         logRetention: logs.RetentionDays.THREE_MONTHS,
       }
     );
     sqsConsumeHandler.addEventSource(
-      new lambdaEventSources.SqsEventSource(chatQueue)
+      new lambdaEventSources.SqsEventSource(chatQueue, {
+        // Records in a batch are processed concurrently by the handler
+        batchSize: chatQueueBatchSize,
+        maxBatchingWindow: cdk.Duration.seconds(1),
+        // Only failed records are delivered again
+        reportBatchItemFailures: true,
+        // Bound concurrent invocations so that large batches do not exhaust Bedrock quotas
+        maxConcurrency: 10,
+      })
     );
+    callbackSigningSecret.grantRead(sqsConsumeHandler);
     chatQueue.grantSendMessages(apiHandler);
     chatQueue.grantConsumeMessages(sqsConsumeHandler);
 
@@ -196,5 +228,8 @@ export class ApiPublishmentStack extends Stack {
     new CfnOutput(this, "DeploymentStage", {
       value: deploymentStage,
     });
+    new CfnOutput(this, "CallbackSigningSecretArn", {
+      value: callbackSigningSecret.secretArn,
+    });
   }
 }
@@ -28,6 +28,9 @@ import * as path from "path";
 import * as ec2 from "aws-cdk-lib/aws-ec2";
 import { BedrockCustomBotCodebuild } from "./constructs/bedrock-custom-bot-codebuild";
 import { BotStore, Language } from "./constructs/bot-store";
+import { ConversationArchive } from "./constructs/conversation-archive";
+import { BotStoreFeed } from "./constructs/bot-store-feed";
+import { UserIndex } from "./constructs/user-index";
 import { Duration } from "aws-cdk-lib";
 
 export interface BedrockAIAssistantStackProps extends StackProps {
@@ -48,6 +51,7 @@ export interface BedrockAIAssistantStackProps extends StackProps {
   readonly enableBedrockCrossRegionInference: boolean;
   readonly enableLambdaSnapStart: boolean;
   readonly enableBotStore: boolean;
+  readonly enablePublishedBotIndex?: boolean;
   readonly enableBotStoreReplicas: boolean;
   readonly botStoreLanguage: Language;
   readonly tokenValidMinutes: number;
@@ -169,11 +173,20 @@ export class BedrockAIAssistantStack extends cdk.Stack {
       autoDeleteObjects: true,
       serverAccessLogsBucket: accessLogBucket,
       serverAccessLogsPrefix: "LargeMessageBucket",
+      lifecycleRules: [
+        {
+          // Results of `POST /batch` of published APIs, kept as long as the results of
+          // the messages (`MESSAGE_RESULT_RETENTION_DAYS` of the backend)
+          prefix: "batch_results/",
+          expiration: Duration.days(7),
+        },
+      ],
     });
 
     const database = new Database(this, "Database", {
       // Enable PITR to export data to s3
       pointInTimeRecovery: true,
+      enablePublishedBotIndex: props.enablePublishedBotIndex,
     });
 
     // Custom Bot Store
@@ -209,6 +222,8 @@ export class BedrockAIAssistantStack extends cdk.Stack {
         props.enableBedrockCrossRegionInference,
       enableLambdaSnapStart: props.enableLambdaSnapStart,
       openSearchEndpoint: botStore?.openSearchEndpoint,
+      // Feeds are refreshed by `BotStoreFeed`, which is deployed with the bot store
+      botStoreFeedBucket: botStore ? largeMessageBucket : undefined,
     });
     props.documentBucket.grantReadWrite(backendApi.handler);
     
@@ -303,6 +318,37 @@ export class BedrockAIAssistantStack extends cdk.Stack {
       maxAge: 3000,
     });
 
+    // Archive cold conversations to S3
+    new ConversationArchive(this, "ConversationArchive", {
+      database,
+      bedrockRegion: props.bedrockRegion,
+      largeMessageBucket,
+    });
+
+    // Snapshot users and groups searched when sharing bots
+    new UserIndex(this, "UserIndex", {
+      bedrockRegion: props.bedrockRegion,
+      userPool: auth.userPool,
+      largeMessageBucket,
+    });
+
+    if (botStore) {
+      const botStoreFeed = new BotStoreFeed(this, "BotStoreFeed", {
+        envPrefix: props.envPrefix,
+        database,
+        bedrockRegion: props.bedrockRegion,
+        largeMessageBucket,
+        openSearchEndpoint: botStore.openSearchEndpoint,
+      });
+      botStore.addDataAccessPolicy(
+        props.envPrefix,
+        "DAPolicyBotStoreFeed",
+        botStoreFeed.handler.role!,
+        ["aoss:DescribeCollectionItems"],
+        ["aoss:DescribeIndex", "aoss:ReadDocument"]
+      );
+    }
+
     const embedding = new Embedding(this, "Embedding", {
       bedrockRegion: props.bedrockRegion,
       database,
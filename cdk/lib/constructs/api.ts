@@ -44,6 +44,8 @@ export interface ApiProps {
   readonly enableBedrockCrossRegionInference: boolean;
   readonly enableLambdaSnapStart: boolean;
   readonly openSearchEndpoint?: string;
+  // Set when bot-store feeds are refreshed by the scheduled job
+  readonly botStoreFeedBucket?: IBucket;
 }
 
 export class Api extends Construct {
@@ -258,6 +260,7 @@ export class Api extends Construct {
     );
     props.usageAnalysis?.resultOutputBucket.grantReadWrite(handlerRole);
     props.usageAnalysis?.ddbBucket.grantRead(handlerRole);
+    props.usageAnalysis?.rollupTable.grantReadData(handlerRole);
     props.largeMessageBucket.grantReadWrite(handlerRole);
 
     const handler = new PythonFunction(this, "HandlerV2", {
@@ -294,9 +297,13 @@ export class Api extends Construct {
           props.usageAnalysis?.ddbExportTable.tableName || "",
         USAGE_ANALYSIS_WORKGROUP: props.usageAnalysis?.workgroupName || "",
         USAGE_ANALYSIS_OUTPUT_LOCATION: usageAnalysisOutputLocation,
+        USAGE_ROLLUP_TABLE_NAME:
+          props.usageAnalysis?.rollupTable.tableName || "",
         ENABLE_BEDROCK_CROSS_REGION_INFERENCE:
           props.enableBedrockCrossRegionInference.toString(),
         OPENSEARCH_DOMAIN_ENDPOINT: props.openSearchEndpoint || "",
+        BOT_STORE_FEED_BUCKET: props.botStoreFeedBucket?.bucketName || "",
+        PUBLISHED_BOT_INDEX_ENABLED: database.enablePublishedBotIndex.toString(),
         AWS_LAMBDA_EXEC_WRAPPER: "/opt/bootstrap",
         PORT: "8000",
       },
@@ -336,6 +343,7 @@ export class Api extends Construct {
           CorsHttpMethod.DELETE,
         ],
         allowOrigins: allowOrigins,
+        exposeHeaders: ["X-Next-Token"],
         maxAge: Duration.days(10),
       },
     });
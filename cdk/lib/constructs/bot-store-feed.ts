@@ -0,0 +1,99 @@
+import { Construct } from "constructs";
+import * as path from "path";
+import { Duration, Stack } from "aws-cdk-lib";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as iam from "aws-cdk-lib/aws-iam";
+import * as logs from "aws-cdk-lib/aws-logs";
+import { IBucket } from "aws-cdk-lib/aws-s3";
+import {
+  DockerImageCode,
+  DockerImageFunction,
+  IFunction,
+} from "aws-cdk-lib/aws-lambda";
+import { Platform } from "aws-cdk-lib/aws-ecr-assets";
+import { excludeDockerImage } from "../constants/docker";
+import { Database } from "./database";
+
+export interface BotStoreFeedProps {
+  readonly envPrefix: string;
+  readonly database: Database;
+  readonly bedrockRegion: string;
+  readonly largeMessageBucket: IBucket;
+  readonly openSearchEndpoint: string;
+  // Interval to rebuild popular, pickup and pinned bot feeds
+  readonly refreshIntervalMinutes?: number;
+}
+
+/**
+ * Scheduled job to precompute bot-store feeds shared by all users.
+ * The feeds are stored to S3 and merged with bots accessible only by each user on request.
+ */
+export class BotStoreFeed extends Construct {
+  readonly handler: IFunction;
+
+  constructor(scope: Construct, id: string, props: BotStoreFeedProps) {
+    super(scope, id);
+
+    const { database } = props;
+
+    const handlerRole = new iam.Role(this, "HandlerRole", {
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+    handlerRole.addManagedPolicy(
+      iam.ManagedPolicy.fromAwsManagedPolicyName(
+        "service-role/AWSLambdaBasicExecutionRole"
+      )
+    );
+    handlerRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["sts:AssumeRole"],
+        resources: [database.tableAccessRole.roleArn],
+      })
+    );
+    handlerRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["aoss:APIAccessAll"],
+        resources: ["*"],
+      })
+    );
+    props.largeMessageBucket.grantReadWrite(handlerRole);
+
+    const handler = new DockerImageFunction(this, "Handler", {
+      code: DockerImageCode.fromImageAsset(
+        path.join(__dirname, "../../../backend"),
+        {
+          platform: Platform.LINUX_AMD64,
+          file: "lambda.Dockerfile",
+          cmd: ["app.bot_store_feed.handler"],
+          exclude: [...excludeDockerImage],
+        }
+      ),
+      memorySize: 512,
+      timeout: Duration.minutes(1),
+      environment: {
+        ACCOUNT: Stack.of(this).account,
+        REGION: Stack.of(this).region,
+        BEDROCK_REGION: props.bedrockRegion,
+        ENV_PREFIX: props.envPrefix,
+        BOT_TABLE_NAME: database.botTable.tableName,
+        CONVERSATION_TABLE_NAME: database.conversationTable.tableName,
+        TABLE_ACCESS_ROLE_ARN: database.tableAccessRole.roleArn,
+        LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
+        BOT_STORE_FEED_BUCKET: props.largeMessageBucket.bucketName,
+        OPENSEARCH_DOMAIN_ENDPOINT: props.openSearchEndpoint,
+      },
+      role: handlerRole,
+      logRetention: logs.RetentionDays.THREE_MONTHS,
+    });
+
+    new events.Rule(this, "ScheduleRule", {
+      schedule: events.Schedule.rate(
+        Duration.minutes(props.refreshIntervalMinutes ?? 5)
+      ),
+      targets: [new targets.LambdaFunction(handler)],
+    });
+
+    this.handler = handler;
+  }
+}
@@ -386,6 +386,26 @@ export class BotStore extends Construct {
  */
   private _genBotTemplateContent(language: Language): string {
     switch (language) {
+      case "en":
+        // Other fields are mapped dynamically.
+        // `AccessPrincipals` is mapped explicitly since access control filters rely on its keyword field.
+        return JSON.stringify({
+          template: {
+            mappings: {
+              properties: {
+                AccessPrincipals: {
+                  type: "text",
+                  fields: {
+                    keyword: {
+                      type: "keyword",
+                      ignore_above: 256
+                    }
+                  }
+                },
+              },
+            },
+          },
+        });
       default:
         throw new Error(`Unsupported language: ${language}`);
     }
@@ -424,13 +444,9 @@ export class BotStore extends Construct {
             opensearch: {
               hosts: [props.endpoint],
               index: `${props.envPrefix}bot`,
-              ...(props.language === "en"
-                ? {} // For en, index_type, template_type, template_content are not required
-                : {
-                    index_type: "custom",
-                    template_type: "index-template",
-                    template_content: this._genBotTemplateContent(props.language),
-                  }),
+              index_type: "custom",
+              template_type: "index-template",
+              template_content: this._genBotTemplateContent(props.language),
               document_id: '${getMetadata("primary_key")}',
               action: '${getMetadata("opensearch_action")}',
               document_version: '${getMetadata("document_version")}',
@@ -456,6 +472,31 @@ export class BotStore extends Construct {
       default:
         return JSON.stringify({
           template: {
+            settings: {
+              analysis: {
+                // Edge n-grams of words are indexed for search-as-you-type suggestions
+                tokenizer: {
+                  suggest_tokenizer: {
+                    type: "edge_ngram",
+                    min_gram: 1,
+                    max_gram: 20,
+                    token_chars: ["letter", "digit"]
+                  }
+                },
+                analyzer: {
+                  suggest_index: {
+                    type: "custom",
+                    tokenizer: "suggest_tokenizer",
+                    filter: ["lowercase"]
+                  },
+                  suggest_search: {
+                    type: "custom",
+                    tokenizer: "standard",
+                    filter: ["lowercase"]
+                  }
+                }
+              }
+            },
             mappings: {
               dynamic: false,
               properties: {
@@ -485,6 +526,23 @@ export class BotStore extends Construct {
                     keyword: {
                       type: "keyword",
                       ignore_above: 256
+                    },
+                    suggest: {
+                      type: "text",
+                      analyzer: "suggest_index",
+                      search_analyzer: "suggest_search"
+                    }
+                  }
+                },
+                // Used only for suggestions. Truncated on write.
+                FirstUserMessage: {
+                  type: "text",
+                  index: false,
+                  fields: {
+                    suggest: {
+                      type: "text",
+                      analyzer: "suggest_index",
+                      search_analyzer: "suggest_search"
                     }
                   }
                 },
@@ -600,6 +658,16 @@ export class BotStore extends Construct {
           },
         },
         processor: [
+          // Step 0: Skip archiving. The archived stub keeps only the `system` message,
+          // so indexing it would remove the messages of the conversation from search.
+          // The indexed document is updated again when the conversation is restored.
+          // NOTE: Archived conversations are not indexed by the initial export.
+          {
+            drop_events: {
+              drop_when:
+                '/IsArchived == true and getMetadata("opensearch_action") != "delete"',
+            },
+          },
           // Step 1: Parse message data as JSON
           {
             parse_json: {
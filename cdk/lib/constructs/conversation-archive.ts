@@ -0,0 +1,87 @@
+import { Construct } from "constructs";
+import * as path from "path";
+import { Duration, Stack } from "aws-cdk-lib";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as iam from "aws-cdk-lib/aws-iam";
+import * as logs from "aws-cdk-lib/aws-logs";
+import { IBucket } from "aws-cdk-lib/aws-s3";
+import {
+  DockerImageCode,
+  DockerImageFunction,
+  IFunction,
+} from "aws-cdk-lib/aws-lambda";
+import { Platform } from "aws-cdk-lib/aws-ecr-assets";
+import { excludeDockerImage } from "../constants/docker";
+import { Database } from "./database";
+
+export interface ConversationArchiveProps {
+  readonly database: Database;
+  readonly bedrockRegion: string;
+  readonly largeMessageBucket: IBucket;
+  // Conversations idle longer than this are archived to S3
+  readonly archiveAfterDays?: number;
+}
+
+/**
+ * Scheduled job to move cold conversations from DynamoDB to compressed S3 objects.
+ * A stub item is left in the conversation table and the conversation is rehydrated on read.
+ */
+export class ConversationArchive extends Construct {
+  readonly handler: IFunction;
+
+  constructor(scope: Construct, id: string, props: ConversationArchiveProps) {
+    super(scope, id);
+
+    const { database } = props;
+
+    const handlerRole = new iam.Role(this, "HandlerRole", {
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+    handlerRole.addManagedPolicy(
+      iam.ManagedPolicy.fromAwsManagedPolicyName(
+        "service-role/AWSLambdaBasicExecutionRole"
+      )
+    );
+    handlerRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["sts:AssumeRole"],
+        resources: [database.tableAccessRole.roleArn],
+      })
+    );
+    props.largeMessageBucket.grantReadWrite(handlerRole);
+
+    const handler = new DockerImageFunction(this, "Handler", {
+      code: DockerImageCode.fromImageAsset(
+        path.join(__dirname, "../../../backend"),
+        {
+          platform: Platform.LINUX_AMD64,
+          file: "lambda.Dockerfile",
+          cmd: ["app.conversation_archive.handler"],
+          exclude: [...excludeDockerImage],
+        }
+      ),
+      memorySize: 1024,
+      timeout: Duration.minutes(15),
+      environment: {
+        ACCOUNT: Stack.of(this).account,
+        REGION: Stack.of(this).region,
+        BEDROCK_REGION: props.bedrockRegion,
+        CONVERSATION_TABLE_NAME: database.conversationTable.tableName,
+        BOT_TABLE_NAME: database.botTable.tableName,
+        TABLE_ACCESS_ROLE_ARN: database.tableAccessRole.roleArn,
+        LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
+        ARCHIVE_AFTER_DAYS: (props.archiveAfterDays ?? 90).toString(),
+      },
+      role: handlerRole,
+      logRetention: logs.RetentionDays.THREE_MONTHS,
+    });
+
+    new events.Rule(this, "ScheduleRule", {
+      schedule: events.Schedule.cron({ minute: "0", hour: "3" }),
+      targets: [new targets.LambdaFunction(handler)],
+    });
+
+    this.handler = handler;
+  }
+}
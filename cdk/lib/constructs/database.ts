@@ -3,6 +3,7 @@ import {
   AttributeType,
   BillingMode,
   ITable,
+  ProjectionType,
   Table,
   TableEncryption,
   StreamViewType,
@@ -12,6 +13,12 @@ import { Construct } from "constructs";
 
 export interface DatabaseProps {
   pointInTimeRecovery?: boolean;
+  /**
+   * Create `PublishedBotIndex`. Defaults to true.
+   * CloudFormation creates only one GSI per table update, so disable this on the first deployment
+   * when `OwnedBotIndex` is also new. See docs/migration/BOT_TABLE_INDEXES.md
+   */
+  enablePublishedBotIndex?: boolean;
 }
 
 export class Database extends Construct {
@@ -20,6 +27,7 @@ export class Database extends Construct {
   readonly tableAccessRole: Role;
   readonly websocketSessionTable: Table;
   readonly alzheimerDatasetTable: ITable; 
+  readonly enablePublishedBotIndex: boolean;
 
   constructor(scope: Construct, id: string, props?: DatabaseProps) {
     super(scope, id);
@@ -35,6 +43,8 @@ export class Database extends Construct {
       stream: StreamViewType.NEW_IMAGE,
       pointInTimeRecovery: props?.pointInTimeRecovery,
       encryption: TableEncryption.AWS_MANAGED,
+      // Only set on short-lived items, e.g. results of published API messages
+      timeToLiveAttribute: "ExpireTime",
     });
     conversationTable.addGlobalSecondaryIndex({
       // Used to fetch conversation or bot by id
@@ -81,6 +91,51 @@ export class Database extends Construct {
       indexName: "ItemTypeIndex",
       partitionKey: { name: "ItemType", type: AttributeType.STRING },
     });
+    // GSI-4
+    // Sparse index of owned bots ordered by last used time, falling back to create time.
+    // Only attributes required to list bots are projected.
+    botTable.addGlobalSecondaryIndex({
+      indexName: "OwnedBotIndex",
+      partitionKey: { name: "ItemType", type: AttributeType.STRING },
+      sortKey: { name: "LastUsedOrCreateTime", type: AttributeType.NUMBER },
+      projectionType: ProjectionType.INCLUDE,
+      nonKeyAttributes: [
+        "BotId",
+        "Title",
+        "Description",
+        "CreateTime",
+        "LastUsedTime",
+        "IsStarred",
+        "SyncStatus",
+        "BedrockKnowledgeBase",
+        "SharedScope",
+        "SharedStatus",
+      ],
+    });
+    // GSI-5
+    // Sparse index of published bots ordered by published time.
+    // Without this index, published bots are read from `SharedScopeIndex`.
+    this.enablePublishedBotIndex = props?.enablePublishedBotIndex ?? true;
+    if (this.enablePublishedBotIndex) {
+      botTable.addGlobalSecondaryIndex({
+        indexName: "PublishedBotIndex",
+        partitionKey: { name: "IsPublished", type: AttributeType.STRING },
+        sortKey: { name: "PublishedTime", type: AttributeType.NUMBER },
+        projectionType: ProjectionType.INCLUDE,
+        nonKeyAttributes: [
+          "BotId",
+          "Title",
+          "Description",
+          "CreateTime",
+          "LastUsedTime",
+          "SyncStatus",
+          "ApiPublishmentStackName",
+          "ApiPublishedDatetime",
+          "SharedScope",
+          "SharedStatus",
+        ],
+      });
+    }
 
     const tableAccessRole = new Role(this, "TableAccessRole", {
       assumedBy: new AccountPrincipal(Stack.of(this).account),
@@ -1,13 +1,22 @@
 import { Construct } from "constructs";
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as athena from "aws-cdk-lib/aws-athena";
-import { CfnOutput, RemovalPolicy, Stack } from "aws-cdk-lib";
+import { CfnOutput, Duration, RemovalPolicy, Stack } from "aws-cdk-lib";
+import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
 import * as glue from "@aws-cdk/aws-glue-alpha";
 import * as events from "aws-cdk-lib/aws-events";
 import * as targets from "aws-cdk-lib/aws-events-targets";
 import * as python from "@aws-cdk/aws-lambda-python-alpha";
 import * as path from "path";
-import { Runtime } from "aws-cdk-lib/aws-lambda";
+import {
+  DockerImageCode,
+  DockerImageFunction,
+  Runtime,
+  StartingPosition,
+} from "aws-cdk-lib/aws-lambda";
+import { DynamoEventSource } from "aws-cdk-lib/aws-lambda-event-sources";
+import { Platform } from "aws-cdk-lib/aws-ecr-assets";
+import { excludeDockerImage } from "../constants/docker";
 import { aws_glue } from "aws-cdk-lib";
 import { Database } from "./database";
 import * as iam from "aws-cdk-lib/aws-iam";
@@ -26,6 +35,7 @@ export class UsageAnalysis extends Construct {
   public readonly resultOutputBucket: s3.IBucket;
   public readonly workgroupName: string;
   public readonly workgroupArn: string;
+  public readonly rollupTable: dynamodb.ITable;
   constructor(scope: Construct, id: string, props: UsageAnalysisProps) {
     super(scope, id);
 
@@ -260,6 +270,50 @@ export class UsageAnalysis extends Construct {
       targets: [new targets.LambdaFunction(exportHandler)],
     });
 
+    // Hourly price aggregates per bot and per user, maintained from the conversation table stream.
+    // Admin rankings query this table instead of scanning the export with Athena.
+    const rollupTable = new dynamodb.Table(this, "UsageRollupTable", {
+      partitionKey: { name: "PK", type: dynamodb.AttributeType.STRING },
+      sortKey: { name: "SK", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      encryption: dynamodb.TableEncryption.AWS_MANAGED,
+      removalPolicy: RemovalPolicy.DESTROY,
+      timeToLiveAttribute: "ExpireTime",
+    });
+
+    const rollupHandler = new DockerImageFunction(this, "RollupHandler", {
+      code: DockerImageCode.fromImageAsset(
+        path.join(__dirname, "../../../backend"),
+        {
+          platform: Platform.LINUX_AMD64,
+          file: "lambda.Dockerfile",
+          cmd: ["app.usage_rollup.handler"],
+          exclude: [...excludeDockerImage],
+        }
+      ),
+      memorySize: 256,
+      timeout: Duration.minutes(1),
+      environment: {
+        REGION: Stack.of(this).region,
+        USAGE_ROLLUP_TABLE_NAME: rollupTable.tableName,
+      },
+      logRetention: logs.RetentionDays.THREE_MONTHS,
+    });
+    rollupTable.grantReadWriteData(rollupHandler);
+    rollupHandler.addEventSource(
+      new DynamoEventSource(props.sourceDatabase.conversationTable, {
+        startingPosition: StartingPosition.TRIM_HORIZON,
+        batchSize: 100,
+        maxBatchingWindow: Duration.seconds(5),
+        retryAttempts: 5,
+        filters: [
+          {
+            pattern: '{"eventName":["INSERT","MODIFY","REMOVE"]}',
+          },
+        ],
+      })
+    );
+
     new CfnOutput(this, "UsageAnalysisWorkgroup", {
       value: wg.name,
     });
@@ -272,6 +326,7 @@ export class UsageAnalysis extends Construct {
     this.ddbExportTable = ddbExportTable;
     this.workgroupName = wg.name;
     this.resultOutputBucket = queryResultBucket;
+    this.rollupTable = rollupTable;
     this.workgroupArn = `arn:aws:athena:*:${Stack.of(this).account}:workgroup/${
       wg.name
     }`;
@@ -0,0 +1,86 @@
+import { Construct } from "constructs";
+import * as path from "path";
+import { Duration, Stack } from "aws-cdk-lib";
+import * as cognito from "aws-cdk-lib/aws-cognito";
+import * as events from "aws-cdk-lib/aws-events";
+import * as targets from "aws-cdk-lib/aws-events-targets";
+import * as iam from "aws-cdk-lib/aws-iam";
+import * as logs from "aws-cdk-lib/aws-logs";
+import { IBucket } from "aws-cdk-lib/aws-s3";
+import {
+  DockerImageCode,
+  DockerImageFunction,
+  IFunction,
+} from "aws-cdk-lib/aws-lambda";
+import { Platform } from "aws-cdk-lib/aws-ecr-assets";
+import { excludeDockerImage } from "../constants/docker";
+
+export interface UserIndexProps {
+  readonly bedrockRegion: string;
+  readonly userPool: cognito.IUserPool;
+  readonly largeMessageBucket: IBucket;
+  // Interval to rebuild the snapshots of users and groups
+  readonly refreshIntervalMinutes?: number;
+}
+
+/**
+ * Scheduled job to snapshot Cognito users and groups to S3.
+ * API environments load the snapshots to answer user and group searches,
+ * so the user pool is listed once per refresh instead of by every environment.
+ */
+export class UserIndex extends Construct {
+  readonly handler: IFunction;
+
+  constructor(scope: Construct, id: string, props: UserIndexProps) {
+    super(scope, id);
+
+    const handlerRole = new iam.Role(this, "HandlerRole", {
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+    handlerRole.addManagedPolicy(
+      iam.ManagedPolicy.fromAwsManagedPolicyName(
+        "service-role/AWSLambdaBasicExecutionRole"
+      )
+    );
+    handlerRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["cognito-idp:ListUsers", "cognito-idp:ListGroups"],
+        resources: [props.userPool.userPoolArn],
+      })
+    );
+    props.largeMessageBucket.grantReadWrite(handlerRole);
+
+    const handler = new DockerImageFunction(this, "Handler", {
+      code: DockerImageCode.fromImageAsset(
+        path.join(__dirname, "../../../backend"),
+        {
+          platform: Platform.LINUX_AMD64,
+          file: "lambda.Dockerfile",
+          cmd: ["app.user_index.handler"],
+          exclude: [...excludeDockerImage],
+        }
+      ),
+      memorySize: 512,
+      // Listing a large pool takes one request per 60 users
+      timeout: Duration.minutes(5),
+      environment: {
+        ACCOUNT: Stack.of(this).account,
+        REGION: Stack.of(this).region,
+        BEDROCK_REGION: props.bedrockRegion,
+        USER_POOL_ID: props.userPool.userPoolId,
+        LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
+      },
+      role: handlerRole,
+      logRetention: logs.RetentionDays.THREE_MONTHS,
+    });
+
+    new events.Rule(this, "ScheduleRule", {
+      schedule: events.Schedule.rate(
+        Duration.minutes(props.refreshIntervalMinutes ?? 5)
+      ),
+      targets: [new targets.LambdaFunction(handler)],
+    });
+
+    this.handler = handler;
+  }
+}
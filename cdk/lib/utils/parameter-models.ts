@@ -76,6 +76,8 @@ const BedrockAIAssistantParametersSchema = BaseParametersSchema.extend({
   // Performance and availability
   enableRagReplicas: z.boolean().default(false),
   enableLambdaSnapStart: z.boolean().default(true),
+  // Set false on the first deployment when upgrading. See docs/migration/BOT_TABLE_INDEXES.md
+  enablePublishedBotIndex: z.boolean().default(true),
 
   // Custom domain configuration
   alternateDomainName: z.string().default(""),
@@ -208,6 +210,7 @@ export function resolveBedrockAIAssistantParameters(
       "enableBedrockCrossRegionInference"
     ),
     enableLambdaSnapStart: app.node.tryGetContext("enableLambdaSnapStart"),
+    enablePublishedBotIndex: app.node.tryGetContext("enablePublishedBotIndex"),
     alternateDomainName: app.node.tryGetContext("alternateDomainName"),
     hostedZoneId: app.node.tryGetContext("hostedZoneId"),
     enableBotStore: app.node.tryGetContext("enableBotStore"),
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Backfill attributes used by indexes for bots created before the attributes were introduced.
+
+- `OwnedBotIndex`: `LastUsedOrCreateTime`. Bots without it are not listed in `GET /bot`.
+- `PublishedBotIndex`: `IsPublished` and `PublishedTime`. Bots without them are not listed in the admin published APIs page.
+- Bot store: `AccessPrincipals`. Bots without it are not found in the bot store.
+
+Run this script once after deploying the indexes:
+
+    poetry run python ../docs/migration/backfill_bot_indexes.py --dry-run
+    poetry run python ../docs/migration/backfill_bot_indexes.py
+"""
+
+import argparse
+import logging
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("migration")
+
+
+################################
+# Configuration
+################################
+
+# Region where dynamodb is located
+REGION = "ap-northeast-1"
+
+# Key: DatabaseBotTableNameXXXX
+BOT_TABLE = "BedrockAIAssistantStack-DatabaseBotTableV3XXXXX"
+
+################################
+# End Configuration
+################################
+
+
+def get_bot_table():
+    return boto3.resource("dynamodb", region_name=REGION).Table(BOT_TABLE)
+
+
+def compose_access_principals(item: dict) -> list[str]:
+    """Same as `app.repositories.common.compose_access_principals`."""
+    principals = [f"user#{item['PK']}"]
+    shared_scope = item.get("SharedScope", "private")
+    if shared_scope == "all":
+        principals.append("public")
+    elif shared_scope == "partial":
+        principals.extend(
+            f"user#{user_id}" for user_id in item.get("AllowedCognitoUsers", [])
+        )
+        principals.extend(
+            f"group#{group_id}" for group_id in item.get("AllowedCognitoGroups", [])
+        )
+    return list(dict.fromkeys(principals))
+
+
+def compose_update(item: dict) -> tuple[list[str], dict]:
+    """Compose SET expressions and values of missing index keys of the bot item."""
+    set_expressions = []
+    expression_attribute_values = {}
+    if "LastUsedOrCreateTime" not in item:
+        set_expressions.append("LastUsedOrCreateTime = :sort_time")
+        expression_attribute_values[":sort_time"] = item.get(
+            "LastUsedTime", item["CreateTime"]
+        )
+    if item.get("ApiPublishmentStackName") and "IsPublished" not in item:
+        set_expressions.append("IsPublished = :is_published")
+        set_expressions.append("PublishedTime = :published_time")
+        expression_attribute_values[":is_published"] = "TRUE"
+        expression_attribute_values[":published_time"] = (
+            item.get("ApiPublishedDatetime") or item["CreateTime"]
+        )
+    if "AccessPrincipals" not in item:
+        set_expressions.append("AccessPrincipals = :access_principals")
+        expression_attribute_values[":access_principals"] = compose_access_principals(
+            item
+        )
+    return set_expressions, expression_attribute_values
+
+
+def backfill(dry_run: bool) -> int:
+    table = get_bot_table()
+    scan_params = {
+        "FilterExpression": Attr("SK").begins_with("BOT#")
+        & (
+            Attr("LastUsedOrCreateTime").not_exists()
+            | Attr("AccessPrincipals").not_exists()
+            | (
+                Attr("ApiPublishmentStackName").exists()
+                & Attr("ApiPublishmentStackName").ne(None)
+                & Attr("IsPublished").not_exists()
+            )
+        ),
+        "ProjectionExpression": "PK, SK, CreateTime, LastUsedTime, LastUsedOrCreateTime, "
+        "ApiPublishmentStackName, ApiPublishedDatetime, IsPublished, "
+        "SharedScope, AllowedCognitoUsers, AllowedCognitoGroups, AccessPrincipals",
+    }
+
+    count = 0
+    while True:
+        response = table.scan(**scan_params)
+        for item in response["Items"]:
+            set_expressions, expression_attribute_values = compose_update(item)
+            logger.info(f"Backfill {item['PK']} {item['SK']}: {set_expressions}")
+            count += 1
+            if dry_run:
+                continue
+
+            try:
+                table.update_item(
+                    Key={"PK": item["PK"], "SK": item["SK"]},
+                    UpdateExpression="SET " + ", ".join(set_expressions),
+                    ExpressionAttributeValues=expression_attribute_values,
+                    # Skip bots deleted since scanned
+                    ConditionExpression="attribute_exists(PK)",
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise e
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only list bots to be updated"
+    )
+    args = parser.parse_args()
+
+    count = backfill(args.dry_run)
+    logger.info(f"{'Found' if args.dry_run else 'Backfilled'} {count} bots.")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Move conversations of published APIs written before partition sharding to their shards.
+
+Conversations of published APIs are stored with partition key `PUBLISHED_API#<bot_id>#<shard>`.
+Conversations written before sharding are still read and moved one by one when they are opened,
+so running this script is optional, but it removes that extra work from the request path.
+
+Run this script once after deploying sharding:
+
+    poetry run python ../docs/migration/migrate_published_api_shards.py --dry-run
+    poetry run python ../docs/migration/migrate_published_api_shards.py
+"""
+
+import argparse
+import logging
+import zlib
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("migration")
+
+
+################################
+# Configuration
+################################
+
+# Region where dynamodb is located
+REGION = "ap-northeast-1"
+
+# Key: DatabaseConversationTableNameXXXX
+CONVERSATION_TABLE = "BedrockAIAssistantStack-DatabaseConversationTableV3XXXXX"
+
+# Same as `PUBLISHED_API_PARTITION_SHARD_COUNT` of the backend
+PUBLISHED_API_PARTITION_SHARD_COUNT = 10
+
+################################
+# End Configuration
+################################
+
+
+def get_conversation_table():
+    return boto3.resource("dynamodb", region_name=REGION).Table(CONVERSATION_TABLE)
+
+
+def compose_partition_key(user_id: str, conversation_id: str) -> str:
+    """Same as `app.repositories.common.compose_partition_key`."""
+    shard = zlib.crc32(conversation_id.encode()) % PUBLISHED_API_PARTITION_SHARD_COUNT
+    return f"{user_id}#{shard}"
+
+
+def decompose_conversation_id(user_id: str, sort_key: str) -> str | None:
+    """Conversation id of conversation and related document items. Other items are not moved."""
+    if sort_key.startswith(f"{user_id}#CONV#"):
+        return sort_key.removeprefix(f"{user_id}#CONV#")
+    if sort_key.startswith(f"{user_id}#RELATED_DOCUMENT#"):
+        return sort_key.removeprefix(f"{user_id}#RELATED_DOCUMENT#").split("#", 1)[0]
+    return None
+
+
+def migrate(dry_run: bool) -> int:
+    table = get_conversation_table()
+    scan_params = {
+        "FilterExpression": Attr("PK").begins_with("PUBLISHED_API#"),
+    }
+
+    count = 0
+    while True:
+        response = table.scan(**scan_params)
+        for item in response["Items"]:
+            # Sharded key: PUBLISHED_API#<bot_id>#<shard>
+            user_id = item["PK"]
+            if user_id.count("#") != 1:
+                continue
+            conversation_id = decompose_conversation_id(user_id, item["SK"])
+            if conversation_id is None:
+                continue
+
+            partition_key = compose_partition_key(user_id, conversation_id)
+            logger.info(f"Move {item['PK']} {item['SK']} to {partition_key}")
+            count += 1
+            if dry_run:
+                continue
+
+            try:
+                table.put_item(
+                    Item={**item, "PK": partition_key},
+                    # Keep the item already moved by the backend, which may be newer
+                    ConditionExpression="attribute_not_exists(PK)",
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise e
+            table.delete_item(Key={"PK": item["PK"], "SK": item["SK"]})
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only list items to be moved"
+    )
+    args = parser.parse_args()
+
+    count = migrate(args.dry_run)
+    logger.info(f"{'Found' if args.dry_run else 'Moved'} {count} items.")
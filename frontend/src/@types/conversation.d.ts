@@ -149,6 +149,11 @@ export type ConversationSearchMeta = {
   highlights?: SearchHighlightModel[]; // Optional highlights information
 };
 
+export type ConversationSuggestion = {
+  id: string;
+  title: string;
+};
+
 export type MessageMap = {
   [messageId: string]: MessageContent & {
     children: string[];
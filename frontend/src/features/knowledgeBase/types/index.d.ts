@@ -1,6 +1,7 @@
 export type BedrockKnowledgeBase = {
   knowledgeBaseId: string | null;
   existKnowledgeBaseId: string | null;
+  sharedKnowledgeBaseIds?: string[];
   dataSourceIds?: string[]; // only present after bot is ready
   embeddingsModel: EmbeddingsModel;
   chunkingConfiguration: ChunkingConfiguration;
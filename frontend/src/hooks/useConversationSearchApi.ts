@@ -1,4 +1,7 @@
-import { ConversationSearchMeta } from '../@types/conversation';
+import {
+  ConversationSearchMeta,
+  ConversationSuggestion,
+} from '../@types/conversation';
 import useHttp from './useHttp';
 
 const useConversationSearchApi = () => {
@@ -9,7 +12,15 @@ const useConversationSearchApi = () => {
       return http.get<ConversationSearchMeta[]>(
         query ? `conversations/search?query=${encodeURIComponent(query)}` : null
       );
-    }
+    },
+    // Lightweight search for typeahead
+    suggestConversations: (query: string | null) => {
+      return http.get<ConversationSuggestion[]>(
+        query
+          ? `conversations/suggest?query=${encodeURIComponent(query)}`
+          : null
+      );
+    },
   };
 };
 